@@ -1,80 +1,53 @@
 import threading
-from multiprocessing import Process
-from flask import Flask, jsonify, request, send_file, session
+import time
+import resource
+from flask import Flask, Response, jsonify, request, send_file, session
 from flask_cors import CORS
-from sqlalchemy.orm import scoped_session, sessionmaker
 import configparser
-from selenium.webdriver.chrome.options import Options
-import class_datatypes
-import class_model
-import class_spider
-import class_GDACSspider
-import class_translator
 import class_SubscriptionSystem
 import class_DataManager
 import class_CaptchaService
-import class_ChatGPT
-from class_datatypes import Warning, Result, UsersComments, WarningRating, WarningVote, Vote, Rating
+import class_EventStream
+import database
+from class_datatypes import Warning, Result, UsersComments, WarningRating, WarningVote, Vote, Rating, Job
 from datetime import datetime
-from sqlalchemy import create_engine, desc, asc
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy import desc, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from flask_jwt_extended import create_access_token, JWTManager, jwt_required, get_jwt_identity
 import os
-import time
-from lock import db_lock
+from class_ResponseCache import response_cache
+from class_EventStream import record_event
+from class_JobQueue import enqueue_delete_check
 
 class Backend:
+    """
+    Web API 进程的状态。不运行爬虫和模型流水线 (见 worker.py)，
+    因此可以用 gunicorn 等启动多个 API 进程，进程之间只通过数据库协调。
+    """
     def __init__(self, db_path):
         print("[Debug] Creating Backend")
+        started = time.monotonic()
         self.session = self.init_db(db_path)
-        self.create_tables()
-        self.translator, self.model, self.subscriptionsystem, self.datamanager, self.captchaservice = self.init_subsystems()
-        self.spider_event = threading.Event()
-        self.gdacs_event = threading.Event()
-        self.options = Options()
-        # options.add_argument("--headless")  # 设置为无头模式
-        self.options.add_argument('--disable-gpu')
-        self.options.add_argument("--no-sandbox") 
-        self.options.add_argument('--disable-dev-shm-usage')
-        self.options.add_argument(r"user-data-dir=/home/nakanomiku/.config/google-chrome")
-        self.options.add_experimental_option("prefs", {
-            "download.default_directory": '/home/nakanomiku/Downloads/',
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True,
-            "safebrowsing.enabled": True
-        })
-
-
-        # self.schedule_tasks()
+        database.create_schema(self.session)
+        self.subscriptionsystem, self.datamanager, self.captchaservice = self.init_subsystems()
+        self.eventbroker = class_EventStream.EventBroker(self.session)
         self.run_subsystems()
+        # ru_maxrss 在 Linux 上以 KiB 为单位
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"[Debug] Backend ready in {time.monotonic() - started:.2f}s, max RSS {rss:.0f} MiB")
         
     def init_db(self, db_path):
         """初始化数据库连接池和会话"""
-        engine = create_engine(f'sqlite:///{db_path}', connect_args={"check_same_thread": False})
-        Session = scoped_session(sessionmaker(bind=engine))
-        return Session
-    
-    def create_tables(self):
-        """创建数据库表"""
-        class_datatypes.Base.metadata.create_all(self.session().bind)
+        return database.create_session(db_path)
         
     def init_subsystems(self):
-        """初始化 Translator 和 Spider 子系统"""
+        """初始化 API 需要的子系统"""
         print("Initializing subsystems")
         # 读取配置文件
         config = configparser.ConfigParser()
         config.read('config.ini')
-        # 初始化 Translator
-        translator = class_translator.Translator("nllb-200-distilled-600M", self.session)
 
-        
-        # 初始化 DisasterTweetModel
-        # train_path = 'dataset/train.csv'
-        # test_path = 'dataset/test.csv'
-        # model = class_model.DisasterTweetModel(train_path, test_path, self.session)
-        model = class_ChatGPT.LangChainModel(self.session, config['GPT']['apikey'])
-
-        # 初始化SubscriptionSystem
+        # 初始化SubscriptionSystem，API 进程只用它注册和登录，邮件通知由 worker 发送
         subscriptionsystem = class_SubscriptionSystem.SubscriptionSystem('220.197.30.134', 25,  config['User']['email'], config['User']['password'],  self.session)
 
         # 初始化DataManager
@@ -83,56 +56,12 @@ class Backend:
         # 初始化CaptchaService
         captchaservice = class_CaptchaService.CaptchaService()
         
-        return translator, model, subscriptionsystem, datamanager, captchaservice
-
-    def spider_task(self):
-        config = configparser.ConfigParser()
-        config.read('config.ini')
-        while True:
-            self.spider_event.wait()
-            try:
-                spider = class_spider.Spider(config, self.session, self.options)
-                print("Spider is running...")
-                spider.run()
-                print("Spider is stopping...")
-                spider.stop()
-            except Exception as e:
-                print(f"Spider task failed: {e}")
-            finally:
-                self.spider_event.clear()
-                self.gdacs_event.set()
-
-    def gdacs_task(self):
-        while True:
-            self.gdacs_event.wait()
-            try:
-                print("GDACS is running...")
-                gdacsspider = class_GDACSspider.GDACSSpider("/home/nakanomiku/Downloads/", "./data", self.session, self.options)
-                gdacsspider.run()
-                print("GDACS is stopping...")
-                gdacsspider.stop()
-            except Exception as e:
-                print(f"GDACS task failed: {e}")
-            finally:
-                self.gdacs_event.clear()
-                self.spider_event.set()
+        return subscriptionsystem, datamanager, captchaservice
             
     def run_subsystems(self):
-        """启动子系统线程"""
+        """启动 API 进程的后台线程"""
         print("[Debug] Waking up subsystems")
-        translator_thread = threading.Thread(target=self.translator.run, daemon=True)
-        # spider_thread = threading.Thread(target=self.spider.run, daemon=True)
-        # gdacsspider_thread = threading.Thread(target=self.gdacs.run, daemon=True)
-        model_thread = threading.Thread(target=self.model.run, daemon=True)
-        subscriptionsystem_thread = threading.Thread(target=self.subscriptionsystem.run, daemon=True)
-        # translator_thread.start()
-        # spider_thread.start()
-        # gdacsspider_thread.start()
-        model_thread.start()
-        subscriptionsystem_thread.start()
-        threading.Thread(target=self.spider_task).start()
-        threading.Thread(target=self.gdacs_task).start()
-        self.spider_event.set()
+        threading.Thread(target=self.eventbroker.run, daemon=True).start()
 
     def get_all_results(self):
         """从数据库中获取所有结果记录"""
@@ -153,9 +82,8 @@ class Backend:
                     date_time=datetime.now(),  # 使用当前时间
                     processed=False
                 )
-                with db_lock:
-                    db_session.add(new_comment)
-                    db_session.commit()
+                db_session.add(new_comment)
+                db_session.commit()
                 print(f"[Debug] Message stored: {content}")
                 return {"status": "success", "message": "Message processed and stored successfully"}
         except Exception as e:
@@ -197,6 +125,33 @@ backend = Backend('data/forum.db')  # 假设数据库文件名为 example.db
 def calculate_average(total, count):
     return total / count if count > 0 else None
 
+def rating_payload(target, item):
+    """评分更新事件的内容，item 为 Warning 或 Result"""
+    return {
+        'target': target,
+        'id': item.id,
+        'authenticity_average': calculate_average(item.authenticity_rating, item.authenticity_raters),
+        'accuracy_average': calculate_average(item.accuracy_rating, item.accuracy_raters),
+        'authenticity_count': item.authenticity_raters,
+        'accuracy_count': item.accuracy_raters
+    }
+
+GZIP_MIN_SIZE = 1024  # 小于该大小的响应不压缩
+
+def cached_json_response(key, build):
+    """从响应缓存返回 JSON，支持 ETag/If-None-Match 和 gzip"""
+    entry = response_cache.get_or_build(key, build)
+    use_gzip = len(entry.body) >= GZIP_MIN_SIZE and 'gzip' in request.accept_encodings
+    etag = entry.etag + '-gz' if use_gzip else entry.etag
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+
+    if request.if_none_match.contains(entry.etag) or request.if_none_match.contains(entry.etag + '-gz'):
+        return Response(status=304, headers=headers)
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(entry.gzipped(), mimetype='application/json', headers=headers)
+    return Response(entry.body, mimetype='application/json', headers=headers)
+
 # 邮箱订阅服务
 @app.route('/subscribe', methods=['POST'])
 def subscribe():
@@ -231,7 +186,9 @@ def subscribe():
         return jsonify({"error": "Invalid email or password"}), 400
     
 @app.route('/api/warnings', methods=['GET'])
+@jwt_required(optional=True)
 def get_warnings():
+    user_id = get_jwt_identity()
     filters = {
         'disaster_type': None if request.args.get('disasterType') == 'all' else request.args.get('disasterType'),
     }
@@ -241,25 +198,17 @@ def get_warnings():
     print(f"[Debug] Filters: {filters}")
     print(f"[Debug] Order by: {order_by}, Order desc: {order_desc}")
     
-    try:
-        db_session = backend.session()
-        query = db_session.query(Warning)
-
-        if filters['disaster_type']:
-            print(f"[Debug] Filtering by disaster_type: {filters['disaster_type']}")
-            query = query.filter(Warning.disaster_type == filters['disaster_type'])
-
-        if order_by and hasattr(Warning, order_by):
-            print(f"[Debug] Ordering by: {order_by}")
-            order_function = desc if order_desc else asc
-            query = query.order_by(order_function(getattr(Warning, order_by)))
-        else:
-            print(f"[Debug] Invalid order_by attribute: {order_by}")
-
-        warnings = query.all()
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+
+    def build():
+        warnings, next_cursor = backend.datamanager.get_warnings(
+            disaster_type=filters['disaster_type'], order_by=order_by, order_desc=order_desc, limit=limit, after=after
+        )
+        votes = backend.datamanager.get_user_votes(user_id)
         result = []
         for warning in warnings:
-            related_results = db_session.query(Result).filter(Result.warning_id == warning.id).all()
+            related_results = warning.results
             result.append({
                 'id': warning.id,
                 'disaster_type': warning.disaster_type,
@@ -269,6 +218,7 @@ def get_warnings():
                 'accuracy_average': calculate_average(warning.accuracy_rating, warning.accuracy_raters),
                 'authenticity_count': warning.authenticity_raters,  # 确保返回评分人数
                 'accuracy_count': warning.accuracy_raters,  # 确保返回评分人数
+                **votes.flags('warning', warning.id),
                 'related_tweets': [{
                     'id': r.id,
                     'content': r.content,
@@ -282,13 +232,17 @@ def get_warnings():
                     'accuracy_average': calculate_average(r.accuracy_rating, r.accuracy_raters),
                     'authenticity_count': r.authenticity_raters,  # 确保返回评分人数
                     'accuracy_count': r.accuracy_raters,  # 确保返回评分人数
-                    'hasVotedAuthenticity': False,  # Default to False, update with actual logic if needed
-                    'hasVotedAccuracy': False,      # Default to False, update with actual logic if needed
-                    'hasVotedDelete': r.delete_votes > 0  # Assume backend sends this flag
+                    **votes.flags('result', r.id),
                 } for r in related_results]
             })
         print(f"[Debug] Warnings retrieved: {len(result)}")
-        return jsonify(result)
+        return {'items': result, 'next_cursor': next_cursor}
+
+    try:
+        key = ('warnings', user_id, filters['disaster_type'], order_by, order_desc, limit, after)
+        return cached_json_response(key, build)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         print(f"An error occurred: {e}")
         return jsonify({"status": "error", "message": "Failed to retrieve warnings"}), 500
@@ -301,18 +255,39 @@ def get_gdacs_messages():
     order_by = request.args.get('orderBy', 'date_time')
     order_desc = request.args.get('orderDesc', 'true') in ['true', 'True', '1', True]
 
-    results = backend.datamanager.get_data_gdacs(order_by=order_by, order_desc=order_desc)
-
-    return jsonify([
-        {
-            'id': result.id,
-            'content': result.content,
-            'date_time': result.date_time.isoformat() if result.date_time else None,
-            'source_type': result.source_type,
-            'location': result.location
-        } for result in results
-    ])
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+
+    def build():
+        results, next_cursor = backend.datamanager.get_data_gdacs(order_by=order_by, order_desc=order_desc, limit=limit, after=after)
+        return {
+            'items': [
+                {
+                    'id': result.id,
+                    'content': result.content,
+                    'date_time': result.date_time.isoformat() if result.date_time else None,
+                    'source_type': result.source_type,
+                    'location': result.location
+                } for result in results
+            ],
+            'next_cursor': next_cursor
+        }
+
+    try:
+        return cached_json_response(('gdacsMessages', order_by, order_desc, limit, after), build)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     
+# 向前端推送新的 Warning、Result、GDACS 以及评分更新 (Server-Sent Events)
+@app.route('/api/stream')
+def stream_events():
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    return Response(
+        backend.eventbroker.stream(last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # 从前端接收数据
 @app.route('/api/send-message', methods=['POST'])
 def send_message():
@@ -341,6 +316,72 @@ def captcha():
     # 确保 captcha_image 是一个正确的 BytesIO 流
     return send_file(captcha_image, mimetype='image/png')
 
+DELETE_VOTE_THRESHOLD = 1  # Adjust the threshold as needed
+RATING_ERRORS = {'invalid_type': 'Invalid rating type', 'invalid_rating': 'Invalid rating'}
+
+def apply_rating(db_session, model, rating_model, target_column, item_id, user_id, rating_type, rating):
+    """
+    用单条 UPDATE ... SET x = x + :v 原子地累加评分，重复评分由唯一索引和 INSERT OR IGNORE 拦截。
+    返回 (更新后的行, None) 或 (None, 错误原因)
+    """
+    if rating_type not in ('authenticity', 'accuracy'):
+        return None, 'invalid_type'
+    if isinstance(rating, bool) or not isinstance(rating, (int, float)):
+        return None, 'invalid_rating'
+
+    total = getattr(model, f'{rating_type}_rating')
+    raters = getattr(model, f'{rating_type}_raters')
+    updated = db_session.execute(
+        update(model).where(model.id == item_id).values({total: total + rating, raters: raters + 1})
+    ).rowcount
+    if updated == 0:
+        db_session.rollback()
+        return None, 'not_found'
+
+    inserted = db_session.execute(
+        sqlite_insert(rating_model)
+        .values({'user_id': user_id, target_column: item_id, 'type': rating_type, 'rating': rating})
+        .on_conflict_do_nothing()
+    ).rowcount
+    if inserted == 0:
+        db_session.rollback()
+        return None, 'duplicate'
+
+    row = db_session.execute(
+        select(model.id, model.authenticity_rating, model.authenticity_raters, model.accuracy_rating, model.accuracy_raters)
+        .where(model.id == item_id)
+    ).one()
+    return row, None
+
+def apply_delete_vote(db_session, model, vote_model, target_column, item_id, user_id):
+    """
+    原子地记录一次删除投票并提交，返回 (当前票数, None) 或 (None, 错误原因)
+    """
+    inserted = db_session.execute(
+        sqlite_insert(vote_model)
+        .values({'user_id': user_id, target_column: item_id, 'vote_type': 'delete'})
+        .on_conflict_do_nothing()
+    ).rowcount
+    if inserted == 0:
+        db_session.rollback()
+        return None, 'duplicate'
+
+    updated = db_session.execute(
+        update(model).where(model.id == item_id).values(delete_votes=model.delete_votes + 1)
+    ).rowcount
+    if updated == 0:
+        db_session.rollback()
+        return None, 'not_found'
+
+    delete_votes = db_session.execute(select(model.delete_votes).where(model.id == item_id)).scalar()
+    # 通过事件让其它 API 进程的响应缓存失效
+    target = 'warning' if model is Warning else 'result'
+    record_event(db_session, 'delete_vote', {'target': target, 'id': item_id, 'delete_votes': delete_votes})
+    db_session.commit()
+    backend.datamanager.invalidate_user_votes(user_id)
+    response_cache.bump()
+    return delete_votes, None
+
 @app.route('/api/rate-warning', methods=['POST'])
 @jwt_required()
 def rate_warning():
@@ -354,30 +395,21 @@ def rate_warning():
     rating_type = data.get('type')
 
     db_session = backend.session()
-    warning = db_session.query(Warning).get(warning_id)
-    if not warning:
-        return jsonify({'status': 'error', 'message': 'Warning not found'}), 404
-
-    existing_rating = db_session.query(WarningRating).filter_by(user_id=user_id, warning_id=warning_id, type=rating_type).first()
-    if existing_rating:
-        return jsonify({'status': 'error', 'message': 'You have already rated this warning'}), 400
-   
-    with db_session.no_autoflush:
-        new_rating = WarningRating(user_id=user_id, warning_id=warning_id, type=rating_type, rating=rating)
-        with db_lock:
-            db_session.add(new_rating)
-
-    if rating_type == 'authenticity':
-        warning.authenticity_rating += rating
-        warning.authenticity_raters += 1
-    elif rating_type == 'accuracy':
-        warning.accuracy_rating += rating
-        warning.accuracy_raters += 1
-    else:
-        return jsonify({'status': 'error', 'message': 'Invalid rating type'}), 400
-    
-    with db_lock:
+    try:
+        warning, error = apply_rating(db_session, Warning, WarningRating, 'warning_id', warning_id, user_id, rating_type, rating)
+        if error == 'not_found':
+            return jsonify({'status': 'error', 'message': 'Warning not found'}), 404
+        if error == 'duplicate':
+            return jsonify({'status': 'error', 'message': 'You have already rated this warning'}), 400
+        if error:
+            return jsonify({'status': 'error', 'message': RATING_ERRORS[error]}), 400
+
+        record_event(db_session, 'rating', rating_payload('warning', warning))
         db_session.commit()
+        backend.datamanager.invalidate_user_votes(user_id)
+        response_cache.bump()
+    finally:
+        db_session.close()
 
     return jsonify({
         'status': 'success',
@@ -395,43 +427,22 @@ def delete_warning():
     warning_id = data.get('warning_id')
 
     db_session = backend.session()
-    warning = db_session.get(Warning, warning_id)
-
-    if not warning:
-        return jsonify({'status': 'error', 'message': 'Warning not found'}), 404
-
-    existing_vote = db_session.query(WarningVote).filter_by(user_id=user_id, warning_id=warning_id, vote_type='delete').one_or_none()
-
-    if existing_vote:
-        return jsonify({'status': 'error', 'message': 'You have already voted to delete this warning'}), 409
-
-    warning.delete_votes += 1
-
-    with db_session.no_autoflush:
-        new_vote = WarningVote(user_id=user_id, warning_id=warning_id, vote_type='delete')
-        with db_lock:
-            db_session.add(new_vote)
-
-    if warning.delete_votes >= 1:  # Adjust the threshold as needed
-        with db_session.no_autoflush:
-            print("[Debug] Checking if the warning is related to any GDACS information...")
-            # Check if the warning is related to any GDACS information
-            if backend.model.is_related_to_any_gdacs(db_session, warning.disaster_type + warning.disaster_location):
-                print("[Debug] Warning is related to GDACS information, deletion aborted.")
-                with db_lock:
-                    db_session.commit()
-                return jsonify({'status': 'error', 'message': 'Warning is related to GDACS information and cannot be deleted.'}), 403
-
-            print("[Debug] Warning is not related to any GDACS information, proceeding with deletion...")
-            with db_lock:
-                for rating in warning.ratings:
-                    db_session.delete(rating)
-                db_session.delete(warning)
-                db_session.commit()
-            return jsonify({'status': 'success', 'message': 'Warning deleted successfully'}), 200
+    try:
+        delete_votes, error = apply_delete_vote(db_session, Warning, WarningVote, 'warning_id', warning_id, user_id)
+        if error == 'not_found':
+            return jsonify({'status': 'error', 'message': 'Warning not found'}), 404
+        if error == 'duplicate':
+            return jsonify({'status': 'error', 'message': 'You have already voted to delete this warning'}), 409
+
+        if delete_votes >= DELETE_VOTE_THRESHOLD:
+            # GDACS 检查需要调用 LLM，交给 worker 进程异步执行，前端通过 /api/jobs/<id> 查询结果
+            job = enqueue_delete_check(db_session, 'delete_warning', warning_id)
+            db_session.commit()
+            print(f"[Debug] Delete check queued as job {job.id}")
+            return jsonify({'status': 'pending', 'job_id': job.id, 'message': 'Vote recorded. Checking if the warning is related to any GDACS information...'}), 202
+    finally:
+        db_session.close()
 
-    with db_lock:
-        db_session.commit()
     print("[Debug] Delete vote recorded. Pending more votes.")
     return jsonify({'status': 'pending', 'message': 'Vote recorded. Pending more votes. Checking if the message is correct...'}), 202
 
@@ -445,30 +456,21 @@ def rate_message():
     rating_type = data.get('type')
 
     db_session = backend.session()
-    message = db_session.query(Result).get(message_id)
-    if not message:
-        return jsonify({'status': 'error', 'message': 'Message not found'}), 404
-
-    existing_rating = db_session.query(Rating).filter_by(user_id=user_id, message_id=message_id, type=rating_type).first()
-    if existing_rating:
-        return jsonify({'status': 'error', 'message': 'You have already rated this message'}), 400
-
-    with db_session.no_autoflush:
-        new_rating = Rating(user_id=user_id, message_id=message_id, type=rating_type, rating=rating)
-        with db_lock:
-            db_session.add(new_rating)
-
-    if rating_type == 'authenticity':
-        message.authenticity_rating += rating
-        message.authenticity_raters += 1
-    elif rating_type == 'accuracy':
-        message.accuracy_rating += rating
-        message.accuracy_raters += 1
-    else:
-        return jsonify({'status': 'error', 'message': 'Invalid rating type'}), 400
-
-    with db_lock:
+    try:
+        message, error = apply_rating(db_session, Result, Rating, 'message_id', message_id, user_id, rating_type, rating)
+        if error == 'not_found':
+            return jsonify({'status': 'error', 'message': 'Message not found'}), 404
+        if error == 'duplicate':
+            return jsonify({'status': 'error', 'message': 'You have already rated this message'}), 400
+        if error:
+            return jsonify({'status': 'error', 'message': RATING_ERRORS[error]}), 400
+
+        record_event(db_session, 'rating', rating_payload('result', message))
         db_session.commit()
+        backend.datamanager.invalidate_user_votes(user_id)
+        response_cache.bump()
+    finally:
+        db_session.close()
 
     return jsonify({
         'status': 'success',
@@ -486,44 +488,36 @@ def delete_message():
     message_id = data.get('message_id')
 
     db_session = backend.session()
-    message = db_session.get(Result, message_id)
-    if not message:
-        return jsonify({'status': 'error', 'message': 'Message not found'}), 404
-
-    existing_vote = db_session.query(Vote).filter_by(user_id=user_id, message_id=message_id, vote_type='delete').one_or_none()
-
-    if existing_vote:
-        return jsonify({'status': 'error', 'message': 'You have already voted to delete this message'}), 409
-
-    message.delete_votes += 1
-
-    with db_session.no_autoflush:
-        new_vote = Vote(user_id=user_id, message_id=message_id, vote_type='delete')
-        with db_lock:
-            db_session.add(new_vote)
-
-    if message.delete_votes >= 1:  # Adjust the threshold as needed
-        with db_session.no_autoflush:
-            print("[Debug] Checking if the message is related to any GDACS information...")
-            # Check if the message is related to any GDACS information
-            if backend.model.is_related_to_any_gdacs(db_session, message.content):
-                print("[Debug] Message is related to GDACS information, deletion aborted.")
-                with db_lock:
-                    db_session.commit()
-                return jsonify({'status': 'error', 'message': 'Message is related to GDACS information and cannot be deleted.'}), 403
-
-            print("[Debug] Message is not related to any GDACS information, proceeding with deletion...")
-            with db_lock:
-                for rating in message.ratings:
-                    db_session.delete(rating)
-                db_session.delete(message)
-                db_session.commit()
-            return jsonify({'status': 'success', 'message': 'Message deleted successfully'}), 200
-    with db_lock:
-        db_session.commit()
+    try:
+        delete_votes, error = apply_delete_vote(db_session, Result, Vote, 'message_id', message_id, user_id)
+        if error == 'not_found':
+            return jsonify({'status': 'error', 'message': 'Message not found'}), 404
+        if error == 'duplicate':
+            return jsonify({'status': 'error', 'message': 'You have already voted to delete this message'}), 409
+
+        if delete_votes >= DELETE_VOTE_THRESHOLD:
+            job = enqueue_delete_check(db_session, 'delete_result', message_id)
+            db_session.commit()
+            print(f"[Debug] Delete check queued as job {job.id}")
+            return jsonify({'status': 'pending', 'job_id': job.id, 'message': 'Vote recorded. Checking if the message is related to any GDACS information...'}), 202
+    finally:
+        db_session.close()
+
     print("[Debug] Delete vote recorded. Pending more votes.")
     return jsonify({'status': 'pending', 'message': 'Vote recorded. Pending more votes. Checking if the message is correct...'}), 202
 
+# 查询异步任务 (例如删除前的 GDACS 检查) 的状态
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    db_session = backend.session()
+    try:
+        job = db_session.get(Job, job_id)
+        if job is None:
+            return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+        return jsonify(job.to_dict()), 200
+    finally:
+        db_session.close()
+
 @app.route('/api/user-votes-and-ratings', methods=['GET'])
 @jwt_required()
 def get_user_votes_and_ratings():
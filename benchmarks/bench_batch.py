@@ -0,0 +1,84 @@
+"""
+Measure LLM classification throughput for different batch sizes with a local
+fake LLM, so no API key or network is needed.
+
+    python benchmarks/bench_batch.py --posts 200 --batch-sizes 1 5 10 20 --latency 0.5
+
+The fake LLM sleeps `latency` seconds per request plus `per_item` seconds per
+numbered post, then answers every numbered line, which approximates a chat
+completion whose cost is dominated by the round trip. Each run uses a fresh
+database, so the classification cache never hits.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.llms.base import LLM
+import database
+from class_ChatGPT import LangChainModel
+from class_DBWriter import DBWriter
+from class_LLMDispatcher import LLMDispatcher
+from class_datatypes import Topics
+
+class LatencyLLM(LLM):
+    latency: float = 0.5
+    per_item: float = 0.01
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return 'latency'
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        question = prompt.rsplit('Human:', 1)[1]
+        numbers = re.findall(r'^\s*(\d+)\. ', question, re.M)
+        time.sleep(self.latency + self.per_item * max(1, len(numbers)))
+        if not numbers:
+            return 'No'
+        return '\n'.join(f'{n}. No' for n in numbers)
+
+def run(posts, batch_size, latency, per_item, concurrency):
+    with tempfile.TemporaryDirectory() as workdir:
+        Session = database.create_session(os.path.join(workdir, 'bench.db'))
+        database.create_schema(Session)
+        db_session = Session()
+        db_session.add_all(Topics(content=f'帖子 {i}', date_time=datetime.now(), processed=False) for i in range(posts))
+        db_session.commit()
+
+        writer = DBWriter(Session, max_delay=0.05)
+        threading.Thread(target=writer.run, daemon=True).start()
+        llm = LatencyLLM(latency=latency, per_item=per_item)
+        dispatcher = LLMDispatcher(concurrency=concurrency, rpm=100000, tpm=10 ** 9)
+        model = LangChainModel(Session, 'bench', writer, batch_size=batch_size, llm=llm, dispatcher=dispatcher)
+
+        started = time.perf_counter()
+        items = db_session.query(Topics).order_by(Topics.id).all()
+        model.process_and_save_results(db_session, items, Topics)
+        elapsed = time.perf_counter() - started
+
+        unprocessed = db_session.query(Topics).filter(Topics.processed == False).count()
+        db_session.close()
+        dispatcher.executor.shutdown()
+        Session.remove()
+        return elapsed, llm.calls, unprocessed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark batched LLM classification with a fake LLM')
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 5, 10, 20])
+    parser.add_argument('--latency', type=float, default=0.5, help='simulated seconds per LLM request')
+    parser.add_argument('--per-item', type=float, default=0.01, help='simulated seconds per post in a request')
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+    results = [(batch_size, run(args.posts, batch_size, args.latency, args.per_item, args.concurrency)) for batch_size in args.batch_sizes]
+    print("batch size  seconds  posts/s  LLM calls  unprocessed")
+    for batch_size, (elapsed, calls, unprocessed) in results:
+        print(f"{batch_size:10d}  {elapsed:7.2f}  {args.posts / elapsed:7.1f}  {calls:9d}  {unprocessed:11d}")
@@ -0,0 +1,88 @@
+"""
+Measure how classification throughput scales with the number of worker
+processes claiming rows through WorkSource leases, and check that every row is
+processed exactly once.
+
+    python benchmarks/bench_leases.py --rows 400 --processes 1 2 4 --latency 0.02 --batch-size 20
+
+Each process claims batches of Topics and stands in for the LLM by sleeping
+`latency` seconds per row before writing a Result and marking the row processed.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from sqlalchemy import func, select
+from class_datatypes import Topics, Result
+from class_WorkSource import WorkSource, Lease
+
+def classify(path, latency, batch_size, ready, start):
+    Session = database.create_session(path)
+    source = WorkSource(Topics, batch_size=batch_size, lease=Lease(), Session=Session)
+    db_session = Session()
+    # 启动子进程的开销不计入结果，所有进程就绪后一起开始
+    ready.release()
+    start.wait()
+    try:
+        while True:
+            found = False
+            for batch in source.batches(db_session):
+                found = True
+                time.sleep(latency * len(batch))
+                for item in batch:
+                    db_session.add(Result(source_id=item.id, source_type='topics', content=item.content, is_disaster=False))
+                    item.processed = True
+                db_session.commit()
+            if not found:
+                break
+    finally:
+        db_session.close()
+
+def run(rows, processes, latency, batch_size):
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'bench.db')
+        Session = database.create_session(path)
+        database.create_schema(Session)
+        db_session = Session()
+        db_session.add_all(Topics(content=f'post {i}', date_time=datetime.now(), processed=False) for i in range(rows))
+        db_session.commit()
+
+        context = multiprocessing.get_context('spawn')
+        ready = context.Semaphore(0)
+        start = context.Event()
+        workers = [context.Process(target=classify, args=(path, latency, batch_size, ready, start)) for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        for _ in workers:
+            ready.acquire()
+        started = time.perf_counter()
+        start.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        results = db_session.scalar(select(func.count(Result.id)))
+        distinct = db_session.scalar(select(func.count(func.distinct(Result.source_id))))
+        unprocessed = db_session.scalar(select(func.count(Topics.id)).where(Topics.processed == False))
+        db_session.close()
+        Session.remove()
+        return elapsed, results, distinct, unprocessed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark lease-based classification across processes')
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--latency', type=float, default=0.002, help='simulated LLM seconds per row')
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+    print("processes  seconds  rows/s  results  duplicates  unprocessed")
+    for processes in args.processes:
+        elapsed, results, distinct, unprocessed = run(args.rows, processes, args.latency, args.batch_size)
+        print(f"{processes:9d}  {elapsed:7.2f}  {args.rows / elapsed:6.0f}  {results:7d}  {results - distinct:10d}  {unprocessed:11d}")
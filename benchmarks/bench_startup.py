@@ -0,0 +1,79 @@
+"""
+Measure time-to-first-request and peak RSS of the API process, and time-to-ready
+and peak RSS of the worker with a chosen set of subsystems.
+
+    python benchmarks/bench_startup.py --runs 3
+    python benchmarks/bench_startup.py --target worker --disable classifier jobs spider gdacs
+
+Every run starts a fresh interpreter in a temporary directory holding a copy of
+config.ini.sample and an empty data/forum.db, so imports and the schema are paid
+the same way as in production. The heavy modules that ended up imported are
+listed, so a subsystem that loads them eagerly shows up even on a machine
+without a GPU.
+"""
+import argparse
+import configparser
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['langchain', 'langchain_openai', 'transformers', 'torch', 'tensorflow', 'selenium', 'nltk']
+
+BACKEND = """
+import backend
+client = backend.app.test_client()
+response = client.get('/api/warnings?disasterType=all&limit=20')
+assert response.status_code == 200, response.status_code
+"""
+
+WORKER = """
+import worker
+worker.Worker('data/forum.db')
+"""
+
+REPORT = """
+import json, resource, sys
+# ru_maxrss 在 Linux 上以 KiB 为单位
+print('BENCH ' + json.dumps({
+    'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': sorted(name for name in %r if name in sys.modules),
+}))
+"""
+
+def prepare(workdir, disable):
+    config = configparser.ConfigParser()
+    config.read(os.path.join(ROOT, 'config.ini.sample'))
+    for name in disable:
+        config['Subsystems'][name] = 'false'
+    with open(os.path.join(workdir, 'config.ini'), 'w') as f:
+        config.write(f)
+    os.mkdir(os.path.join(workdir, 'data'))
+
+def measure(target, disable):
+    """在新的解释器中启动一次，返回 (秒数, 峰值 RSS MiB, 已导入的重量级模块)"""
+    code = (BACKEND if target == 'backend' else WORKER) + REPORT % HEAVY_MODULES
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare(workdir, disable)
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr.strip() else f'exit code {output.returncode}')
+    report = json.loads(output.stdout.rsplit('BENCH ', 1)[1])
+    return elapsed, report['rss'], report['heavy']
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark API and worker startup')
+    parser.add_argument('--target', choices=['backend', 'worker'], default='backend')
+    parser.add_argument('--disable', nargs='*', default=[], help='subsystems to switch off in [Subsystems]')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    print("run  seconds  max RSS MiB  heavy modules")
+    for run in range(1, args.runs + 1):
+        elapsed, rss, heavy = measure(args.target, args.disable)
+        print(f"{run:3d}  {elapsed:7.2f}  {rss:11.0f}  {', '.join(heavy) or '-'}")
@@ -1,16 +1,47 @@
+import re
 import time
-from sqlalchemy.exc import SQLAlchemyError, OperationalError
-from class_datatypes import Topics, Replies, UsersComments, Result, Warning, GDACS
+from sqlalchemy.exc import SQLAlchemyError
+from class_datatypes import Topics, Replies, UsersComments, Result, Warning
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from langchain.chat_models import ChatOpenAI
-from lock import db_lock
+from class_EventStream import record_event, warning_payload, result_payload
+from class_LLMDispatcher import LLMDispatcher
+from class_ClassificationCache import ClassificationCache, content_hash, prompt_version
+from class_GDACSIndex import GDACSIndex
+from class_WarningIndex import WarningIndex
+from class_WorkSource import WorkSource
+
+NOT_DISASTER = (False, "", "", "")
+BATCH_LINE = re.compile(r'^\s*(\d+)\s*[.)、:：]\s*(.*)$')
+# GDACS 判定的回答：开头是用空格分隔的编号，例如 "1 3"
+GDACS_ANSWER = re.compile(r'^(\d+(?: +\d+)*)\.?(?!\S)')
+
+def parse_gdacs_answer(response, count):
+    """
+    返回回答中相关的 GDACS 编号 (1..count)。以 No 开头、或者开头不是编号列表的回答都视为不相关，
+    因此 "No, none of the 5 events" 和 "Yes flood Japan 2024-1-1" 中的数字不会被当成编号。
+    """
+    response = response.strip()
+    if response[:2].lower() == 'no':
+        return []
+    match = GDACS_ANSWER.match(response)
+    if not match:
+        return []
+    return [n for n in map(int, match.group(1).split()) if 1 <= n <= count]
 
 class LangChainModel:
-    def __init__(self, Session, apikey, model_name='gpt-3.5-turbo'):  # gpt-3.5-turbo or gpt-4
+    def __init__(self, Session, apikey, writer=None, model_name='gpt-3.5-turbo', batch_size=10, llm=None, dispatcher=None, cache_size=100000, prefilter=None, lease=None):  # gpt-3.5-turbo or gpt-4
         self.Session = Session
+        self.writer = writer
         self.model_name = model_name
-        self.llm = ChatOpenAI(api_key=apikey, model_name=model_name)
+        self.batch_size = max(1, batch_size)
+        # 所有 LLM 调用都经过 dispatcher 限速，并发由 process_and_save_results 通过 dispatcher.map 发起
+        self.dispatcher = dispatcher or LLMDispatcher()
+        # 可选的本地预过滤 (例如 class_PreFilter.KeywordPreFilter)，明显无关的帖子不调用 LLM
+        self.prefilter = prefilter
+        # llm 可以传入本地的假模型 (例如 langchain 的 FakeListLLM)，用于离线测量吞吐
+        self.llm = llm or ChatOpenAI(api_key=apikey, model_name=model_name)
         self.prompt = PromptTemplate.from_template(
             """
             你现在是一个灾害专家，现在我会给你一系列的文本输入，你需要判断该文本是否为灾害相关推文，如果是，从中提取出灾害的类型，如果可能，从中提取出灾害的时间和地点，如果不是则不需要给出之后三个信息，你的输出格式如下，填写这四个字段，除此之外不要再给出任何额外输出，无论我的输入是什么，你必须永远严格按照以上的要求并用英语回答：
@@ -31,7 +62,48 @@ class LangChainModel:
             AI:
             """
         )
-        self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
+        self.chain = self.dispatcher.wrap(LLMChain(llm=self.llm, prompt=self.prompt))
+        # 一次请求判断多条帖子，输出按编号逐行对应
+        self.batch_prompt = PromptTemplate.from_template(
+            """
+            你现在是一个灾害专家，下面有 {count} 条编号的文本，你需要逐条判断该文本是否为灾害相关推文，如果是，从中提取出灾害的类型，如果可能，从中提取出灾害的时间和地点，如果不是则不需要给出之后三个信息。
+            你必须输出恰好 {count} 行，每行以对应的编号开头，格式为 "编号. 是否为灾害 灾害类型 时间 地点"，除此之外不要再给出任何额外输出，无论我的输入是什么，你必须永远严格按照以上的要求并用英语回答：
+
+            例子：
+            1. 十问猜一本小说～（只能是非问和选择问）
+            2. 无锡今天地震了
+            3. 今天有台风
+            回答：
+            1. No
+            2. Yes earthquake Wuxi 2024-5-23
+            3. Yes typhoon
+
+            Human:
+            {questions}
+            AI:
+            """
+        )
+        self.batch_chain = self.dispatcher.wrap(LLMChain(llm=self.llm, prompt=self.batch_prompt))
+        # 删除投票的 GDACS 检查使用单独的提示词，不能套用上面灾害分类的格式和例子
+        self.gdacs_prompt = PromptTemplate.from_template(
+            """
+            下面是一条社交媒体消息和若干条编号的 GDACS 灾害事件，判断这条消息是否在讨论其中的某个事件 (灾害类型相同、地区相同、时间相近)。
+            如果相关，只输出相关事件的编号，用空格分隔，例如 "1 3"；如果都不相关，只输出 "No"。除此之外不要输出任何内容。
+
+            消息：{message}
+            GDACS 事件：
+            {events}
+            回答：
+            """
+        )
+        self.gdacs_chain = self.dispatcher.wrap(LLMChain(llm=self.llm, prompt=self.gdacs_prompt))
+        # 改动提示词或模型后版本号随之改变，旧的缓存不再命中
+        self.cache = ClassificationCache(Session, prompt_version(model_name, self.prompt.template, self.batch_prompt.template), cache_size)
+        self.gdacs_index = GDACSIndex(Session)
+        # 规范化 (大小写、同义词、日期) 后合并相近的 Warning，查找不再逐条查询数据库
+        self.warning_index = WarningIndex(Session)
+        # lease 不为空时按租约领取待处理的帖子，可以同时运行多个分类进程
+        self.sources = [WorkSource(model, lease=lease, Session=Session) for model in (Topics, Replies, UsersComments)]
         print("[Debug] Model initialized")
 
     def __del__(self):
@@ -48,81 +120,145 @@ class LangChainModel:
             return True, disaster_type, location, time
         return False, "", "", ""
 
+    def classify(self, content):
+        return self.parse_response(self.chain.run({"question": content}))
+
+    def parse_batch_response(self, response, count):
+        """解析编号输出，返回长度为 count 的列表，无法解析的条目为 None"""
+        parsed = [None] * count
+        for line in response.splitlines():
+            match = BATCH_LINE.match(line)
+            if not match:
+                continue
+            index = int(match.group(1)) - 1
+            answer = match.group(2).strip()
+            if 0 <= index < count and parsed[index] is None and answer.split()[:1] in (['Yes'], ['No']):
+                parsed[index] = self.parse_response(answer)
+        return parsed
+
+    def classify_batch(self, contents):
+        """一次 LLM 调用判断多条内容，解析失败的条目退回逐条调用"""
+        if len(contents) == 1:
+            return [self.classify(contents[0])]
+        # 帖子内的换行会打乱编号，压成一行
+        questions = "\n".join(f"{i}. {' '.join(content.split())}" for i, content in enumerate(contents, 1))
+        try:
+            response = self.batch_chain.run({"count": len(contents), "questions": questions})
+            parsed = self.parse_batch_response(response, len(contents))
+        except Exception as e:
+            print(f"[Debug] Batch classification failed, falling back to single calls: {e}")
+            parsed = [None] * len(contents)
+
+        failed = [i for i, p in enumerate(parsed) if p is None]
+        if failed:
+            print(f"[Debug] {len(failed)} of {len(contents)} batch answers unparsable, retrying them one by one")
+        for i in failed:
+            parsed[i] = self.classify(contents[i])
+        return parsed
+
     def create_warning_if_needed(self, db_session, is_disaster, disaster_type, disaster_location, disaster_time):
         if is_disaster:
-            existing_warning = db_session.query(Warning).filter(
-                Warning.disaster_type == disaster_type,
-                Warning.disaster_location == disaster_location,
-                Warning.disaster_time == disaster_time,
-            ).first()
-            if not existing_warning:
+            warning_id = self.warning_index.find(db_session, disaster_type, disaster_location, disaster_time)
+            if warning_id is None:
                 with db_session.no_autoflush:
                     new_warning = Warning(
                         disaster_type=disaster_type,
                         disaster_location=disaster_location,
                         disaster_time=disaster_time,
                     )
-                    with db_lock:
-                        db_session.add(new_warning)
-                        db_session.flush()  # Ensure the warning ID is available
+                    db_session.add(new_warning)
+                    db_session.flush()  # Ensure the warning ID is available
+                    record_event(db_session, 'warning', warning_payload(new_warning))
+                self.warning_index.add_pending(db_session, new_warning.id, disaster_type, disaster_location, disaster_time)
                 return new_warning.id
-            return existing_warning.id
+            return warning_id
         return None
 
-    def process_and_save_results(self, db_session, items, source_type, max_retries=5):
+    def save_result(self, source_type, source_id, content, date_time, parsed):
+        """返回交给 DBWriter 的写操作：保存分类结果并把源记录标记为已处理"""
+        is_disaster, disaster_type, disaster_location, disaster_time = parsed
+        def write(db_session):
+            if is_disaster:
+                warning_id = self.create_warning_if_needed(db_session, is_disaster, disaster_type, disaster_location, disaster_time)
+                new_result = Result(
+                    source_id=source_id,
+                    content=content,  # Use original content
+                    date_time=date_time,
+                    is_disaster=1,
+                    probability=1.0,  # Assume high confidence for simplicity
+                    disaster_type=disaster_type,
+                    source_type=source_type.__tablename__,
+                    warning_id=warning_id
+                )
+                db_session.add(new_result)
+                db_session.flush()  # Ensure the result ID is available for the event
+                record_event(db_session, 'result', result_payload(new_result))
+            # Ensure the processed flag is set for all items
+            db_session.query(source_type).filter(source_type.id == source_id).update({'processed': True}, synchronize_session=False)
+        return write
+
+    def process_and_save_results(self, db_session, items, source_type):
+        pending = []
+        started = time.monotonic()
+        # 按规范化内容的 hash 分组，相同的帖子只请求一次 LLM
+        groups = {}
         for item in items:
-            retries = 0
-            while retries < max_retries:
-                try:
-                    original = db_session.query(source_type).filter(source_type.id == item.id).first()
-                    if original:
-                        question = item.content
-                        response = self.chain.run({"question": question})
-                        is_disaster, disaster_type, disaster_location, disaster_time = self.parse_response(response)
-                        if is_disaster:
-                            with db_session.no_autoflush:
-                                warning_id = self.create_warning_if_needed(db_session, is_disaster, disaster_type, disaster_location, disaster_time)
-                                new_result = Result(
-                                    source_id=original.id,
-                                    content=original.content,  # Use original content
-                                    date_time=item.date_time,
-                                    is_disaster=1,
-                                    probability=1.0,  # Assume high confidence for simplicity
-                                    disaster_type=disaster_type,
-                                    source_type=source_type.__tablename__,
-                                    warning_id=warning_id
-                                )
-                                with db_lock:
-                                    db_session.add(new_result)
-                        item.processed = True  # Ensure the processed flag is set for all items
-                        db_session.commit()  # Commit after processing each item
-                        print(f"Processed {source_type.__tablename__} {original.id}")
-                        break  # 成功处理后跳出重试循环
-                except OperationalError as e:
-                    retries += 1
-                    print(f"Database is locked, retrying ({retries}/{max_retries})...")
-                    time.sleep(1)
-                except Exception as e:
-                    print(f"Failed processing {source_type.__tablename__} {original.id}: {str(e)}")
-                    db_session.rollback()  # Rollback if any error occurs
-                    raise
+            groups.setdefault(content_hash(item.content), []).append(item)
+
+        def save(group, parsed):
+            # 写入交给 DBWriter 合并提交，不必等待上一批落盘再调用 LLM
+            for item in group:
+                op = self.writer.submit(self.save_result(source_type, item.id, item.content, item.date_time, parsed), invalidates_cache=parsed[0])
+                pending.append((item.id, op))
+
+        if self.prefilter:
+            for h in [h for h, group in groups.items() if not self.prefilter.accepts(group[0].content)]:
+                save(groups.pop(h), NOT_DISASTER)
+
+        cached = self.cache.lookup(groups.keys())
+        if cached:
+            self.writer.submit(self.cache.touch(cached.keys()))
+        for h, parsed in cached.items():
+            save(groups[h], parsed)
+
+        misses = [h for h in groups if h not in cached]
+        batches = [misses[start:start + self.batch_size] for start in range(0, len(misses), self.batch_size)]
+        # 多个批次同时请求 LLM，结果按原顺序返回
+        classified = self.dispatcher.map(lambda batch: self.classify_batch([groups[h][0].content for h in batch]), batches)
+        for batch in batches:
+            try:
+                results = next(classified)
+            except Exception as e:
+                print(f"Failed processing {source_type.__tablename__} {groups[batch[0]][0].id}-{groups[batch[-1]][0].id}: {str(e)}")
+                raise
+            self.writer.submit(self.cache.store(zip(batch, results)))
+            for h, parsed in zip(batch, results):
+                save(groups[h], parsed)
+
+        for source_id, op in pending:
+            op.wait()
+            print(f"Processed {source_type.__tablename__} {source_id}")
+        if pending:
+            elapsed = time.monotonic() - started
+            print(f"[Debug] Classified {len(pending)} {source_type.__tablename__} in {elapsed:.1f}s ({len(pending) / max(elapsed, 1e-6):.2f} posts/s)")
+            print(f"[Debug] Classification cache: {self.cache.stats()}")
+            if self.prefilter:
+                print(f"[Debug] Pre-filter: {self.prefilter.stats()}")
 
     def predict_and_save(self):
         while True:
             db_session = self.Session()
             try:
                 print("[Debug] Checking for new data to process...")
-                topics = db_session.query(Topics).filter(Topics.processed == False).all()
-                replies = db_session.query(Replies).filter(Replies.processed == False).all()
-                comments = db_session.query(UsersComments).filter(UsersComments.processed == False).all()
-
                 with db_session.no_autoflush:
-                    self.process_and_save_results(db_session, topics, Topics)
-                    self.process_and_save_results(db_session, replies, Replies)
-                    self.process_and_save_results(db_session, comments, UsersComments)
+                    for source in self.sources:
+                        for items in source.batches(db_session):
+                            self.process_and_save_results(db_session, items, source.model)
 
-                print("[Debug] Model write successful, sleeping for 10 seconds...")
-                time.sleep(10)
+                # 积压较多时不休眠，直接处理下一轮
+                if not any(source.has_more for source in self.sources):
+                    print("[Debug] Model write successful, sleeping for 10 seconds...")
+                    time.sleep(10)
             except SQLAlchemyError as db_err:
                 db_session.rollback()
                 print(f"Database error during processing: {db_err}")
@@ -133,24 +269,24 @@ class LangChainModel:
                 db_session.close()
                 print("[Debug] Database session closed.")
     
-    def is_related_to_gdacs(self, message_content, gdacs_content):
-        question = f"Is the following message related to this GDACS information?\nMessage: {message_content}\nGDACS: {gdacs_content}\nYou must answer 'Yes' or 'No' only, no other extra sentences or vocabularies:"
-        response = self.chain.run({"question": question})
-        first_word = response.strip().split()[0]
-        print(f"[Debug] GDACS related check response: {first_word}")
-        return first_word.lower() == "yes"
-
-    def is_related_to_any_gdacs(self, db_session, message_content):
+    def is_related_to_any_gdacs(self, db_session, message_content, when=None):
+        """
+        先用倒排索引把 GDACS 缩小到最多 top_k 个候选，再用一次 LLM 调用判断，
+        没有候选时不调用 LLM。db_session 保留以兼容调用方，索引自己管理会话。
+        """
         print("[Debug] Checking if message is related to any GDACS information...")
-        with db_session.no_autoflush:
-            gdacs_messages = db_session.query(GDACS).all()
-            for gdacs_message in gdacs_messages:
-                if self.is_related_to_gdacs(message_content, gdacs_message.content):
-                    print("[Debug] Message is related to GDACS information.")
-                    return True
-        print("[Debug] Message is not related to any GDACS information.")
-        return False
+        candidates = self.gdacs_index.candidates(message_content, when)
+        if not candidates:
+            print("[Debug] No GDACS candidates, message is not related to any GDACS information.")
+            return False
+        listing = "\n".join(f"{i}. {c.content} ({c.location}, {c.date_time})" for i, c in enumerate(candidates, 1))
+        response = self.gdacs_chain.run({"message": message_content, "events": listing})
+        related = parse_gdacs_answer(response, len(candidates))
+        print(f"[Debug] GDACS related check over {len(candidates)} candidates: {response.strip()}")
+        return bool(related)
     
     def run(self):
         print("[Debug] Model activated")
+        self.cache.purge_stale()
+        self.warning_index.refresh()
         self.predict_and_save()
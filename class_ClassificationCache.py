@@ -0,0 +1,78 @@
+import hashlib
+import threading
+import unicodedata
+from sqlalchemy import delete
+from class_datatypes import ClassificationCache as CacheEntry
+from class_LRUTable import LRUTable
+
+def normalize_content(content):
+    """全角转半角、转小写并合并空白，使只差格式的重复帖子命中同一条缓存"""
+    return ' '.join(unicodedata.normalize('NFKC', content or '').lower().split())
+
+def content_hash(content):
+    return hashlib.sha256(normalize_content(content).encode('utf-8')).hexdigest()
+
+def prompt_version(*templates):
+    """由提示词和模型名计算版本号，提示词改动后旧的缓存自动失效"""
+    return hashlib.sha1('\0'.join(templates).encode('utf-8')).hexdigest()[:16]
+
+class ClassificationCache:
+    """
+    Persistent cache of parsed LLM classifications, keyed by the hash of the
+    normalized content plus the prompt version. Lookups read directly; stores,
+    hit bookkeeping and LRU eviction are returned as write functions so they can
+    go through the DBWriter together with the results.
+    """
+    def __init__(self, Session, version, max_entries=100000):
+        self.Session = Session
+        self.version = version
+        self.max_entries = max_entries
+        self.table = LRUTable(Session, CacheEntry, CacheEntry.content_hash, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        print(f"[Debug] ClassificationCache initialized, prompt version {version}")
+
+    def lookup(self, hashes):
+        """返回 {hash: (is_disaster, disaster_type, disaster_location, disaster_time)}"""
+        hashes = set(hashes)
+        rows = self.table.lookup(
+            hashes,
+            (CacheEntry.is_disaster, CacheEntry.disaster_type, CacheEntry.disaster_location, CacheEntry.disaster_time),
+            CacheEntry.prompt_version == self.version,
+        )
+        found = {}
+        for h, is_disaster, disaster_type, disaster_location, disaster_time in rows:
+            found[h] = (bool(is_disaster), disaster_type or "", disaster_location or "", disaster_time or "")
+        with self.lock:
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def touch(self, hashes):
+        """返回写操作：更新命中条目的 LRU 时间和命中次数"""
+        return self.table.touch(hashes, CacheEntry.prompt_version == self.version)
+
+    def store(self, entries):
+        """返回写操作：保存 {hash: parsed}，超出容量时按 last_used 淘汰最久未用的条目"""
+        return self.table.insert(
+            dict(content_hash=h, prompt_version=self.version, is_disaster=is_disaster,
+                 disaster_type=disaster_type, disaster_location=disaster_location, disaster_time=disaster_time)
+            for h, (is_disaster, disaster_type, disaster_location, disaster_time) in dict(entries).items()
+        )
+
+    def purge_stale(self):
+        """删除旧提示词版本的条目"""
+        db_session = self.Session()
+        try:
+            deleted = db_session.execute(delete(CacheEntry).where(CacheEntry.prompt_version != self.version)).rowcount
+            db_session.commit()
+            if deleted:
+                print(f"[Debug] Purged {deleted} classification cache entries from older prompt versions")
+        finally:
+            db_session.close()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
@@ -0,0 +1,104 @@
+import queue
+import threading
+import time
+from class_ResponseCache import response_cache
+
+class WriteOp:
+    """提交给 DBWriter 的一次写操作，生产者可以等待它完成并取得返回值"""
+    def __init__(self, fn, invalidates_cache=False):
+        self.fn = fn
+        self.invalidates_cache = invalidates_cache
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            raise TimeoutError("Database write did not complete in time")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class DBWriter:
+    """
+    Single writer thread for pipeline ingestion.
+
+    Producers submit functions taking a session; the writer drains them from a
+    bounded queue and applies up to max_batch of them in one transaction, or
+    whatever has arrived once max_delay has passed since the first one. If a
+    batch fails it is replayed one operation per transaction so that a single
+    bad row only fails its own producer. Operations may run more than once
+    and should return plain values rather than ORM instances.
+    """
+    def __init__(self, Session, max_batch=200, max_delay=0.5, queue_size=5000):
+        self.Session = Session
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.commits = 0
+        self.ops_written = 0
+        print("[Debug] DBWriter initialized")
+
+    def submit(self, fn, invalidates_cache=False):
+        """排入一次写操作，队列满时阻塞生产者 (背压)"""
+        op = WriteOp(fn, invalidates_cache)
+        self.queue.put(op)
+        return op
+
+    def execute(self, fn, invalidates_cache=False, timeout=None):
+        """提交并等待写操作完成，返回 fn 的返回值"""
+        return self.submit(fn, invalidates_cache).wait(timeout)
+
+    def next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def apply(self, ops):
+        """在一个事务中执行 ops，成功返回 None，失败时回滚并返回异常"""
+        db_session = self.Session()
+        try:
+            results = [op.fn(db_session) for op in ops]
+            db_session.commit()
+            self.commits += 1
+        except Exception as e:
+            db_session.rollback()
+            return e
+        finally:
+            db_session.close()
+
+        for op, result in zip(ops, results):
+            op.result = result
+            op.done.set()
+        if any(op.invalidates_cache for op in ops):
+            response_cache.bump()
+        return None
+
+    def fail(self, op, error):
+        print(f"[Debug] DBWriter operation failed: {error}")
+        op.error = error
+        op.done.set()
+
+    def run(self):
+        print("[Debug] DBWriter activated")
+        while True:
+            batch = self.next_batch()
+            error = self.apply(batch)
+            if error is not None:
+                if len(batch) == 1:
+                    self.fail(batch[0], error)
+                else:
+                    print(f"[Debug] DBWriter batch of {len(batch)} failed, retrying operations one by one")
+                    for op in batch:
+                        op_error = self.apply([op])
+                        if op_error is not None:
+                            self.fail(op, op_error)
+            self.ops_written += len(batch)
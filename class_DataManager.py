@@ -1,11 +1,150 @@
-from class_datatypes import Result, GDACS
-from sqlalchemy import desc, asc, Boolean
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from class_datatypes import Result, GDACS, Warning, Vote, WarningVote, Rating, WarningRating
+from sqlalchemy import desc, asc, and_, or_, Boolean, DateTime, select, literal, union_all
+from sqlalchemy.orm import selectinload
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# 每个分页接口允许 orderBy 使用的列，其它值返回 400
+SORTABLE_COLUMNS = {
+    Warning: ('id', 'disaster_type', 'disaster_location', 'disaster_time', 'authenticity_rating', 'accuracy_rating', 'authenticity_raters', 'accuracy_raters', 'delete_votes'),
+    GDACS: ('id', 'date_time', 'location', 'source_type'),
+}
+
+def encode_cursor(value, row_id):
+    """把 (排序列的值, id) 编码为不透明的游标字符串"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor, column):
+    """解析游标，返回 (排序列的值, id)，游标无效时抛出 ValueError"""
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def parse_limit(limit):
+    """把请求参数中的 limit 限制在 [1, MAX_PAGE_SIZE] 内"""
+    try:
+        limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def keyset_paginate(query, model, order_by, order_desc=True, limit=None, after=None):
+    """
+    按 (order_by, id) 做 keyset 分页，返回 (rows, next_cursor)，最后一页的 next_cursor 为 None。
+    与 OFFSET 不同，翻到很深的页也和第一页一样快。
+    order_by 必须在该模型的 SORTABLE_COLUMNS 中，否则抛出 ValueError；为空时按 id 排序。
+    """
+    limit = parse_limit(limit)
+    if order_by and order_by not in SORTABLE_COLUMNS.get(model, ('id',)):
+        raise ValueError(f"Cannot sort by {order_by}")
+    column = getattr(model, order_by) if order_by else model.id
+    order_function = desc if order_desc else asc
+
+    if after:
+        value, last_id = decode_cursor(after, column)
+        id_after = model.id < last_id if order_desc else model.id > last_id
+        # SQLite 升序时 NULL 排在最前，降序时排在最后
+        if value is None:
+            if order_desc:
+                query = query.filter(column.is_(None), id_after)
+            else:
+                query = query.filter(or_(column.isnot(None), and_(column.is_(None), id_after)))
+        else:
+            value_after = column < value if order_desc else column > value
+            tie = and_(column == value, id_after)
+            if order_desc:
+                query = query.filter(or_(value_after, tie, column.is_(None)))
+            else:
+                query = query.filter(or_(value_after, tie))
+
+    query = query.order_by(order_function(column), order_function(model.id))
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, column.key), last.id)
+    return rows, next_cursor
+
+class UserVotes:
+    """某个用户投过的票和评过的分，warning 和 result 都是 {(id, 类型)} 集合"""
+    def __init__(self, warning=None, result=None):
+        self.warning = warning or set()
+        self.result = result or set()
+
+    def flags(self, kind, item_id):
+        voted = self.warning if kind == 'warning' else self.result
+        return {
+            'hasVotedAuthenticity': (item_id, 'authenticity') in voted,
+            'hasVotedAccuracy': (item_id, 'accuracy') in voted,
+            'hasVotedDelete': (item_id, 'delete') in voted,
+        }
+
+NO_VOTES = UserVotes()
 
 class DataManager:
-    def __init__(self, Session):
+    def __init__(self, Session, user_votes_size=1024, user_votes_ttl=60):
         self.Session = Session
+        # user_id -> (读取时间, UserVotes)，本用户投票时失效；TTL 兜底其它进程中的投票
+        self.user_votes = OrderedDict()
+        self.user_votes_size = user_votes_size
+        self.user_votes_ttl = user_votes_ttl
+        self.user_votes_lock = threading.Lock()
         print("[Debug] DataManager initialized")
 
+    def load_user_votes(self, user_id):
+        """用一条 UNION ALL 查询取出用户的全部投票和评分"""
+        query = union_all(
+            select(literal('warning'), WarningVote.warning_id, WarningVote.vote_type).where(WarningVote.user_id == user_id),
+            select(literal('warning'), WarningRating.warning_id, WarningRating.type).where(WarningRating.user_id == user_id),
+            select(literal('result'), Vote.message_id, Vote.vote_type).where(Vote.user_id == user_id),
+            select(literal('result'), Rating.message_id, Rating.type).where(Rating.user_id == user_id),
+        )
+        db_session = self.Session()
+        try:
+            votes = UserVotes()
+            for kind, item_id, vote_type in db_session.execute(query):
+                (votes.warning if kind == 'warning' else votes.result).add((item_id, vote_type))
+            return votes
+        finally:
+            db_session.close()
+
+    def get_user_votes(self, user_id):
+        if not user_id:
+            return NO_VOTES
+        with self.user_votes_lock:
+            cached = self.user_votes.get(user_id)
+            if cached and time.monotonic() - cached[0] < self.user_votes_ttl:
+                self.user_votes.move_to_end(user_id)
+                return cached[1]
+        loaded_at = time.monotonic()
+        votes = self.load_user_votes(user_id)
+        with self.user_votes_lock:
+            self.user_votes[user_id] = (loaded_at, votes)
+            self.user_votes.move_to_end(user_id)
+            while len(self.user_votes) > self.user_votes_size:
+                self.user_votes.popitem(last=False)
+        return votes
+
+    def invalidate_user_votes(self, user_id):
+        with self.user_votes_lock:
+            self.user_votes.pop(user_id, None)
+
     def get_data(self, filters=None, order_by=None, order_desc=True):
         db_session = self.Session()
         try:
@@ -30,18 +169,26 @@ class DataManager:
         finally:
             db_session.close()
 
-    def get_data_gdacs(self, order_by=None, order_desc=True):
+    def get_warnings(self, disaster_type=None, order_by='disaster_time', order_desc=True, limit=None, after=None):
+        """按 keyset 分页读取 Warning，关联的 Result 通过 selectinload 一次取出"""
         db_session = self.Session()
         try:
-            query = db_session.query(GDACS)
-            # Apply sorting if the attribute exists in GDACS
-            if order_by and hasattr(GDACS, order_by):
-                order_function = desc if order_desc else asc
-                query = query.order_by(order_function(getattr(GDACS, order_by)))
+            query = db_session.query(Warning).options(selectinload(Warning.results))
+            if disaster_type:
+                query = query.filter(Warning.disaster_type == disaster_type)
+            return keyset_paginate(query, Warning, order_by, order_desc, limit, after)
+        finally:
+            db_session.close()
 
-            return query.all()
+    def get_data_gdacs(self, order_by=None, order_desc=True, limit=None, after=None):
+        db_session = self.Session()
+        try:
+            query = db_session.query(GDACS)
+            return keyset_paginate(query, GDACS, order_by, order_desc, limit, after)
+        except ValueError:
+            raise
         except Exception as e:
             print(f"Error during processing: {e}")
-            return []
+            return [], None
         finally:
             db_session.close()
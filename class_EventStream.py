@@ -0,0 +1,163 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from class_datatypes import Event
+from class_ResponseCache import response_cache
+
+# 同进程内的写入方通过它唤醒 EventBroker，跨进程的写入由轮询兜底
+new_event = threading.Event()
+
+def record_event(db_session, kind, payload):
+    """
+    Append an event to the outbox table. The row is committed together with
+    the caller's transaction, so subscribers never see events for rolled back writes.
+    """
+    db_session.add(Event(kind=kind, payload=json.dumps(payload, ensure_ascii=False), date_time=datetime.now()))
+    new_event.set()
+
+def warning_payload(warning):
+    return {
+        'id': warning.id,
+        'disaster_type': warning.disaster_type,
+        'disaster_location': warning.disaster_location,
+        'disaster_time': warning.disaster_time,
+    }
+
+def result_payload(result):
+    return {
+        'id': result.id,
+        'warning_id': result.warning_id,
+        'content': result.content,
+        'is_disaster': result.is_disaster,
+        'disaster_type': result.disaster_type,
+        'probability': result.probability,
+        'source_type': result.source_type,
+        'source_id': result.source_id,
+        'date_time': result.date_time.isoformat() if result.date_time else None,
+    }
+
+def gdacs_payload(gdacs):
+    return {
+        'id': gdacs.id,
+        'content': gdacs.content,
+        'date_time': gdacs.date_time.isoformat() if gdacs.date_time else None,
+        'source_type': gdacs.source_type or 'GDACS',
+        'location': gdacs.location,
+    }
+
+def format_sse(event_id, kind, payload):
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+
+class EventBroker:
+    """
+    把 events 表中的新事件推送给所有 SSE 订阅者。
+    只有一个轮询线程访问数据库，每个连接只持有一个队列；
+    配合 gevent 等协程 worker 运行时，空闲连接不占用操作系统线程。
+    """
+    def __init__(self, Session, poll_interval=1.0, keepalive=15, queue_size=1000, retention=timedelta(days=1)):
+        self.Session = Session
+        self.poll_interval = poll_interval
+        self.keepalive = keepalive
+        self.queue_size = queue_size
+        self.retention = retention
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.last_id = 0
+        self.last_prune = 0
+        print("[Debug] EventBroker initialized")
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            self.subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.discard(q)
+
+    def fetch_events(self, after_id, limit=500):
+        db_session = self.Session()
+        try:
+            events = db_session.query(Event).filter(Event.id > after_id).order_by(Event.id).limit(limit).all()
+            return [(e.id, e.kind, e.payload) for e in events]
+        finally:
+            db_session.close()
+
+    def latest_event_id(self):
+        db_session = self.Session()
+        try:
+            latest = db_session.query(Event.id).order_by(Event.id.desc()).first()
+            return latest[0] if latest else 0
+        finally:
+            db_session.close()
+
+    def publish(self, events):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for q in subscribers:
+            for event in events:
+                try:
+                    q.put_nowait(event)
+                except queue.Full:
+                    # 客户端读得太慢，断开它，浏览器会带着 Last-Event-ID 重连
+                    self.unsubscribe(q)
+                    q.get_nowait()
+                    q.put_nowait(None)
+                    break
+
+    def prune(self):
+        db_session = self.Session()
+        try:
+            db_session.query(Event).filter(Event.date_time < datetime.now() - self.retention).delete()
+            db_session.commit()
+        except Exception as e:
+            db_session.rollback()
+            print(f"[Debug] Event pruning failed: {e}")
+        finally:
+            db_session.close()
+
+    def stream(self, last_event_id=None):
+        """SSE 生成器，先补发 Last-Event-ID 之后错过的事件，再持续推送新事件"""
+        q = self.subscribe()
+        replayed_id = 0
+        try:
+            if last_event_id:
+                for event in self.fetch_events(int(last_event_id)):
+                    replayed_id = event[0]
+                    yield format_sse(*event)
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = q.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                if event[0] <= replayed_id:
+                    continue
+                yield format_sse(*event)
+        finally:
+            self.unsubscribe(q)
+
+    def run(self):
+        print("[Debug] EventBroker activated")
+        self.last_id = self.latest_event_id()
+        while True:
+            new_event.wait(self.poll_interval)
+            new_event.clear()
+            try:
+                events = self.fetch_events(self.last_id)
+                if events:
+                    self.last_id = events[-1][0]
+                    # 事件可能来自 worker 或其它 API 进程，本进程的响应缓存随之失效
+                    response_cache.bump()
+                    self.publish(events)
+                if time.time() - self.last_prune > 3600:
+                    self.last_prune = time.time()
+                    self.prune()
+            except Exception as e:
+                print(f"[Debug] EventBroker poll failed: {e}")
@@ -0,0 +1,105 @@
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from class_datatypes import GDACS
+from class_ClassificationCache import normalize_content
+from database import independent_session
+from class_PreFilter import AhoCorasick
+
+# 别名 -> 规范化的键。事件类型对应 GDACS 的 EQ/TC/FL/VO/DR/WF，国家名覆盖常见的中文写法
+EVENT_ALIASES = {
+    'earthquake': 'earthquake', 'quake': 'earthquake', '地震': 'earthquake', '余震': 'earthquake', '震感': 'earthquake',
+    'cyclone': 'cyclone', 'typhoon': 'cyclone', 'hurricane': 'cyclone', 'storm': 'cyclone',
+    '台风': 'cyclone', '飓风': 'cyclone', '气旋': 'cyclone', '热带风暴': 'cyclone',
+    'flood': 'flood', '洪水': 'flood', '洪灾': 'flood', '洪涝': 'flood', '内涝': 'flood', '暴雨': 'flood',
+    'volcan': 'volcano', 'eruption': 'volcano', '火山': 'volcano',
+    'drought': 'drought', '干旱': 'drought', '旱灾': 'drought',
+    'forest fire': 'wildfire', 'wildfire': 'wildfire', '山火': 'wildfire', '森林火灾': 'wildfire',
+    'tsunami': 'tsunami', '海啸': 'tsunami',
+}
+COUNTRY_ALIASES = {
+    '中国': 'china', '日本': 'japan', '韩国': 'korea', '朝鲜': 'korea', '印度尼西亚': 'indonesia', '印尼': 'indonesia',
+    '菲律宾': 'philippines', '越南': 'viet nam', '泰国': 'thailand', '缅甸': 'myanmar', '孟加拉': 'bangladesh',
+    '印度': 'india', '巴基斯坦': 'pakistan', '阿富汗': 'afghanistan', '伊朗': 'iran', '土耳其': 'turkey',
+    '叙利亚': 'syria', '也门': 'yemen', '美国': 'united states', '墨西哥': 'mexico', '智利': 'chile',
+    '秘鲁': 'peru', '巴西': 'brazil', '新西兰': 'new zealand', '澳大利亚': 'australia', '意大利': 'italy',
+    '希腊': 'greece', '台湾': 'taiwan', '尼泊尔': 'nepal', '斐济': 'fiji', '汤加': 'tonga',
+    'türkiye': 'turkey', 'vietnam': 'viet nam', 'usa': 'united states',
+}
+KEY_WEIGHTS = {'event': 2.0, 'country': 3.0, 'word': 1.0}
+WORD = re.compile(r'[a-z]{3,}')
+STOPWORDS = {'the', 'and', 'for', 'from', 'with', 'this', 'that', 'green', 'orange', 'red', 'alert', 'unknown'}
+
+class GDACSIndex:
+    """
+    Inverted index over GDACS rows, keyed by normalized event type, country and
+    the remaining English words of the description. candidates() narrows a
+    message down to the top_k rows ranked by weighted key overlap, optionally
+    restricted to a date window around the message.
+    """
+    def __init__(self, Session, top_k=5, window=timedelta(days=30), refresh_interval=60):
+        self.Session = Session
+        self.top_k = top_k
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.automaton = AhoCorasick(list(EVENT_ALIASES) + list(COUNTRY_ALIASES) + list(set(COUNTRY_ALIASES.values())))
+        self.postings = {}
+        self.rows = {}
+        self.signature = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    def keys(self, text):
+        text = normalize_content(text)
+        keys = set()
+        for alias in self.automaton.find(text):
+            if alias in EVENT_ALIASES:
+                keys.add(('event', EVENT_ALIASES[alias]))
+            else:
+                keys.add(('country', COUNTRY_ALIASES.get(alias, alias)))
+        keys.update(('word', word) for word in WORD.findall(text) if word not in STOPWORDS)
+        return keys
+
+    def refresh(self, force=False):
+        """GDACS 表有变化 (行数或最大 id 改变) 时重建索引"""
+        if not force and time.monotonic() - self.checked_at < self.refresh_interval:
+            return
+        with independent_session(self.Session) as db_session:
+            signature = tuple(db_session.execute(select(func.count(GDACS.id), func.max(GDACS.id))).one())
+            self.checked_at = time.monotonic()
+            if signature == self.signature:
+                return
+            rows = db_session.execute(select(GDACS.id, GDACS.content, GDACS.location, GDACS.date_time)).all()
+
+        postings = {}
+        for row in rows:
+            for key in self.keys(f"{row.content or ''} {row.location or ''}"):
+                postings.setdefault(key, set()).add(row.id)
+        with self.lock:
+            self.postings = postings
+            self.rows = {row.id: row for row in rows}
+            self.signature = signature
+        print(f"[Debug] GDACS index rebuilt: {len(rows)} rows, {len(postings)} keys")
+
+    def snapshot(self):
+        """当前索引对应的 GDACS 表快照，用于缓存判定结果"""
+        self.refresh(force=True)
+        count, max_id = self.signature
+        return f"{count}:{max_id}"
+
+    def candidates(self, message, when=None):
+        """返回最多 top_k 个候选 GDACS 行，按加权重合度和时间排序"""
+        self.refresh()
+        with self.lock:
+            postings, rows = self.postings, self.rows
+        scores = {}
+        for key in self.keys(message):
+            for gdacs_id in postings.get(key, ()):
+                scores[gdacs_id] = scores.get(gdacs_id, 0.0) + KEY_WEIGHTS[key[0]]
+        if when is not None:
+            scores = {gdacs_id: score for gdacs_id, score in scores.items()
+                      if rows[gdacs_id].date_time is None or abs(rows[gdacs_id].date_time - when) <= self.window}
+        ranked = sorted(scores, key=lambda gdacs_id: (scores[gdacs_id], rows[gdacs_id].date_time or datetime.min), reverse=True)
+        return [rows[gdacs_id] for gdacs_id in ranked[:self.top_k]]
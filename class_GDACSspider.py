@@ -10,14 +10,14 @@ import time
 from class_datatypes import GDACS
 from datetime import datetime
 import re
-from sqlalchemy.exc import OperationalError
-from lock import db_lock
+from class_EventStream import record_event, gdacs_payload
 
 class GDACSSpider:
-    def __init__(self, download_dir, processed_dir, Session, options):
+    def __init__(self, download_dir, processed_dir, Session, options, writer):
         self.download_dir = download_dir
         self.processed_dir = processed_dir
         self.Session = Session
+        self.writer = writer
         self.driver = None
         self.initialize_driver(options)
         print("[Debug] GDACS Spider initialized")
@@ -78,48 +78,35 @@ class GDACSSpider:
             raise ValueError("Date format is incorrect or missing")
 
     def store_data(self, data):
-        db_session = self.Session()
-        try:
-            for feature in data.get('features', []):
-                properties = feature.get('properties', {})
-                eventid = properties.get('eventid', 'Unknown')
-                description = properties.get('description', 'Unknown')
-                country = properties.get('country', 'Unknown')
-                todate_str = properties.get('todate', '1970-01-01T00:00:00')
-                todate = self.validate_and_parse_date(todate_str)
-
-                existing_entry = db_session.query(GDACS).filter_by(id=eventid).first()
-                if existing_entry is None:
-                    with db_session.no_autoflush:
-                        new_gdacs = GDACS(id=eventid, content=description, date_time=todate, location=country)
-                        with db_lock:
-                            db_session.add(new_gdacs)
-                else:
-                    print(f"[Debug] Entry already exists, skipping: {eventid}")
-
-            self.retry_on_lock(db_session)
-        except Exception as e:
-            db_session.rollback()
-            raise e
-        finally:
-            db_session.close()
-
-    def retry_on_lock(self, session, max_retries=5, wait_time=1):
-        retries = 0
-        while retries < max_retries:
-            try:
-                with session.no_autoflush:
-                    with db_lock:
-                        session.commit()
-                print("[Debug] GDACS write successful")
-                break
-            except OperationalError as e:
-                if "database is locked" in str(e):
-                    retries += 1
-                    print("[Debug] Database is locked, retrying...")
-                    time.sleep(wait_time)
-                else:
-                    raise
+        rows = []
+        for feature in data.get('features', []):
+            properties = feature.get('properties', {})
+            eventid = properties.get('eventid', 'Unknown')
+            description = properties.get('description', 'Unknown')
+            country = properties.get('country', 'Unknown')
+            todate_str = properties.get('todate', '1970-01-01T00:00:00')
+            todate = self.validate_and_parse_date(todate_str)
+            rows.append(dict(id=eventid, content=description, date_time=todate, location=country))
+
+        def write(db_session):
+            ids = [row['id'] for row in rows]
+            existing = set()
+            for start in range(0, len(ids), 500):  # 避免超出 SQLite 的绑定参数上限
+                existing.update(gdacs.id for gdacs in db_session.query(GDACS.id).filter(GDACS.id.in_(ids[start:start + 500])))
+            added = 0
+            for row in rows:
+                if row['id'] in existing:
+                    print(f"[Debug] Entry already exists, skipping: {row['id']}")
+                    continue
+                new_gdacs = GDACS(**row)
+                db_session.add(new_gdacs)
+                record_event(db_session, 'gdacs', gdacs_payload(new_gdacs))
+                existing.add(row['id'])
+                added += 1
+            return added
+
+        added = self.writer.execute(write, invalidates_cache=True)
+        print(f"[Debug] GDACS write successful, {added} new entries")
 
     def manage_file(self, file_path):
         new_file_name = f"processed_{int(time.time())}.geojson"
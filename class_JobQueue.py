@@ -0,0 +1,144 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from class_datatypes import Job, Warning, Result
+from class_EventStream import record_event
+
+# 任务类型 -> (目标模型, 删除后推送的事件)
+JOB_TARGETS = {
+    'delete_warning': (Warning, 'warning_deleted'),
+    'delete_result': (Result, 'result_deleted'),
+}
+
+def enqueue_delete_check(db_session, kind, target_id):
+    """
+    为达到删除票数的 Warning/Result 排入一次 GDACS 检查，同一目标已有未完成的任务时直接返回它。
+    由部分唯一索引和 INSERT OR IGNORE 保证并发投票时只排入一个任务。由调用方提交事务。
+    """
+    now = datetime.now()
+    db_session.execute(
+        sqlite_insert(Job)
+        .values(kind=kind, target_id=target_id, status='pending', created_at=now, updated_at=now)
+        .on_conflict_do_nothing()
+    )
+    return db_session.query(Job).filter(
+        Job.kind == kind, Job.target_id == target_id, Job.status.in_(('pending', 'running'))
+    ).one()
+
+class JobRunner:
+    """
+    Runs the GDACS relatedness check for delete votes outside the API process.
+    Pending jobs are claimed from the jobs table and processed by a small thread
+    pool; each job either deletes its target or vetoes the deletion. Verdicts
+    are memoized per (target, GDACS snapshot), so repeated votes on the same
+    item do not call the LLM again until new GDACS data arrives.
+    """
+    def __init__(self, Session, model, workers=2, poll_interval=1.0):
+        self.Session = Session
+        self.model = model
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        print("[Debug] JobRunner initialized")
+
+    def recover(self):
+        """进程重启后，把上次未完成的任务重新放回队列"""
+        db_session = self.Session()
+        try:
+            db_session.execute(update(Job).where(Job.status == 'running').values(status='pending', updated_at=datetime.now()))
+            db_session.commit()
+        finally:
+            db_session.close()
+
+    def claim(self):
+        db_session = self.Session()
+        try:
+            job = db_session.query(Job.id).filter(Job.status == 'pending').order_by(Job.id).first()
+            if job is None:
+                return None
+            claimed = db_session.execute(
+                update(Job).where(Job.id == job.id, Job.status == 'pending').values(status='running', updated_at=datetime.now())
+            ).rowcount
+            db_session.commit()
+            return job.id if claimed else None
+        finally:
+            db_session.close()
+
+    def memoized(self, db_session, job, snapshot):
+        previous = db_session.query(Job.related).filter(
+            Job.kind == job.kind, Job.target_id == job.target_id, Job.snapshot == snapshot,
+            Job.status == 'done', Job.related.isnot(None)
+        ).order_by(Job.id.desc()).first()
+        return previous.related if previous else None
+
+    def check(self, db_session, job, item):
+        if job.kind == 'delete_warning':
+            return self.model.is_related_to_any_gdacs(db_session, f"{item.disaster_type} {item.disaster_location}")
+        return self.model.is_related_to_any_gdacs(db_session, item.content, item.date_time)
+
+    def process(self, job_id):
+        db_session = self.Session()
+        try:
+            job = db_session.get(Job, job_id)
+            model, deleted_event = JOB_TARGETS[job.kind]
+            item = db_session.get(model, job.target_id)
+            if item is None:
+                job.verdict, job.message = 'gone', 'Already deleted'
+            else:
+                snapshot = self.model.gdacs_index.snapshot()
+                related = self.memoized(db_session, job, snapshot)
+                if related is None:
+                    with db_session.no_autoflush:
+                        related = self.check(db_session, job, item)
+                else:
+                    print(f"[Debug] Reusing GDACS verdict for {job.kind} {job.target_id} at snapshot {snapshot}")
+                job.related, job.snapshot = related, snapshot
+                if related:
+                    job.verdict = 'vetoed'
+                    job.message = 'Related to GDACS information and cannot be deleted.'
+                else:
+                    payload = {'id': item.id}
+                    if model is Result:
+                        payload['warning_id'] = item.warning_id
+                    for rating in item.ratings:
+                        db_session.delete(rating)
+                    db_session.delete(item)
+                    record_event(db_session, deleted_event, payload)
+                    job.verdict, job.message = 'deleted', 'Deleted successfully'
+            job.status = 'done'
+            job.updated_at = datetime.now()
+            db_session.commit()
+            print(f"[Debug] Job {job_id} {job.kind} {job.target_id}: {job.verdict}")
+        except Exception as e:
+            db_session.rollback()
+            print(f"[Debug] Job {job_id} failed: {e}")
+            db_session.execute(update(Job).where(Job.id == job_id).values(status='failed', message=str(e), updated_at=datetime.now()))
+            db_session.commit()
+        finally:
+            db_session.close()
+
+    def run(self):
+        print("[Debug] JobRunner activated")
+        self.recover()
+        slots = threading.Semaphore(self.workers)
+        while True:
+            slots.acquire()
+            try:
+                job_id = self.claim()
+            except Exception as e:
+                print(f"[Debug] Job claim failed: {e}")
+                job_id = None
+            if job_id is None:
+                slots.release()
+                time.sleep(self.poll_interval)
+                continue
+
+            def work(job_id=job_id):
+                try:
+                    self.process(job_id)
+                finally:
+                    slots.release()
+            self.executor.submit(work)
@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class TokenBucket:
+    """每分钟补充 rate_per_minute 个令牌的令牌桶，acquire 在令牌不足时阻塞"""
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+def estimate_tokens(text):
+    """粗略估计 token 数：中文等非 ASCII 字符约 1 个 token，英文约 4 个字符 1 个 token"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii) // 4 + 1
+
+def is_rate_limited(error):
+    """
+    只看异常类型和状态码：openai 的 RateLimitError (新旧版本都叫这个名字，按类名匹配，不必导入 openai)，
+    或者带有 429 状态码的 HTTP 错误。不检查异常消息，消息中的 id、token 数可能恰好包含 429。
+    """
+    if getattr(error, 'status_code', None) == 429 or getattr(error, 'http_status', None) == 429:
+        return True
+    return any(cls.__name__ == 'RateLimitError' for cls in type(error).__mro__)
+
+class RateLimitedChain:
+    """
+    包装 LLMChain，对外仍然提供 run()。每次调用先从请求和 token 两个令牌桶取令牌，
+    遇到 429 时所有调用一起退避，退避时间随连续的 429 翻倍，成功后复原。
+    """
+    def __init__(self, chain, dispatcher):
+        self.chain = chain
+        self.dispatcher = dispatcher
+
+    def estimate(self, inputs):
+        try:
+            prompt = self.chain.prompt.format(**inputs)
+        except Exception:
+            prompt = ' '.join(str(value) for value in inputs.values())
+        return estimate_tokens(prompt) + self.dispatcher.expected_output_tokens
+
+    def run(self, inputs):
+        return self.dispatcher.call(lambda: self.chain.run(inputs), self.estimate(inputs))
+
+class LLMDispatcher:
+    """
+    Keeps up to `concurrency` LLM requests in flight while staying under the
+    requests-per-minute and tokens-per-minute limits of the API key.
+    map() runs a function over a list of items on the pool and yields the
+    results in input order, so callers can write them back in order.
+    """
+    def __init__(self, concurrency=4, rpm=60, tpm=60000, max_retries=6, base_backoff=1.0, max_backoff=60.0, expected_output_tokens=50):
+        self.concurrency = max(1, concurrency)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.expected_output_tokens = expected_output_tokens
+        self.backoff = 0.0
+        self.cooldown_until = 0.0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='llm')
+        self.rate_limited = 0
+        print(f"[Debug] LLMDispatcher initialized: concurrency={self.concurrency}, rpm={rpm}, tpm={tpm}")
+
+    def wrap(self, chain):
+        return RateLimitedChain(chain, self)
+
+    def wait_for_cooldown(self):
+        while True:
+            with self.lock:
+                remaining = self.cooldown_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def on_rate_limited(self):
+        with self.lock:
+            self.rate_limited += 1
+            self.backoff = min(self.max_backoff, self.backoff * 2 if self.backoff else self.base_backoff)
+            delay = self.backoff * random.uniform(1.0, 1.5)
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+        print(f"[Debug] LLM rate limited, backing off {delay:.1f}s")
+
+    def on_success(self):
+        with self.lock:
+            self.backoff = 0.0
+
+    def call(self, fn, tokens):
+        for attempt in range(self.max_retries + 1):
+            self.wait_for_cooldown()
+            self.requests.acquire(1)
+            self.tokens.acquire(tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == self.max_retries:
+                    raise
+                self.on_rate_limited()
+                continue
+            self.on_success()
+            return result
+
+    def map(self, fn, items):
+        """并发执行 fn(item)，按输入顺序返回结果的迭代器"""
+        return self.executor.map(fn, items)
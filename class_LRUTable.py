@@ -0,0 +1,77 @@
+from datetime import datetime
+from sqlalchemy import func, select, update, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database import independent_session
+
+LOOKUP_CHUNK = 500  # 每条 IN 查询最多携带的 key 数，低于 SQLite 的变量上限
+EVICT_FRACTION = 0.1  # 超出容量时多淘汰这部分，之后要再插入这么多行才会重新计数
+
+class LRUTable:
+    """
+    A SQLite table used as a bounded LRU store, shared by ClassificationCache
+    and TranslationMemory. Rows are found by a hash column within a scope such
+    as the prompt version, and carry hits/last_used. touch() and insert()
+    return write functions for the DBWriter.
+
+    The row count is estimated in memory from the rows this process inserts.
+    COUNT(*) runs on the first insert and whenever the estimate passes
+    max_entries; eviction then trims the table to max_entries * (1 -
+    EVICT_FRACTION), so a full table is not counted again on every store.
+    Rows inserted by other processes are picked up at the next count.
+    """
+    def __init__(self, Session, model, key_column, max_entries):
+        self.Session = Session
+        self.model = model
+        self.key_column = key_column
+        self.max_entries = max_entries
+        self.low_water = int(max_entries * (1 - EVICT_FRACTION))
+        self.approximate_rows = None
+
+    def lookup(self, keys, columns, *scope):
+        """返回 scope 内 key 在 keys 中的行 [(key, *columns)]"""
+        keys = list(set(keys))
+        rows = []
+        with independent_session(self.Session) as db_session:
+            for start in range(0, len(keys), LOOKUP_CHUNK):
+                rows.extend(db_session.execute(
+                    select(self.key_column, *columns)
+                    .where(*scope, self.key_column.in_(keys[start:start + LOOKUP_CHUNK]))
+                ))
+        return rows
+
+    def touch(self, keys, *scope):
+        """返回写操作：更新命中条目的 LRU 时间和命中次数"""
+        keys = list(set(keys))
+        def write(db_session):
+            now = datetime.now()
+            for start in range(0, len(keys), LOOKUP_CHUNK):
+                db_session.execute(
+                    update(self.model)
+                    .where(*scope, self.key_column.in_(keys[start:start + LOOKUP_CHUNK]))
+                    .values(last_used=now, hits=self.model.hits + 1)
+                )
+        return write
+
+    def insert(self, rows):
+        """返回写操作：插入 rows (列名 -> 值)，已有的条目保持不变，超出容量时淘汰最久未用的条目"""
+        rows = list(rows)
+        def write(db_session):
+            now = datetime.now()
+            inserted = 0
+            for values in rows:
+                inserted += db_session.execute(
+                    sqlite_insert(self.model).values(hits=0, last_used=now, **values).on_conflict_do_nothing()
+                ).rowcount
+            self.evict(db_session, inserted)
+        return write
+
+    def evict(self, db_session, inserted=0):
+        if self.approximate_rows is not None:
+            self.approximate_rows += inserted
+            if self.approximate_rows <= self.max_entries:
+                return
+        self.approximate_rows = db_session.scalar(select(func.count(self.model.id)))
+        if self.approximate_rows > self.max_entries:
+            oldest = select(self.model.id).order_by(self.model.last_used).limit(self.approximate_rows - self.low_water)
+            db_session.execute(delete(self.model).where(self.model.id.in_(oldest)))
+            self.approximate_rows = self.low_water
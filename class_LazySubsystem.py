@@ -0,0 +1,34 @@
+import threading
+
+def subsystem_enabled(config, name, default=True):
+    """读取 config.ini 中 [Subsystems] 段的开关，缺省时返回 default"""
+    if not config.has_section('Subsystems'):
+        return default
+    return config['Subsystems'].getboolean(name, fallback=default)
+
+class LazySubsystem:
+    """
+    Defers building a subsystem until the first attribute access. The factory
+    should import its heavy modules (transformers, langchain, selenium ...)
+    itself, so that neither the import nor the model load is paid at startup.
+    """
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._instance is not None
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    print(f"[Debug] Loading subsystem {self._name}")
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
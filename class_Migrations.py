@@ -0,0 +1,106 @@
+from sqlalchemy import text
+
+def dedupe(conn, table, columns):
+    """删除重复的行，每组只保留 id 最小的一条，以便建立唯一索引"""
+    cols = ', '.join(columns)
+    conn.execute(text(f"DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {cols})"))
+
+def migration_0001_indexes(conn):
+    for table in ['topics', 'replies', 'comments', 'translated_topics', 'translated_replies', 'translated_comments', 'warnings']:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_unprocessed ON {table} (id) WHERE processed = 0"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_results_warning_id ON results (warning_id)"))
+
+    unique_indexes = [
+        ('ux_votes_user_message_type', 'votes', ['user_id', 'message_id', 'vote_type']),
+        ('ux_warning_votes_user_warning_type', 'warning_votes', ['user_id', 'warning_id', 'vote_type']),
+        ('ux_ratings_user_message_type', 'ratings', ['user_id', 'message_id', 'type']),
+        ('ux_warning_ratings_user_warning_type', 'warning_ratings', ['user_id', 'warning_id', 'type']),
+    ]
+    for name, table, columns in unique_indexes:
+        dedupe(conn, table, columns)
+        conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+def add_column(conn, table, column, ddl):
+    """SQLite 没有 ADD COLUMN IF NOT EXISTS，先查 table_info"""
+    columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+def migration_0002_leases(conn):
+    for table in ['topics', 'replies', 'comments', 'translated_topics', 'translated_replies', 'translated_comments']:
+        add_column(conn, table, 'claimed_by', 'VARCHAR(100)')
+        add_column(conn, table, 'lease_until', 'DATETIME')
+
+def migration_0003_event_autoincrement(conn):
+    """
+    重建 events 表为 AUTOINCREMENT。普通的 INTEGER PRIMARY KEY 在最新的事件被清理后会重用 id，
+    订阅者按 id > last_id 读取，之后的事件就再也读不到了。
+    """
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'events'")).scalar()
+    if ddl is None or 'AUTOINCREMENT' in ddl.upper():
+        return
+    conn.execute(text(
+        "CREATE TABLE events_new (id INTEGER PRIMARY KEY AUTOINCREMENT, kind VARCHAR(50) NOT NULL, payload TEXT, date_time DATETIME)"
+    ))
+    # 带上原来的 id 插入，sqlite_sequence 随之记下当前的最大值
+    conn.execute(text("INSERT INTO events_new (id, kind, payload, date_time) SELECT id, kind, payload, date_time FROM events"))
+    conn.execute(text("DROP TABLE events"))
+    conn.execute(text("ALTER TABLE events_new RENAME TO events"))
+
+def migration_0004_translated_flag(conn):
+    """翻译器改用自己的 translated 标记，不再占用分类器的 processed"""
+    for table, translated_table in [('topics', 'translated_topics'), ('replies', 'translated_replies'), ('comments', 'translated_comments')]:
+        add_column(conn, table, 'translated', 'BOOLEAN DEFAULT 0')
+        # 已经有译文的记录不再重复翻译
+        conn.execute(text(f"UPDATE {table} SET translated = 1 WHERE id IN (SELECT id FROM {translated_table})"))
+        conn.execute(text(f"UPDATE {table} SET translated = 0 WHERE translated IS NULL"))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_untranslated ON {table} (id) WHERE translated = 0"))
+
+def migration_0005_unique_active_jobs(conn):
+    """同一目标只允许一个 pending/running 的任务，已有的重复任务只保留最早的一个"""
+    conn.execute(text(
+        "UPDATE jobs SET status = 'failed', message = 'Duplicate check' "
+        "WHERE status IN ('pending', 'running') AND id NOT IN "
+        "(SELECT MIN(id) FROM jobs WHERE status IN ('pending', 'running') GROUP BY kind, target_id)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_active_kind_target ON jobs (kind, target_id) "
+        "WHERE status IN ('pending', 'running')"
+    ))
+
+# (版本号, 说明, 迁移函数)，只能在末尾追加，已发布的迁移不要修改
+MIGRATIONS = [
+    (1, 'secondary indexes and unique vote/rating triples', migration_0001_indexes),
+    (2, 'claimed_by/lease_until columns for multi-process workers', migration_0002_leases),
+    (3, 'AUTOINCREMENT ids for the events outbox', migration_0003_event_autoincrement),
+    (4, 'translated flag for the translator, separate from processed', migration_0004_translated_flag),
+    (5, 'at most one pending/running job per target', migration_0005_unique_active_jobs),
+]
+
+class MigrationRunner:
+    """
+    用 SQLite 的 PRAGMA user_version 记录当前 schema 版本，启动时按顺序执行尚未应用的迁移。
+    每个迁移都写成幂等的，因此对已有的 data/forum.db 或新建的数据库重复执行都是安全的。
+    database.create_schema 传入的 engine 以 BEGIN IMMEDIATE 开始事务，多个进程同时运行时依次执行。
+    """
+    def __init__(self, engine, migrations=MIGRATIONS):
+        self.engine = engine
+        self.migrations = migrations
+
+    def current_version(self, conn):
+        return conn.execute(text("PRAGMA user_version")).scalar()
+
+    def run(self):
+        version = 0
+        for number, description, migrate in self.migrations:
+            # 在同一个事务中检查版本并执行迁移，配合 BEGIN IMMEDIATE 时多个进程不会重复执行
+            with self.engine.begin() as conn:
+                version = self.current_version(conn)
+                if number <= version:
+                    continue
+                print(f"[Debug] Applying migration {number}: {description}")
+                migrate(conn)
+                conn.execute(text(f"PRAGMA user_version = {int(number)}"))
+                version = number
+        print(f"[Debug] Database schema at version {version}")
+        return version
@@ -0,0 +1,151 @@
+import argparse
+import csv
+import re
+import threading
+from collections import deque
+from class_ClassificationCache import normalize_content
+
+# 关键词 -> 权重。强信号 1.0，单独出现时含义宽泛的词 0.5
+DISASTER_KEYWORDS = {
+    # 中文
+    '地震': 1.0, '余震': 1.0, '震感': 1.0, '震级': 1.0, '洪水': 1.0, '洪灾': 1.0, '洪涝': 1.0, '决堤': 1.0,
+    '内涝': 1.0, '暴雨': 1.0, '台风': 1.0, '飓风': 1.0, '龙卷风': 1.0, '海啸': 1.0, '火灾': 1.0, '失火': 1.0,
+    '起火': 1.0, '着火': 1.0, '山火': 1.0, '爆炸': 1.0, '泥石流': 1.0, '滑坡': 1.0, '塌方': 1.0, '坍塌': 1.0,
+    '倒塌': 1.0, '雪崩': 1.0, '暴雪': 1.0, '冰雹': 1.0, '干旱': 1.0, '旱灾': 1.0, '火山': 1.0, '沙尘暴': 1.0,
+    '寒潮': 1.0, '热浪': 1.0, '雷击': 1.0, '泄漏': 1.0, '疫情': 1.0, '瘟疫': 1.0, '空难': 1.0, '沉船': 1.0,
+    '车祸': 1.0, '疏散': 1.0, '遇难': 1.0, '伤亡': 1.0, '灾': 0.5, '震': 0.5, '淹': 0.5, '事故': 0.5,
+    '救援': 0.5, '死亡': 0.5, '受伤': 0.5, '停电': 0.5, '高温': 0.5, '预警': 0.5,
+    # English
+    'earthquake': 1.0, 'quake': 1.0, 'aftershock': 1.0, 'tremor': 1.0, 'flood': 1.0, 'typhoon': 1.0,
+    'hurricane': 1.0, 'cyclone': 1.0, 'tornado': 1.0, 'tsunami': 1.0, 'wildfire': 1.0, 'bushfire': 1.0,
+    'explosion': 1.0, 'landslide': 1.0, 'mudslide': 1.0, 'avalanche': 1.0, 'drought': 1.0, 'volcano': 1.0,
+    'eruption': 1.0, 'heatwave': 1.0, 'blizzard': 1.0, 'evacuat': 1.0, 'casualt': 1.0, 'derail': 1.0,
+    'outbreak': 1.0, 'epidemic': 1.0, 'disaster': 1.0, 'fire': 0.5, 'blaze': 0.5, 'blast': 0.5, 'storm': 0.5,
+    'collapse': 0.5, 'crash': 0.5, 'rescue': 0.5, 'killed': 0.5, 'injured': 0.5, 'dead': 0.5,
+    'emergency': 0.5, 'hail': 0.5, 'thunderstorm': 0.5, 'rainstorm': 0.5, 'hailstorm': 0.5,
+}
+
+# 英文关键词后允许的词尾，使 floods、flooding、evacuation、casualties 仍能命中
+ENGLISH_SUFFIXES = r'(?:s|es|d|ed|ing|e|ion|ions|y|ies)?'
+
+def english_matcher(keywords):
+    """
+    英文关键词按整词匹配：前后不能紧挨字母或数字，hail 不会命中 thailand，dead 不会命中 deadline。
+    不用 \\b，因为它把汉字也当作单词字符，"地震earthquake" 中的 earthquake 会匹配不到。
+    """
+    words = sorted(keywords, key=len, reverse=True)
+    if not words:
+        return None
+    return re.compile(r'(?<![a-z0-9])(' + '|'.join(map(re.escape, words)) + ')' + ENGLISH_SUFFIXES + r'(?![a-z0-9])')
+
+class AhoCorasick:
+    """纯 Python 的 Aho-Corasick 自动机，一次扫描找出文本中出现的所有关键词"""
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for keyword in keywords:
+            self.add(keyword)
+        self.build()
+
+    def add(self, keyword):
+        state = 0
+        for ch in keyword:
+            if ch not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][ch] = len(self.goto) - 1
+            state = self.goto[state][ch]
+        self.output[state].append(keyword)
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        """返回 text 中出现过的关键词集合"""
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            found.update(self.output[state])
+        return found
+
+class KeywordPreFilter:
+    """
+    Cheap stage in front of the LLM classifier. A post whose keyword score is
+    below `threshold` is treated as a clear negative and never sent to the LLM.
+    Lowering the threshold raises recall at the cost of more LLM traffic;
+    use the evaluation CLI below to pick a value on a labelled sample.
+    """
+    def __init__(self, threshold=0.5, keywords=DISASTER_KEYWORDS):
+        self.threshold = threshold
+        self.keywords = keywords
+        # 中文没有词边界，用自动机做子串匹配；英文按整词匹配
+        self.automaton = AhoCorasick(keyword for keyword in keywords if not keyword.isascii())
+        self.english = english_matcher(keyword for keyword in keywords if keyword.isascii())
+        self.checked = 0
+        self.passed = 0
+        self.lock = threading.Lock()
+        print(f"[Debug] KeywordPreFilter initialized with {len(keywords)} keywords, threshold {threshold}")
+
+    def find(self, content):
+        """返回 content 中出现的关键词集合"""
+        text = normalize_content(content)
+        found = self.automaton.find(text)
+        if self.english:
+            found.update(match.group(1) for match in self.english.finditer(text))
+        return found
+
+    def score(self, content):
+        return sum(self.keywords[keyword] for keyword in self.find(content))
+
+    def accepts(self, content):
+        accepted = self.score(content) >= self.threshold
+        with self.lock:
+            self.checked += 1
+            self.passed += accepted
+        return accepted
+
+    def stats(self):
+        with self.lock:
+            filtered = self.checked - self.passed
+            return {'checked': self.checked, 'sent_to_llm': self.passed, 'filtered': filtered,
+                    'llm_traffic_removed': filtered / self.checked if self.checked else 0.0}
+
+def evaluate(path, text_column, label_column, thresholds):
+    """在带标签的 CSV 上统计各阈值下的召回率、精确率和省下的 LLM 请求比例"""
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = [(row[text_column], row[label_column].strip() in ('1', 'true', 'True', 'yes', 'Yes')) for row in csv.DictReader(f)]
+    prefilter = KeywordPreFilter()
+    scores = [(prefilter.score(text), label) for text, label in rows]
+    positives = sum(label for _, label in scores)
+    print(f"{len(rows)} rows, {positives} positive")
+    print("threshold  recall  precision  llm_traffic_removed")
+    for threshold in thresholds:
+        passed = [label for score, label in scores if score >= threshold]
+        true_positives = sum(passed)
+        recall = true_positives / positives if positives else 0.0
+        precision = true_positives / len(passed) if passed else 0.0
+        removed = 1 - len(passed) / len(rows) if rows else 0.0
+        print(f"{threshold:9.2f}  {recall:6.3f}  {precision:9.3f}  {removed:19.3f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evaluate the keyword pre-filter on a labelled CSV sample')
+    parser.add_argument('csv', help='e.g. dataset/train.csv')
+    parser.add_argument('--text-column', default='text')
+    parser.add_argument('--label-column', default='target')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.5, 1.0, 1.5, 2.0])
+    args = parser.parse_args()
+    evaluate(args.csv, args.text_column, args.label_column, args.thresholds)
@@ -0,0 +1,65 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+class CachedResponse:
+    def __init__(self, generation, body):
+        self.generation = generation
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self._gzipped = None
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6)
+        return self._gzipped
+
+class ResponseCache:
+    """
+    进程内的只读接口响应缓存。
+    每次写入数据库后调用 bump() 使全局的数据版本号加一，旧版本的缓存条目随之失效。
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.generation = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def bump(self):
+        """数据发生变化，使所有缓存失效"""
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def get_or_build(self, key, build):
+        """
+        Return the CachedResponse for key, calling build() to produce the
+        JSON-serialisable payload when there is no entry for the current generation.
+        """
+        with self.lock:
+            generation = self.generation
+            entry = self.entries.get(key)
+            if entry is not None and entry.generation == generation:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # 在锁外查询数据库，构建期间如果有写入，版本号会变化，该条目不会被复用
+        body = json.dumps(build(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        entry = CachedResponse(generation, body)
+
+        with self.lock:
+            if generation == self.generation:
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return entry
+
+# 全局的响应缓存，所有写入路径共享同一个版本号
+response_cache = ResponseCache()
@@ -0,0 +1,86 @@
+import re
+
+# 句末标点 (中英文) 后连同紧跟的引号/括号一起切分；英文的 . ; 只在后面是空白或结尾时切分，避免切开 3.5、e.g
+SENTENCE = re.compile(
+    r'.*?(?:[。！？；…!?]+[”’」』）)\]"\']*|[.;]+[”’)\]"\']*(?=\s|$)|\n|$)',
+    re.S,
+)
+# 超长的句子先在这些次级标点后切分
+CLAUSE = re.compile(r'.*?(?:[，、：,:]+|$)', re.S)
+
+class SentenceSegmenter:
+    """
+    Splits posts into translation units. Sentences end at CJK or ASCII
+    terminal punctuation or at a newline; a sentence longer than max_tokens is
+    wrapped at commas, then at spaces or characters, so no unit exceeds the
+    budget. split() returns (chunk, separator) pairs: joining each chunk's
+    translation with its separator rebuilds the post in order, keeping the
+    original line breaks.
+    """
+    def __init__(self, count_tokens, max_tokens=128):
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+
+    def sentences(self, text):
+        """返回 (句子, 句子后是否换行)"""
+        result = []
+        for match in SENTENCE.finditer(text or ""):
+            sentence = match.group()
+            stripped = sentence.strip()
+            if stripped:
+                result.append([stripped, False])
+            if sentence.endswith('\n') and result:
+                result[-1][1] = True
+        return result
+
+    def cut(self, piece):
+        """按字符硬切，英文尽量在空格处断开"""
+        chunks = []
+        while piece:
+            tokens = self.count_tokens(piece)
+            if tokens <= self.max_tokens:
+                chunks.append(piece)
+                break
+            end = max(1, len(piece) * self.max_tokens // tokens)
+            while end > 1 and self.count_tokens(piece[:end]) > self.max_tokens:
+                end = max(1, end * 9 // 10)
+            space = piece.rfind(' ', 0, end)
+            if space > 0:
+                end = space
+            chunks.append(piece[:end].strip())
+            piece = piece[end:].strip()
+        return chunks
+
+    def wrap(self, sentence):
+        """把超出 max_tokens 的句子拆成不超过预算的若干块"""
+        if self.count_tokens(sentence) <= self.max_tokens:
+            return [sentence]
+        chunks, current = [], ""
+        for clause in CLAUSE.findall(sentence):
+            if not clause:
+                continue
+            candidate = current + clause
+            if self.count_tokens(candidate) <= self.max_tokens:
+                current = candidate
+                continue
+            if current:
+                chunks.append(current.strip())
+            if self.count_tokens(clause) <= self.max_tokens:
+                current = clause
+            else:
+                chunks.extend(self.cut(clause.strip()))
+                current = ""
+        if current.strip():
+            chunks.append(current.strip())
+        return chunks
+
+    def split(self, text):
+        pieces = []
+        for sentence, newline in self.sentences(text):
+            for chunk in self.wrap(sentence):
+                pieces.append([chunk, " "])
+            if newline:
+                pieces[-1][1] = "\n"
+        if pieces:
+            pieces[-1][1] = ""
+        return [tuple(piece) for piece in pieces]
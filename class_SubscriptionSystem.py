@@ -9,7 +9,6 @@ from email.mime.multipart import MIMEMultipart
 from class_datatypes import Subscriber, Warning
 import time
 from werkzeug.security import generate_password_hash, check_password_hash
-from lock import db_lock
 
 class SubscriptionSystem:
     def __init__(self, email_host, email_port, email_username, email_password, Session):
@@ -29,9 +28,8 @@ class SubscriptionSystem:
         try:
             with db_session.no_autoflush:
                 subscriber = Subscriber(email=email)
-                with db_lock:
-                    db_session.add(subscriber)
-                    db_session.commit()
+                db_session.add(subscriber)
+                db_session.commit()
                 self.state = 'Idle'
                 print("[Debug] SubscriptionSystem write successful")
                 return 'Subscriber added successfully'
@@ -50,9 +48,8 @@ class SubscriptionSystem:
         session = self.Session()
         try:
             with session.no_autoflush:
-                with db_lock:
-                    result = session.query(Subscriber).filter(Subscriber.email == email).delete()
-                    session.commit()
+                result = session.query(Subscriber).filter(Subscriber.email == email).delete()
+                session.commit()
             if result == 0:
                 self.state = 'Idle'
                 return 'No such subscriber found'
@@ -118,8 +115,7 @@ class SubscriptionSystem:
                         self.send_email(server, email, text)
                     
                     warning.processed = True  # Mark as processed regardless of individual email success
-                with db_lock:
-                    db_session.commit()
+                db_session.commit()
         except Exception as e:
             print(f"[Debug] Exception during email sending: {e}")
             db_session.rollback()
@@ -148,9 +144,8 @@ class SubscriptionSystem:
                 with db_session.no_autoflush:
                     hashed_password = generate_password_hash(password, method='sha256')
                     new_subscriber = Subscriber(email=email, password=hashed_password)
-                    with db_lock:
-                        db_session.add(new_subscriber)
-                        db_session.commit()
+                    db_session.add(new_subscriber)
+                    db_session.commit()
                 self.state = 'Idle'
                 return True, 'Registration successful'
         except IntegrityError:
@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+from class_datatypes import TranslationMemory as MemoryEntry
+from class_ClassificationCache import content_hash
+from class_LRUTable import LRUTable
+
+class TranslationMemory:
+    """
+    Sentence-level translation memory keyed by the hash of the normalized
+    source sentence, the target language and the model name. Lookups check an
+    in-process LRU first and then the translation_memory table; entries found
+    in the table are promoted into the LRU. New translations and hit
+    bookkeeping are returned as write functions for the DBWriter.
+    """
+    def __init__(self, Session, model_name, memory_size=20000, max_entries=500000):
+        self.Session = Session
+        self.model_name = model_name
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.table = LRUTable(Session, MemoryEntry, MemoryEntry.source_hash, max_entries)
+        self.memory = OrderedDict()  # (hash, tgt_lang) -> translation
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        print(f"[Debug] TranslationMemory initialized for {model_name}")
+
+    def remember(self, key, translation):
+        with self.lock:
+            self.memory[key] = translation
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+
+    def lookup(self, sentences, tgt_lang):
+        """返回 ({句子: 译文}, 数据库中命中的 hash)，未命中的句子不在结果中"""
+        found, keys = {}, {}
+        with self.lock:
+            for sentence in set(sentences):
+                key = (content_hash(sentence), tgt_lang)
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[sentence] = self.memory[key]
+                else:
+                    keys.setdefault(key[0], []).append(sentence)
+            self.memory_hits += len(found)
+
+        db_found = []
+        if keys and self.Session is not None:
+            for h, translation in self.table.lookup(keys, (MemoryEntry.translation,), *self.scope(tgt_lang)):
+                db_found.append(h)
+                self.remember((h, tgt_lang), translation)
+                for sentence in keys[h]:
+                    found[sentence] = translation
+        with self.lock:
+            self.db_hits += sum(len(keys[h]) for h in db_found)
+            self.misses += sum(len(group) for group in keys.values()) - sum(len(keys[h]) for h in db_found)
+        return found, db_found
+
+    def scope(self, tgt_lang):
+        return MemoryEntry.tgt_lang == tgt_lang, MemoryEntry.model == self.model_name
+
+    def touch(self, hashes, tgt_lang):
+        """返回写操作：更新数据库中命中条目的 LRU 时间和命中次数"""
+        return self.table.touch(hashes, *self.scope(tgt_lang))
+
+    def store(self, translations, tgt_lang):
+        """记入内存并返回写操作：保存 {句子: 译文}，超出容量时淘汰最久未用的条目"""
+        entries = {content_hash(sentence): translation for sentence, translation in translations.items()}
+        for h, translation in entries.items():
+            self.remember((h, tgt_lang), translation)
+        return self.table.insert(
+            dict(source_hash=h, tgt_lang=tgt_lang, model=self.model_name, translation=translation)
+            for h, translation in entries.items()
+        )
+
+    def stats(self):
+        """命中和未命中按每次 lookup 中不同的句子计数"""
+        with self.lock:
+            total = self.memory_hits + self.db_hits + self.misses
+            hits = self.memory_hits + self.db_hits
+            return {'memory_hits': self.memory_hits, 'db_hits': self.db_hits, 'misses': self.misses,
+                    'hit_rate': hits / total if total else 0.0, 'memory_entries': len(self.memory)}
@@ -0,0 +1,188 @@
+import json
+import re
+import threading
+import time
+from datetime import date, timedelta
+from sqlalchemy import event, orm, select
+from class_datatypes import Warning, Event
+from class_ClassificationCache import normalize_content
+from database import independent_session
+from class_GDACSIndex import EVENT_ALIASES, COUNTRY_ALIASES
+
+PENDING_KEY = 'warning_index_pending'
+DATE = re.compile(r'(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})')
+NON_WORD = re.compile(r'[^\w]+')
+
+# GDACS 的事件别名之外，再列出常见的复数写法。只认表中的词，不按词尾截断，gas 不会变成 ga
+TYPE_ALIASES = dict(EVENT_ALIASES, **{
+    'earthquakes': 'earthquake', 'quakes': 'earthquake', 'cyclones': 'cyclone', 'typhoons': 'cyclone',
+    'hurricanes': 'cyclone', 'storms': 'cyclone', 'floods': 'flood', 'volcano': 'volcano', 'volcanoes': 'volcano',
+    'eruptions': 'volcano', 'droughts': 'drought', 'forest fires': 'wildfire', 'wildfires': 'wildfire', 'tsunamis': 'tsunami',
+})
+
+def canonical_type(disaster_type):
+    key = NON_WORD.sub(' ', normalize_content(disaster_type)).strip()
+    return TYPE_ALIASES.get(key, key)
+
+def canonical_location(location):
+    key = normalize_content(location)
+    key = COUNTRY_ALIASES.get(key, key)
+    return NON_WORD.sub('', key)
+
+def canonical_time(disaster_time):
+    """能解析出年月日时返回 date，否则返回规范化后的字符串，空值返回 None"""
+    text = normalize_content(disaster_time)
+    if not text:
+        return None
+    match = DATE.search(text)
+    if match:
+        try:
+            return date(*map(int, match.groups()))
+        except ValueError:
+            pass
+    return text
+
+def commit_pending(session):
+    """提交后把会话中登记的 Warning 加入各自的索引"""
+    for index, _, _, warning_id, raw in session.info.pop(PENDING_KEY, ()):
+        index.on_commit(warning_id, raw)
+
+def discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
+
+# 对所有会话只注册一次，未登记 Warning 的会话只多一次 dict 查找
+event.listen(orm.Session, 'after_commit', commit_pending)
+event.listen(orm.Session, 'after_rollback', discard_pending)
+
+class WarningIndex:
+    """
+    In-memory dedup index for create_warning_if_needed. Warnings are keyed by
+    canonical (type, location); each key holds the warnings' canonical times,
+    and a new time within `window` of an existing date joins that warning.
+    Warnings are added to the index only after their transaction commits.
+    New rows and deletions from other processes are picked up from the
+    warnings table and the events outbox every refresh_interval, or on a miss
+    at most once per miss_refresh_interval.
+    """
+    def __init__(self, Session, window=timedelta(days=3), refresh_interval=30, miss_refresh_interval=1.0):
+        self.Session = Session
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.miss_refresh_interval = miss_refresh_interval
+        self.entries = {}  # (type, location) -> [(time, warning_id)]
+        # 只由 refresh() 推进的数据库读取位置；本进程提交的 Warning 另外记录，
+        # 否则其他进程先提交、id 更小的 Warning 会被跳过
+        self.db_high_water = 0
+        self.local_ids = set()
+        self.last_event_id = None
+        self.refreshed_at = 0
+        # lock 保护以上所有状态；refresh_lock 让同一时间只有一个线程读取数据库
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    def matches(self, when, other):
+        if isinstance(when, date) and isinstance(other, date):
+            return abs(when - other) <= self.window
+        return when == other
+
+    def search(self, entries, key, when):
+        for other, warning_id in entries.get(key, ()):
+            if self.matches(when, other):
+                return warning_id
+        return None
+
+    def insert(self, warning_id, disaster_type, disaster_location, disaster_time):
+        """调用方持有 self.lock"""
+        key = (canonical_type(disaster_type), canonical_location(disaster_location))
+        entry = (canonical_time(disaster_time), warning_id)
+        entries = self.entries.setdefault(key, [])
+        # refresh 和提交回调可能都看到同一条 Warning
+        if entry not in entries:
+            entries.append(entry)
+
+    def add(self, warning_id, disaster_type, disaster_location, disaster_time):
+        with self.lock:
+            self.insert(warning_id, disaster_type, disaster_location, disaster_time)
+
+    def discard(self, warning_ids):
+        """调用方持有 self.lock"""
+        for key, entries in list(self.entries.items()):
+            kept = [entry for entry in entries if entry[1] not in warning_ids]
+            if kept:
+                self.entries[key] = kept
+            else:
+                del self.entries[key]
+
+    def remove(self, warning_ids):
+        with self.lock:
+            self.discard(warning_ids)
+
+    def refresh(self):
+        """读取上次之后新增的 Warning 和 warning_deleted 事件，首次调用时从数据库预热"""
+        with self.refresh_lock:
+            with self.lock:
+                high_water, last_event_id = self.db_high_water, self.last_event_id
+            with independent_session(self.Session) as db_session:
+                if last_event_id is None:
+                    last_event_id = db_session.scalar(select(Event.id).order_by(Event.id.desc()).limit(1)) or 0
+                rows = db_session.execute(
+                    select(Warning.id, Warning.disaster_type, Warning.disaster_location, Warning.disaster_time)
+                    .where(Warning.id > high_water).order_by(Warning.id)
+                ).all()
+                deleted = db_session.execute(
+                    select(Event.id, Event.payload).where(Event.id > last_event_id, Event.kind == 'warning_deleted').order_by(Event.id)
+                ).all()
+            deleted_ids = {json.loads(payload)['id'] for _, payload in deleted}
+            with self.lock:
+                for row in rows:
+                    if row.id in self.local_ids:
+                        self.local_ids.discard(row.id)
+                    else:
+                        self.insert(row.id, row.disaster_type, row.disaster_location, row.disaster_time)
+                if rows:
+                    self.db_high_water = rows[-1].id
+                if deleted_ids:
+                    self.local_ids -= deleted_ids
+                    self.discard(deleted_ids)
+                self.last_event_id = deleted[-1].id if deleted else last_event_id
+                self.refreshed_at = time.monotonic()
+                keys = len(self.entries)
+        if rows or deleted:
+            print(f"[Debug] Warning index: +{len(rows)} warnings, -{len(deleted)} deleted, {keys} keys")
+
+    def find(self, db_session, disaster_type, disaster_location, disaster_time):
+        """返回可以合并的 Warning id，没有时返回 None"""
+        key = (canonical_type(disaster_type), canonical_location(disaster_location))
+        when = canonical_time(disaster_time)
+        # 同一事务中刚创建、尚未提交的 Warning
+        pending = {}
+        for index, pending_key, pending_time, warning_id, _ in db_session.info.get(PENDING_KEY, ()):
+            if index is self:
+                pending.setdefault(pending_key, []).append((pending_time, warning_id))
+        warning_id = self.search(pending, key, when)
+        if warning_id is not None:
+            return warning_id
+
+        with self.lock:
+            stale = time.monotonic() - self.refreshed_at > self.refresh_interval
+        if stale:
+            self.refresh()
+        with self.lock:
+            warning_id = self.search(self.entries, key, when)
+            # 未命中时再读一次数据库，但限制频率，连续的新 Warning 不会每条都查询两次
+            retry = warning_id is None and time.monotonic() - self.refreshed_at > self.miss_refresh_interval
+        if retry:
+            self.refresh()
+            with self.lock:
+                warning_id = self.search(self.entries, key, when)
+        return warning_id
+
+    def add_pending(self, db_session, warning_id, disaster_type, disaster_location, disaster_time):
+        key = (canonical_type(disaster_type), canonical_location(disaster_location))
+        db_session.info.setdefault(PENDING_KEY, []).append((self, key, canonical_time(disaster_time), warning_id, (disaster_type, disaster_location, disaster_time)))
+
+    def on_commit(self, warning_id, raw):
+        with self.lock:
+            if warning_id > self.db_high_water:
+                self.local_ids.add(warning_id)
+            self.insert(warning_id, *raw)
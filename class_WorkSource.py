@@ -0,0 +1,114 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, or_
+from database import independent_session
+
+IN_CHUNK = 500  # 每条 IN 查询最多携带的 id 数，低于 SQLite 的变量上限
+
+def fetch_by_ids(db_session, model, ids):
+    """用 IN 查询批量取出 model 中给定 id 的行，返回 {id: 行}"""
+    ids = list(ids)
+    rows = {}
+    for start in range(0, len(ids), IN_CHUNK):
+        for row in db_session.scalars(select(model).where(model.id.in_(ids[start:start + IN_CHUNK]))):
+            rows[row.id] = row
+    return rows
+
+class Lease:
+    """
+    Identifies one worker process when claiming rows. Claimed rows carry
+    claimed_by/lease_until; once lease_until has passed, for example because
+    the worker crashed, any other worker may claim them again.
+    """
+    def __init__(self, owner=None, duration=timedelta(minutes=10)):
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.duration = duration
+
+class WorkSource:
+    """
+    Streams the unprocessed rows of one table in batches ordered by id.
+
+    A high-water mark remembers the last id handed out, so each poll reads only
+    rows beyond it, at most max_rows of them, streamed with yield_per so memory
+    stays flat however large the backlog is. When a poll finds nothing past the
+    mark, the mark resets and the next poll starts over from the lowest
+    unprocessed id, which retries rows that failed on an earlier pass.
+    flag names the boolean column that marks a row as done for this consumer;
+    the translator uses 'translated' so it does not take rows from the classifier.
+    With a lease, rows are claimed through a separate session opened from
+    Session, so claiming never commits the caller's session.
+    """
+    def __init__(self, model, batch_size=200, max_rows=2000, lease=None, flag='processed', Session=None):
+        self.model = model
+        self.flag = getattr(model, flag)
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        # 设置 lease 后按批领取租约，多个 worker 进程可以同时处理同一张表
+        self.lease = lease
+        self.Session = Session
+        self.cursor = 0
+        self.has_more = False
+
+    def batches(self, db_session):
+        if self.lease is not None:
+            yield from self.leased_batches(db_session)
+            return
+        model = self.model
+        query = (
+            select(model)
+            .where(self.flag == False, model.id > self.cursor)
+            .order_by(model.id)
+            .limit(self.max_rows)
+            .execution_options(yield_per=self.batch_size)
+        )
+        seen = 0
+        for batch in db_session.scalars(query).partitions():
+            seen += len(batch)
+            self.cursor = batch[-1].id
+            yield batch
+        self.has_more = seen >= self.max_rows
+        if seen == 0:
+            self.cursor = 0
+
+    def claim(self, db_session, limit):
+        """
+        用一条 UPDATE 原子地领取最多 limit 行未处理、且没有有效租约的记录。
+        领取和读取都在独立的会话中提交，不提交调用方的会话，调用方可能正在流式读取或累积写入；
+        读出的行以 merge(load=False) 放进调用方的会话，调用方照常修改并在自己的事务中提交。
+        """
+        model = self.model
+        now = datetime.now()
+        until = now + self.lease.duration
+        candidates = (
+            select(model.id)
+            .where(self.flag == False, model.id > self.cursor,
+                   or_(model.lease_until.is_(None), model.lease_until < now))
+            .order_by(model.id)
+            .limit(limit)
+        )
+        with independent_session(self.Session) as lease_session:
+            lease_session.execute(
+                update(model).where(model.id.in_(candidates)).values(claimed_by=self.lease.owner, lease_until=until)
+            )
+            lease_session.commit()
+            rows = lease_session.scalars(
+                select(model)
+                .where(model.claimed_by == self.lease.owner, model.lease_until == until, self.flag == False)
+                .order_by(model.id)
+            ).all()
+            return [db_session.merge(row, load=False) for row in rows]
+
+    def leased_batches(self, db_session):
+        seen = 0
+        while seen < self.max_rows:
+            batch = self.claim(db_session, min(self.batch_size, self.max_rows - seen))
+            if not batch:
+                break
+            seen += len(batch)
+            self.cursor = batch[-1].id
+            yield batch
+        self.has_more = seen >= self.max_rows
+        if seen == 0:
+            self.cursor = 0
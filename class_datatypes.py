@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, ForeignKey, String, Boolean, Float, DateTime
+from sqlalchemy import Column, Integer, Text, ForeignKey, String, Boolean, Float, DateTime, Index, text
 from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base, relationship, backref
 from sqlalchemy.ext.hybrid import hybrid_property
 
@@ -15,47 +15,84 @@ class GDACS(Base):
 
 class Topics(Base):
     __tablename__ = 'topics'
+    __table_args__ = (
+        # 只索引未处理的行，轮询 processed == False 时不必扫描全表
+        Index('ix_topics_unprocessed', 'id', sqlite_where=text('processed = 0')),
+        Index('ix_topics_untranslated', 'id', sqlite_where=text('translated = 0')),
+    )
     id = Column(Integer, primary_key=True)
     content = Column(Text)
     date_time = Column(DateTime)
-    processed = Column(Boolean, default=False)
+    processed = Column(Boolean, default=False)  # 分类器 (LangChainModel) 的进度
+    translated = Column(Boolean, default=False)  # 翻译器的进度，与 processed 相互独立
+    claimed_by = Column(String(100))  # 持有租约的 worker，见 class_WorkSource.Lease
+    lease_until = Column(DateTime)
 
 class Replies(Base):
     __tablename__ = 'replies'
+    __table_args__ = (
+        Index('ix_replies_unprocessed', 'id', sqlite_where=text('processed = 0')),
+        Index('ix_replies_untranslated', 'id', sqlite_where=text('translated = 0')),
+    )
     id = Column(Integer, primary_key=True)
     content = Column(Text)
     topic_id = Column(Integer, ForeignKey('topics.id'))
     date_time = Column(DateTime)
     processed = Column(Boolean, default=False)
+    translated = Column(Boolean, default=False)
+    claimed_by = Column(String(100))
+    lease_until = Column(DateTime)
 
 class UsersComments(Base):
     __tablename__ = 'comments'
+    __table_args__ = (
+        Index('ix_comments_unprocessed', 'id', sqlite_where=text('processed = 0')),
+        Index('ix_comments_untranslated', 'id', sqlite_where=text('translated = 0')),
+    )
     id = Column(Integer, primary_key=True)
     content = Column(Text)
     date_time = Column(DateTime)
     processed = Column(Boolean, default=False)
+    translated = Column(Boolean, default=False)
+    claimed_by = Column(String(100))
+    lease_until = Column(DateTime)
 
 class TranslatedTopics(Base):
     __tablename__ = 'translated_topics'
+    __table_args__ = (
+        Index('ix_translated_topics_unprocessed', 'id', sqlite_where=text('processed = 0')),
+    )
     id = Column(Integer, primary_key=True)
     content = Column(Text)
     date_time = Column(DateTime)
     processed = Column(Boolean, default=False)
+    claimed_by = Column(String(100))
+    lease_until = Column(DateTime)
 
 class TranslatedReplies(Base):
     __tablename__ = 'translated_replies'
+    __table_args__ = (
+        Index('ix_translated_replies_unprocessed', 'id', sqlite_where=text('processed = 0')),
+    )
     id = Column(Integer, primary_key=True)
     content = Column(Text)
     date_time = Column(DateTime)
     topic_id = Column(Integer, ForeignKey('translated_topics.id'))
     processed = Column(Boolean, default=False)
+    claimed_by = Column(String(100))
+    lease_until = Column(DateTime)
     
 class TranslatedUsersComments(Base):
     __tablename__ = 'translated_comments'
+    __table_args__ = (
+        Index('ix_translated_comments_unprocessed', 'id', sqlite_where=text('processed = 0')),
+    )
     id = Column(Integer, primary_key=True)
     content = Column(Text)
     date_time = Column(DateTime)
     processed = Column(Boolean, default=False)
+    claimed_by = Column(String(100))
+    lease_until = Column(DateTime)
 
 class Result(Base):
     __tablename__ = 'results'
@@ -73,7 +110,7 @@ class Result(Base):
     accuracy_raters = Column(Integer, default=0)
     delete_votes = Column(Integer, default=0)
     processed = Column(Boolean, default=False)
-    warning_id = Column(Integer, ForeignKey('warnings.id', ondelete='CASCADE'))
+    warning_id = Column(Integer, ForeignKey('warnings.id', ondelete='CASCADE'), index=True)
 
     warning = relationship('Warning', back_populates='results')
     votes = relationship('Vote', back_populates='result', cascade="all, delete-orphan")
@@ -93,6 +130,9 @@ class Result(Base):
 
 class Warning(Base):
     __tablename__ = 'warnings'
+    __table_args__ = (
+        Index('ix_warnings_unprocessed', 'id', sqlite_where=text('processed = 0')),
+    )
     id = Column(Integer, primary_key=True)
     disaster_type = Column(String)
     disaster_location = Column(String)
@@ -132,6 +172,10 @@ class Subscriber(Base):
 
 class Vote(Base):
     __tablename__ = 'votes'
+    __table_args__ = (
+        # 同一用户对同一对象的同类投票/评分只能有一条，也覆盖按 user_id 的查询
+        Index('ux_votes_user_message_type', 'user_id', 'message_id', 'vote_type', unique=True),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('subscribers.id'), nullable=False)
     message_id = Column(Integer, ForeignKey('results.id'), nullable=False)
@@ -145,6 +189,9 @@ class Vote(Base):
 
 class WarningVote(Base):
     __tablename__ = 'warning_votes'
+    __table_args__ = (
+        Index('ux_warning_votes_user_warning_type', 'user_id', 'warning_id', 'vote_type', unique=True),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('subscribers.id'), nullable=False)
     warning_id = Column(Integer, ForeignKey('warnings.id', ondelete='CASCADE'), nullable=False)
@@ -158,6 +205,9 @@ class WarningVote(Base):
 
 class Rating(Base):
     __tablename__ = 'ratings'
+    __table_args__ = (
+        Index('ux_ratings_user_message_type', 'user_id', 'message_id', 'type', unique=True),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('subscribers.id'), nullable=False)
     message_id = Column(Integer, ForeignKey('results.id', ondelete='CASCADE'), nullable=False)
@@ -172,6 +222,9 @@ class Rating(Base):
 
 class WarningRating(Base):
     __tablename__ = 'warning_ratings'
+    __table_args__ = (
+        Index('ux_warning_ratings_user_warning_type', 'user_id', 'warning_id', 'type', unique=True),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('subscribers.id'), nullable=False)
     warning_id = Column(Integer, ForeignKey('warnings.id', ondelete='CASCADE'), nullable=False)
@@ -183,3 +236,69 @@ class WarningRating(Base):
     
     def to_dict(self):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+
+class Event(Base):
+    __tablename__ = 'events'
+    # 旧事件会被定期清理，AUTOINCREMENT 保证 id 不会回退到已经推送过的值
+    __table_args__ = {'sqlite_autoincrement': True}
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(Text)
+    date_time = Column(DateTime)
+
+class ClassificationCache(Base):
+    __tablename__ = 'classification_cache'
+    __table_args__ = (
+        Index('ux_classification_cache_hash_version', 'content_hash', 'prompt_version', unique=True),
+    )
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), nullable=False)
+    prompt_version = Column(String(16), nullable=False)
+    is_disaster = Column(Boolean)
+    disaster_type = Column(String)
+    disaster_location = Column(String)
+    disaster_time = Column(String)
+    hits = Column(Integer, default=0)
+    last_used = Column(DateTime, index=True)
+
+class TranslationMemory(Base):
+    __tablename__ = 'translation_memory'
+    __table_args__ = (
+        Index('ux_translation_memory_key', 'source_hash', 'tgt_lang', 'model', unique=True),
+    )
+    id = Column(Integer, primary_key=True)
+    source_hash = Column(String(64), nullable=False)
+    tgt_lang = Column(String(20), nullable=False)
+    model = Column(String(100), nullable=False)
+    translation = Column(Text)
+    hits = Column(Integer, default=0)
+    last_used = Column(DateTime, index=True)
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_kind_target', 'kind', 'target_id'),
+        Index('ix_jobs_pending', 'id', sqlite_where=text("status = 'pending'")),
+        # 同一目标同时只能有一个未完成的任务
+        Index('ux_jobs_active_kind_target', 'kind', 'target_id', unique=True, sqlite_where=text("status IN ('pending', 'running')")),
+    )
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    target_id = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default='pending')  # pending, running, done, failed
+    verdict = Column(String(20))  # deleted, vetoed, gone
+    related = Column(Boolean)
+    snapshot = Column(String(50))  # GDACS 表的快照 (行数:最大 id)，相同快照下的判定可以复用
+    message = Column(Text)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'target_id': self.target_id,
+            'status': self.status,
+            'verdict': self.verdict,
+            'message': self.message,
+        }
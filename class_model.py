@@ -1,15 +1,18 @@
+import argparse
+import numpy as np
 import pandas as pd
-import tensorflow as tf
 import joblib
-from transformers import DistilBertTokenizer, TFDistilBertForSequenceClassification
+from transformers import DistilBertTokenizerFast
 from sklearn.preprocessing import LabelEncoder
 from class_datatypes import Topics, Replies, UsersComments, TranslatedTopics, TranslatedReplies, TranslatedUsersComments, Result
 import time
 from sqlalchemy.exc import SQLAlchemyError
-from lock import db_lock
+from class_WorkSource import WorkSource, fetch_by_ids
+
+ONNX_MODEL_PATH = 'model/distilbert_disaster_model.int8.onnx'
 
 class DisasterTweetModel:
-    def __init__(self, train_path, test_path, Session, model_path='model/distilbert_disaster_model', sequence_length=128):
+    def __init__(self, train_path, test_path, Session, model_path='model/distilbert_disaster_model', sequence_length=128, lease=None, batch_size=32, backend='tf', onnx_path=ONNX_MODEL_PATH):
         """
         Initialize the model, its preprocessor, load datasets, and setup database connection.
         """
@@ -18,12 +21,22 @@ class DisasterTweetModel:
         self.Session = Session
         self.model_path = model_path
         self.sequence_length = sequence_length
-        self.tokenizer = DistilBertTokenizer.from_pretrained('distilbert-base-uncased')
-        self.model = TFDistilBertForSequenceClassification.from_pretrained(self.model_path)
+        # 按长度分桶后每桶一次前向传播，每桶只补齐到桶内最长的文本
+        self.batch_size = batch_size
+        self.tokenizer = DistilBertTokenizerFast.from_pretrained('distilbert-base-uncased')
+        # backend='onnx' 使用 export_onnx.py 导出的 int8 模型，不导入 TensorFlow
+        self.backend = backend
+        self.model = self.load_model(onnx_path)
         self.label_encoder = joblib.load('model/keyword_encoder.pkl')  # Assume encoder is saved here
         # self.label_encoder.classes_ = [label.replace('%20', ' ') for label in self.label_encoder.classes_]
         self.df_train = pd.read_csv(train_path)
         self.df_test = pd.read_csv(test_path)
+        # 译文表 -> 原文表。lease 不为空时按租约领取，可以同时运行多个进程
+        self.sources = [
+            (WorkSource(TranslatedTopics, lease=lease, Session=Session), Topics),
+            (WorkSource(TranslatedReplies, lease=lease, Session=Session), Replies),
+            (WorkSource(TranslatedUsersComments, lease=lease, Session=Session), UsersComments),
+        ]
         print("[Debug] Model initialized")
         print(self.label_encoder.classes_)
 
@@ -31,75 +44,125 @@ class DisasterTweetModel:
         """
         Close database connection when the instance is destroyed.
         """
-        self.Session.remove()  # 关闭 session
+        if self.Session is not None:
+            self.Session.remove()  # 关闭 session
 
     def encode_texts(self, texts):
         """
-        Encode texts for prediction.
+        Tokenize texts without padding; buckets are padded later in predict_logits.
         """
-        return [self.tokenizer.encode(text, add_special_tokens=True, max_length=self.sequence_length, truncation=True, padding='max_length') for text in texts]
-
-    def interpret_predictions(self, predictions, items):
-        results = []
-        try:
-            probabilities = tf.nn.softmax(predictions.logits, axis=1)
-            predicted_indices = tf.argmax(probabilities, axis=1).numpy()
+        return self.tokenizer(list(texts), add_special_tokens=True, max_length=self.sequence_length, truncation=True)
 
-            # Debugging output to check index validity before decoding
-            print(f"[Debug] Label encoder classes count: {len(self.label_encoder.classes_)}")
+    def load_model(self, onnx_path):
+        """
+        Load the classifier for the configured backend; each backend imports its runtime only here.
+        """
+        if self.backend == 'onnx':
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+            # tf2onnx 导出的输入名可能带 ":0" 后缀
+            self.onnx_inputs = {node.name: node.name.split(':')[0] for node in session.get_inputs()}
+            return session
+        if self.backend == 'tf':
+            from transformers import TFDistilBertForSequenceClassification
+            return TFDistilBertForSequenceClassification.from_pretrained(self.model_path)
+        raise ValueError(f"Unknown backend: {self.backend}")
 
-            for i, (text, predicted_index) in enumerate(zip(items, predicted_indices)):
-                print(f"[Debug] Text={text}, Predicted Index={predicted_index}")
+    def forward(self, batch):
+        """
+        Run one forward pass over a padded batch and return the logits as a numpy array.
+        """
+        if self.backend == 'onnx':
+            feed = {name: np.asarray(batch[key], dtype=np.int64) for name, key in self.onnx_inputs.items()}
+            return self.model.run(None, feed)[0]
+        return self.model(dict(batch), training=False).logits.numpy()
 
-                if predicted_index >= len(self.label_encoder.classes_):
-                    print(f"[Error] Predicted index {predicted_index} is out of bounds for label encoder classes.")
-                    results.append((text, 0, 0.0, "Not a Disaster"))
-                    continue
+    def predict_logits(self, texts, batch_size=None):
+        """
+        Predict logits for all texts. Texts are sorted by token length and split into
+        buckets of batch_size, each padded to its longest member; the logits are
+        returned in the original order.
+        """
+        batch_size = batch_size or self.batch_size
+        if not texts:
+            return np.zeros((0, len(self.label_encoder.classes_)), dtype=np.float32)
+        encoded = self.encode_texts(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(encoded['input_ids'][i]))
+        logits = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            bucket = order[start:start + batch_size]
+            batch = self.tokenizer.pad(
+                {key: [encoded[key][i] for i in bucket] for key in ('input_ids', 'attention_mask')},
+                padding='longest', return_tensors='np',
+            )
+            for i, row in zip(bucket, self.forward(batch)):
+                logits[i] = row
+        return np.stack(logits)
 
-                probability = probabilities[i, predicted_index].numpy()
-                is_disaster = 1 if probability > 0.8 else 0
-                predicted_label = self.label_encoder.inverse_transform([predicted_index])[0]
-                results.append((text, is_disaster, float(probability), predicted_label))
-                
-                print(f"[Debug] Processed: Label={predicted_label}, Probability={probability}")
+    def interpret_predictions(self, logits, items):
+        """
+        Turn a batch of logits into (text, is_disaster, probability, label) tuples.
+        """
+        logits = np.asarray(logits, dtype=np.float32)
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probabilities = exp / exp.sum(axis=1, keepdims=True)
+        predicted_indices = probabilities.argmax(axis=1)
+        probability = probabilities[np.arange(len(predicted_indices)), predicted_indices]
 
-        except Exception as e:
-            print(f"[Exception] Error during interpretation: {str(e)}")
-            for text in items[len(results):]:
-                results.append((text, 0, 0.0, "Not a Disaster"))
+        classes = np.asarray(self.label_encoder.classes_, dtype=object)
+        valid = predicted_indices < len(classes)
+        if not valid.all():
+            print(f"[Error] {int((~valid).sum())} predicted indices are out of bounds for {len(classes)} label encoder classes.")
+        labels = np.where(valid, classes[np.minimum(predicted_indices, len(classes) - 1)], "Not a Disaster")
+        probability = np.where(valid, probability, 0.0)
+        is_disaster = (probability > 0.8).astype(int)
+        return [(text, int(label), float(p), str(disaster_type))
+                for text, label, p, disaster_type in zip(items, is_disaster, probability, labels)]
 
-        return results
-    
     def process_and_save_results(self, db_session, items, source_type):
         """
         Process and save results from predictions, convert %20 to space in labels before saving.
         """
-        for item in items:
-            original = db_session.query(source_type).filter(source_type.id == item.id).first()
-            if original:
-                try:
-                    encoded_text = self.encode_texts([item.content])
-                    predictions = self.model.predict(encoded_text)
-                    results = self.interpret_predictions(predictions, [item.content])
-                    for _, label, probability, disaster_type in results:
-                        # Convert %20 to space in the disaster_type label before saving
-                        disaster_type = disaster_type.replace('%20', ' ')
-                        new_result = Result(
-                            source_id=original.id,
-                            content=original.content,  # Use original content
-                            date_time=item.date_time,
-                            is_disaster=label,
-                            probability=probability,
-                            disaster_type=disaster_type,  # Saved with converted label
-                            source_type=source_type.__tablename__
-                        )
-                        with db_lock:
-                            db_session.add(new_result)
-                        item.processed = True
-                        print(f"Processed {source_type.__tablename__} {original.id}")
-                except Exception as e:
-                    print(f"Failed processing {source_type.__tablename__} {original.id}: {str(e)}")
-    
+        originals = fetch_by_ids(db_session, source_type, [item.id for item in items])
+        pending = [(item, originals[item.id]) for item in items if item.id in originals]
+        if not pending:
+            return
+        try:
+            texts = [item.content for item, _ in pending]
+            results = self.interpret_predictions(self.predict_logits(texts), texts)
+        except Exception as e:
+            print(f"Failed processing {len(pending)} {source_type.__tablename__}: {str(e)}")
+            return
+        for (item, original), (_, label, probability, disaster_type) in zip(pending, results):
+            # Convert %20 to space in the disaster_type label before saving
+            disaster_type = disaster_type.replace('%20', ' ')
+            new_result = Result(
+                source_id=original.id,
+                content=original.content,  # Use original content
+                date_time=item.date_time,
+                is_disaster=label,
+                probability=probability,
+                disaster_type=disaster_type,  # Saved with converted label
+                source_type=source_type.__tablename__
+            )
+            db_session.add(new_result)
+            item.processed = True
+        print(f"Processed {len(pending)} {source_type.__tablename__}")
+
+    def benchmark(self, texts, batch_sizes=(1, 8, 32, 128)):
+        """
+        Report CPU throughput of predict_logits at each batch size.
+        """
+        self.predict_logits(texts[:8])  # 预热，排除首次调用的图构建开销
+        print("batch_size  items/s")
+        for batch_size in batch_sizes:
+            started = time.perf_counter()
+            self.predict_logits(texts, batch_size)
+            elapsed = time.perf_counter() - started
+            print(f"{batch_size:10d}  {len(texts) / elapsed:7.1f}")
+
     def predict_and_save(self):
         """
         Continuously predict and save results from new translated topics and replies.
@@ -108,18 +171,15 @@ class DisasterTweetModel:
         try:
             while True:
                 print("[Debug] Checking for new data to process...")
-                untranslated_topics = db_session.query(TranslatedTopics).filter(TranslatedTopics.processed == False).all()
-                untranslated_replies = db_session.query(TranslatedReplies).filter(TranslatedReplies.processed == False).all()
-                untranslated_comments = db_session.query(TranslatedUsersComments).filter(TranslatedUsersComments.processed == False).all()
-
                 with db_session.no_autoflush:
-                    self.process_and_save_results(db_session, untranslated_topics, Topics)
-                    self.process_and_save_results(db_session, untranslated_replies, Replies)
-                    self.process_and_save_results(db_session, untranslated_comments, UsersComments)
-                    with db_lock:
-                        db_session.commit()
-                print("[Debug] Model write successful, sleeping for 10 seconds...")
-                time.sleep(10)
+                    for source, source_type in self.sources:
+                        for items in source.batches(db_session):
+                            self.process_and_save_results(db_session, items, source_type)
+                    # 每轮最多 max_rows 行，读完再提交，不打断正在流式读取的查询
+                    db_session.commit()
+                if not any(source.has_more for source, _ in self.sources):
+                    print("[Debug] Model write successful, sleeping for 10 seconds...")
+                    time.sleep(10)
         except SQLAlchemyError as db_err:
             db_session.rollback()
             print(f"Database error during processing: {db_err}")
@@ -137,4 +197,14 @@ class DisasterTweetModel:
         print("[Debug] Model activated")
         self.predict_and_save()
 
-
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark batched DistilBERT inference on CPU')
+    parser.add_argument('--train', default='dataset/train.csv')
+    parser.add_argument('--test', default='dataset/test.csv')
+    parser.add_argument('--text-column', default='text')
+    parser.add_argument('--limit', type=int, default=512)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--backend', choices=['tf', 'onnx'], default='tf')
+    args = parser.parse_args()
+    model = DisasterTweetModel(args.train, args.test, None, backend=args.backend)
+    model.benchmark(model.df_test[args.text_column].astype(str).tolist()[:args.limit], args.batch_sizes)
@@ -9,10 +9,9 @@ import random
 import re
 from class_datatypes import Topics, Replies
 from datetime import datetime
-from lock import db_lock
 
 class Spider:
-    def __init__(self, config, Session, options) -> None:
+    def __init__(self, config, Session, options, writer) -> None:
         self.username = config['User']['username']  # 学号
         self.password = config['User']['password']  # 密码
         self.entries = config['User']['entries']  # 希望爬取的树洞数
@@ -20,6 +19,7 @@ class Spider:
         self.timeout = config['User']['timeout']  # 树洞刷新间隔
         self.google = None
         self.Session = Session
+        self.writer = writer
         self.initialize_driver(options)
         print("[Debug] Spider initialized")
 
@@ -69,62 +69,67 @@ class Spider:
             self.clean_up()
             raise e
 
+    def store_posts(self, topic, replies):
+        """返回交给 DBWriter 的写操作：插入尚不存在的树洞和回复"""
+        def write(db_session):
+            if topic and db_session.get(Topics, topic['id']) is None:
+                db_session.add(Topics(**topic))
+            reply_ids = [reply['id'] for reply in replies]
+            existing = {row.id for row in db_session.query(Replies.id).filter(Replies.id.in_(reply_ids))} if reply_ids else set()
+            for reply in replies:
+                if reply['id'] not in existing:
+                    db_session.add(Replies(**reply))
+        return write
+
     def crawlFlowItems(self, flow_items):
-        db_session = self.Session()
         print("[Debug] Spider tries to write to database")
+        ops = []
+        for flow_item in flow_items:
+            flow_item.click()
+            time.sleep(random.randint(1, 5))
+            sidebar = WebDriverWait(self.google, 10).until(
+                EC.presence_of_element_located((By.XPATH, "//div[contains(@class,'sidebar')]"))
+            )
+            headers = sidebar.find_elements(By.XPATH, "//div[contains(@class,'box-header box-header-top-icon')]")
+            codes_in_sidebar = sidebar.find_elements(By.CLASS_NAME, "box-id")
+            box_contents_in_sidebar = sidebar.find_elements(By.XPATH, "//div[contains(@class,'box-content box-content-detail')]")
+
+            topic = None
+            replies = []
+            for index, (header, code, box_content) in enumerate(zip(headers, codes_in_sidebar, box_contents_in_sidebar)):
+                code = int(code.text[1:])
+                full_header_text = header.text
+                date_time_match = re.search(r'(\d{4}-)?\d{2}-\d{2} \d{2}:\d{2}', full_header_text)
+                date_time = date_time_match.group() if date_time_match else "Unknown Date-Time"
+
+                try:
+                    if date_time.startswith('20'):
+                        date_time_obj = datetime.strptime(date_time, "%Y-%m-%d %H:%M")
+                    else:
+                        current_year = datetime.now().year
+                        date_time_obj = datetime.strptime(f"{current_year}-{date_time}", "%Y-%m-%d %H:%M")
+                except ValueError:
+                    print("Error: Incorrect date format.")
+                    date_time_obj = None
+
+                if index == 0:
+                    topic = dict(id=code, content=box_content.text, date_time=date_time_obj)
+                else:
+                    replies.append(dict(id=code, content=box_content.text, topic_id=int(codes_in_sidebar[0].text[1:]), date_time=date_time_obj))
+
+            sidebar.find_element(By.CSS_SELECTOR, "span.icon.icon-close").click()
+            time.sleep(random.randint(1, 5))
+
+            # 不等待写入完成，继续爬取下一条，由 DBWriter 合并成批量事务
+            ops.append(self.writer.submit(self.store_posts(topic, replies)))
+
         try:
-            for flow_item in flow_items:
-                flow_item.click()
-                time.sleep(random.randint(1, 5))
-                sidebar = WebDriverWait(self.google, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(@class,'sidebar')]"))
-                )
-                headers = sidebar.find_elements(By.XPATH, "//div[contains(@class,'box-header box-header-top-icon')]")
-                codes_in_sidebar = sidebar.find_elements(By.CLASS_NAME, "box-id")
-                box_contents_in_sidebar = sidebar.find_elements(By.XPATH, "//div[contains(@class,'box-content box-content-detail')]")
-
-                for index, (header, code, box_content) in enumerate(zip(headers, codes_in_sidebar, box_contents_in_sidebar)):
-                    code = int(code.text[1:])
-                    full_header_text = header.text
-                    date_time_match = re.search(r'(\d{4}-)?\d{2}-\d{2} \d{2}:\d{2}', full_header_text)
-                    date_time = date_time_match.group() if date_time_match else "Unknown Date-Time"
-
-                    try:
-                        if date_time.startswith('20'):
-                            date_time_obj = datetime.strptime(date_time, "%Y-%m-%d %H:%M")
-                        else:
-                            current_year = datetime.now().year
-                            date_time_obj = datetime.strptime(f"{current_year}-{date_time}", "%Y-%m-%d %H:%M")
-                    except ValueError:
-                        print("Error: Incorrect date format.")
-                        date_time_obj = None
-
-                    with db_session.no_autoflush:
-                        if index == 0:
-                            existing_topic = db_session.query(Topics).filter_by(id=code).first()
-                            if not existing_topic:
-                                new_topic = Topics(id=code, content=box_content.text, date_time=date_time_obj)
-                                with db_lock:
-                                    db_session.add(new_topic)
-                        else:
-                            existing_reply = db_session.query(Replies).filter_by(id=code).first()
-                            if not existing_reply:
-                                new_reply = Replies(id=code, content=box_content.text, topic_id=int(codes_in_sidebar[0].text[1:]), date_time=date_time_obj)
-                                with db_lock:
-                                    db_session.add(new_reply)
-
-                sidebar.find_element(By.CSS_SELECTOR, "span.icon.icon-close").click()
-                time.sleep(random.randint(1, 5))
-
-                with db_lock:
-                    db_session.commit()
-                print("[Debug] Spider write successful")
+            for op in ops:
+                op.wait()
+            print("[Debug] Spider write successful")
         except Exception as e:
             print(f"[Error] Spider write failed: {e}")
-            db_session.rollback()
             raise e
-        finally:
-            db_session.close()
 
     def run(self):
         print("[Debug] Spider activated")
@@ -1,68 +1,183 @@
+import argparse
+import torch
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-import nltk
-from nltk.tokenize import sent_tokenize
 import time
 from class_datatypes import TranslatedTopics, TranslatedReplies, TranslatedUsersComments, Topics, Replies, UsersComments
+from class_WorkSource import WorkSource
+from class_Segmenter import SentenceSegmenter
+from class_TranslationMemory import TranslationMemory
+
+# 原文表 -> (译文表, 需要一并复制的字段)
+TRANSLATION_TARGETS = {
+    Topics: (TranslatedTopics, ()),
+    Replies: (TranslatedReplies, ('topic_id',)),
+    UsersComments: (TranslatedUsersComments, ()),
+}
 
 class Translator:
-    def __init__(self, model_name, Session):
+    def __init__(self, model_name, Session, writer, batch_size=16, max_tokens=128, memory_size=20000):
         self.Session = Session
+        self.writer = writer
+        # 所有待翻译帖子的句子按长度排序后，每 batch_size 句一次 generate
+        self.batch_size = batch_size
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-        # nltk.download('punkt')
+        # 原文表的 processed 属于分类器，翻译进度记在 translated 上
+        self.sources = [WorkSource(model, flag='translated') for model in TRANSLATION_TARGETS]
+        # 按中英文句末标点和换行切句，超过 max_tokens 的句子再切开，限制单条序列的长度
+        self.segmenter = SentenceSegmenter(self.count_tokens, max_tokens)
+        # 句子级翻译记忆：回复引用的原帖、重复的套话只翻译一次
+        self.memory = TranslationMemory(Session, model_name, memory_size)
         print("[Debug] Translator initialized")
 
-    def translate_text(self, text, src_lang="zh", tgt_lang="eng_Latn", max_new_tokens=500):
-        sentences = sent_tokenize(text)
-        translations = []
-        for sentence in sentences:
-            # Assume `preprocess_text` is defined somewhere in the class or module
-            # processed_text = self.preprocess_text(sentence) 
-            inputs = self.tokenizer(sentence, return_tensors="pt", padding=True)
-            translated_tokens = self.model.generate(
-                inputs.input_ids, 
-                forced_bos_token_id=self.tokenizer.lang_code_to_id[tgt_lang],
-                max_new_tokens=max_new_tokens
+    def count_tokens(self, text):
+        return len(self.tokenizer(text, add_special_tokens=False)['input_ids'])
+
+    def split_sentences(self, text):
+        return [chunk for chunk, _ in self.segmenter.split(text)]
+
+    def translate_sentences(self, sentences, tgt_lang="eng_Latn", max_new_tokens=500, batch_size=None, use_memory=True, on_translated=None):
+        """
+        Translate a list of sentences, returning the translations in the same order.
+        Sentences found in the translation memory are reused; only the distinct
+        misses are generated. on_translated(index, translation), if given, is
+        called for memory hits first and then as each padded batch finishes.
+        """
+        if not use_memory:
+            return self.generate(sentences, tgt_lang, max_new_tokens, batch_size, on_translated)
+        found, db_hits = self.memory.lookup(sentences, tgt_lang)
+        # 未命中的句子 -> 它在 sentences 中出现的位置，相同的句子只生成一次
+        positions = {}
+        for index, sentence in enumerate(sentences):
+            if sentence in found:
+                if on_translated:
+                    on_translated(index, found[sentence])
+            else:
+                positions.setdefault(sentence, []).append(index)
+        misses = list(positions)
+
+        def fan_out(miss, translation):
+            for index in positions[misses[miss]]:
+                on_translated(index, translation)
+
+        generated = dict(zip(misses, self.generate(misses, tgt_lang, max_new_tokens, batch_size, fan_out if on_translated else None)))
+        ops = [self.memory.touch(db_hits, tgt_lang)] if db_hits else []
+        if generated:
+            ops.append(self.memory.store(generated, tgt_lang))
+        if self.writer is not None:
+            for op in ops:
+                self.writer.submit(op)
+        found.update(generated)
+        return [found[sentence] for sentence in sentences]
+
+    def generate(self, sentences, tgt_lang="eng_Latn", max_new_tokens=500, batch_size=None, on_translated=None):
+        """
+        Run the model on sentences sorted by token length, in padded batches.
+        on_translated(index, translation) is called as each batch is decoded.
+        """
+        batch_size = batch_size or self.batch_size
+        translations = [""] * len(sentences)
+        if not sentences:
+            return translations
+        encoded = self.tokenizer(sentences)
+        order = sorted(range(len(sentences)), key=lambda i: len(encoded['input_ids'][i]))
+        forced_bos_token_id = self.tokenizer.convert_tokens_to_ids(tgt_lang)
+        for start in range(0, len(order), batch_size):
+            bucket = order[start:start + batch_size]
+            inputs = self.tokenizer.pad(
+                {key: [encoded[key][i] for i in bucket] for key in ('input_ids', 'attention_mask')},
+                padding='longest', return_tensors='pt',
             )
-            translated_text = self.tokenizer.decode(translated_tokens[0], skip_special_tokens=True)
-            translations.append(translated_text)
-        return " ".join(translations)
+            with torch.inference_mode():
+                translated_tokens = self.model.generate(
+                    **inputs,
+                    forced_bos_token_id=forced_bos_token_id,
+                    max_new_tokens=max_new_tokens
+                )
+            for i, translated_text in zip(bucket, self.tokenizer.batch_decode(translated_tokens, skip_special_tokens=True)):
+                translations[i] = translated_text
+                if on_translated:
+                    on_translated(i, translated_text)
+        return translations
+
+    def translate_posts(self, texts, tgt_lang="eng_Latn", max_new_tokens=500, batch_size=None, on_post=None):
+        """
+        Translate many posts at once: their sentences are translated together and
+        joined back per post with the separators from the segmenter.
+        on_post(index, translation), if given, is called as soon as the last
+        sentence of a post is translated, without waiting for the other posts.
+        """
+        owners, sentences, separators, spans = [], [], [], []
+        for index, text in enumerate(texts):
+            start = len(sentences)
+            for sentence, separator in self.segmenter.split(text):
+                owners.append(index)
+                sentences.append(sentence)
+                separators.append(separator)
+            spans.append((start, len(sentences)))
+        translated = [None] * len(sentences)
+        remaining = [end - start for start, end in spans]
+
+        def join(index):
+            start, end = spans[index]
+            return "".join(translated[i] + separators[i] for i in range(start, end))
+
+        def on_translated(i, translation):
+            translated[i] = translation
+            index = owners[i]
+            remaining[index] -= 1
+            if remaining[index] == 0 and on_post:
+                on_post(index, join(index))
+
+        if on_post:
+            for index in range(len(texts)):
+                if remaining[index] == 0:
+                    on_post(index, "")
+        self.translate_sentences(sentences, tgt_lang, max_new_tokens, batch_size, on_translated=on_translated)
+        return [join(index) for index in range(len(texts))]
+
+    def translate_text(self, text, src_lang="zh", tgt_lang="eng_Latn", max_new_tokens=500):
+        return self.translate_posts([text], tgt_lang, max_new_tokens)[0]
+
+    def store_translation(self, source_type, translated_type, source_id, fields):
+        """返回交给 DBWriter 的写操作：保存译文并把原文标记为已翻译"""
+        def write(db_session):
+            db_session.merge(translated_type(id=source_id, **fields))
+            db_session.query(source_type).filter(source_type.id == source_id).update({'translated': True}, synchronize_session=False)
+        return write
+
+    def translate_and_save(self, items, source_type):
+        """跨帖子批量翻译一批记录，每个帖子翻译完成后立即交给 DBWriter"""
+        translated_type, extra_fields = TRANSLATION_TARGETS[source_type]
+        ops = []
+
+        def save(index, content):
+            item = items[index]
+            fields = dict(date_time=item.date_time, content=content)
+            fields.update((name, getattr(item, name)) for name in extra_fields)
+            ops.append(self.writer.submit(self.store_translation(source_type, translated_type, item.id, fields)))
+
+        started = time.monotonic()
+        self.translate_posts([item.content for item in items], on_post=save)
+        print(f"[Debug] Translated {len(items)} {source_type.__tablename__} in {time.monotonic() - started:.1f}s")
+        # 等待 DBWriter 把这一批的译文提交到数据库
+        for op in ops:
+            op.wait()
 
     def translate_database_contents(self):
         db_session = self.Session()
-        # 查询所有未翻译的Topics
         print("[Debug] Translator tries to write to database")
         try:
-            with db_session.no_autoflush:
-                untranslated_topics = db_session.query(Topics).filter(Topics.processed == False).all()
-                untranslated_replies = db_session.query(Replies).filter(Replies.processed == False).all()
-                untranslated_comments = db_session.query(UsersComments).filter(UsersComments.processed == False).all()
-
-                for topic in untranslated_topics:
-                    translated_content = self.translate_text(topic.content)
-                    translated_topic = TranslatedTopics(id=topic.id, content=translated_content, date_time=topic.date_time)
-                    db_session.merge(translated_topic)
-                    topic.processed = True
-
-                for reply in untranslated_replies:
-                    translated_content = self.translate_text(reply.content)
-                    translated_reply = TranslatedReplies(id=reply.id, content=translated_content, date_time=reply.date_time, topic_id=reply.topic_id)
-                    db_session.merge(translated_reply)
-                    reply.processed = True
-                        
-                for comment in untranslated_comments:
-                    translated_content = self.translate_text(comment.content)
-                    translated_comment = TranslatedUsersComments(id=comment.id, content=translated_content, date_time=comment.date_time)
-                    db_session.merge(translated_comment)
-                    comment.processed = True
-
-            # 尝试提交所有翻译到数据库
-            db_session.commit()
-            print("[Debug] Translator write successful")
+            translated = False
+            for source in self.sources:
+                for items in source.batches(db_session):
+                    self.translate_and_save(items, source.model)
+                    translated = True
+            if translated:
+                print(f"[Debug] Translation memory: {self.memory.stats()}")
+                print("[Debug] Translator write successful")
         except Exception as e:
-            # 如果出现异常，进行回滚
             print("[Debug] Translator write failed")
-            db_session.rollback()
             raise e
         finally:
             db_session.close()
@@ -72,8 +187,42 @@ class Translator:
         while True:
             print("[Debug] Translator begins a new translating round")
             self.translate_database_contents()
-            time.sleep(10)  # Adjust this sleep time as necessary for your application
+            if not any(source.has_more for source in self.sources):
+                time.sleep(10)  # Adjust this sleep time as necessary for your application
     
+    def benchmark(self, texts, batch_sizes=(1, 8, 16, 32)):
+        """比较逐句翻译 (batch_size=1，即原来的做法) 与跨帖子批量翻译的吞吐"""
+        sentences = [sentence for text in texts for sentence in self.split_sentences(text)]
+        self.translate_sentences(sentences[:4], use_memory=False)  # 预热
+        print(f"{len(texts)} posts, {len(sentences)} sentences")
+        print("batch_size  sentences/s")
+        for batch_size in batch_sizes:
+            started = time.perf_counter()
+            self.translate_sentences(sentences, batch_size=batch_size, use_memory=False)
+            elapsed = time.perf_counter() - started
+            print(f"{batch_size:10d}  {len(sentences) / elapsed:11.2f}")
+        # 同一批样本经过翻译记忆，重复的句子只翻译一次
+        started = time.perf_counter()
+        self.translate_sentences(sentences)
+        elapsed = time.perf_counter() - started
+        print(f"{'memory':>10s}  {len(sentences) / elapsed:11.2f}  {self.memory.stats()}")
+
     def __del__(self):
             """资源清理"""
-            self.Session.remove()  # 关闭 session
+            if self.Session is not None:
+                self.Session.remove()  # 关闭 session
+
+if __name__ == '__main__':
+    import database
+    from sqlalchemy import select
+    parser = argparse.ArgumentParser(description='Benchmark batched NLLB translation on posts from the database')
+    parser.add_argument('--db', default='data/forum.db')
+    parser.add_argument('--model', default='nllb-200-distilled-600M')
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 16, 32])
+    args = parser.parse_args()
+    Session = database.create_session(args.db)
+    db_session = Session()
+    texts = db_session.scalars(select(Topics.content).order_by(Topics.id.desc()).limit(args.limit)).all()
+    db_session.close()
+    Translator(args.model, Session, None).benchmark(texts, args.batch_sizes)
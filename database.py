@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool, NullPool
+import class_datatypes
+import class_Migrations
+
+# WAL 模式下读不会被写阻塞，写之间由 SQLite 自己排队 (busy_timeout)，不再需要进程内的全局锁
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',    # WAL 下只在 checkpoint 时 fsync，崩溃不会损坏数据库
+    'busy_timeout': 10000,      # 毫秒，等待其它写者提交而不是立即报 database is locked
+    'cache_size': -32000,       # 负数表示 KiB，即每个连接约 32MB 页缓存
+    'temp_store': 'MEMORY',
+}
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+def create_db_engine(db_path, readers=8):
+    """
+    创建 SQLite engine。连接池大小为 readers 个读连接加 1 个写连接，
+    SQLite 同一时间只允许一个写者，更多的写连接只会在 busy_timeout 上排队。
+    """
+    engine = create_engine(
+        f'sqlite:///{db_path}',
+        connect_args={"check_same_thread": False, "timeout": SQLITE_PRAGMAS['busy_timeout'] / 1000},
+        poolclass=QueuePool,
+        pool_size=readers + 1,
+        max_overflow=readers,
+        pool_timeout=30,
+        pool_pre_ping=False,
+    )
+    event.listen(engine, 'connect', set_sqlite_pragmas)
+    return engine
+
+def create_session(db_path, readers=8):
+    """初始化数据库连接池和线程局部的会话工厂"""
+    engine = create_db_engine(db_path, readers)
+    return scoped_session(sessionmaker(bind=engine))
+
+@contextmanager
+def independent_session(Session):
+    """
+    不经过 scoped_session 的新会话，用完即关闭。调用方可能正持有本线程的 scoped session
+    (例如正在 DBWriter 的事务里)，在这里 close() 不会影响它。
+    """
+    db_session = Session.session_factory()
+    try:
+        yield db_session
+    finally:
+        db_session.close()
+
+def create_schema_engine(url):
+    """
+    建表和迁移专用的 engine：关闭 pysqlite 自己的事务管理，每个事务都以 BEGIN IMMEDIATE 开始，
+    先拿到写锁再检查 schema，同时启动的多个进程因此依次执行，不会重复建表或重复迁移。
+    """
+    engine = create_engine(url, poolclass=NullPool, connect_args={"timeout": 60})
+
+    @event.listens_for(engine, 'connect')
+    def disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def begin_immediate(conn):
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+    return engine
+
+def create_schema(Session):
+    """创建数据库表，并把已有数据库迁移到最新的 schema。可以在多个进程中同时调用，迁移是幂等的"""
+    engine = create_schema_engine(Session().bind.url)
+    try:
+        with engine.begin() as conn:
+            class_datatypes.Base.metadata.create_all(conn)
+        class_Migrations.MigrationRunner(engine).run()
+    finally:
+        engine.dispose()
@@ -0,0 +1,109 @@
+"""
+Export model/distilbert_disaster_model to ONNX with dynamic int8 quantization,
+for DisasterTweetModel(backend='onnx').
+
+    python export_onnx.py            # 导出
+    python export_onnx.py --check    # 导出后与 TensorFlow 模型对比一致性、延迟和内存
+
+Exporting needs tensorflow, tf2onnx and onnxruntime; the onnx backend itself
+only needs onnxruntime.
+"""
+import argparse
+import os
+import resource
+import time
+import numpy as np
+import pandas as pd
+from class_model import DisasterTweetModel, ONNX_MODEL_PATH
+
+def export(model_path, output_path, opset=13):
+    import tensorflow as tf
+    import tf2onnx
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from transformers import TFDistilBertForSequenceClassification
+
+    model = TFDistilBertForSequenceClassification.from_pretrained(model_path)
+    spec = (
+        tf.TensorSpec((None, None), tf.int64, name='input_ids'),
+        tf.TensorSpec((None, None), tf.int64, name='attention_mask'),
+    )
+
+    @tf.function(input_signature=spec)
+    def serving(input_ids, attention_mask):
+        logits = model(input_ids=tf.cast(input_ids, tf.int32), attention_mask=tf.cast(attention_mask, tf.int32), training=False).logits
+        return tf.identity(logits, name='logits')
+
+    # 先导出 fp32，再对权重做动态 int8 量化；batch 和序列长度两个维度都是动态的
+    fp32_path = os.path.splitext(output_path)[0] + '.fp32.onnx'
+    tf2onnx.convert.from_function(serving, input_signature=spec, opset=opset, output_path=fp32_path)
+    quantize_dynamic(fp32_path, output_path, weight_type=QuantType.QInt8)
+    print(f"[Debug] Exported {fp32_path} ({os.path.getsize(fp32_path) / 2**20:.1f} MB)")
+    print(f"[Debug] Quantized {output_path} ({os.path.getsize(output_path) / 2**20:.1f} MB)")
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(backend, args, texts):
+    """加载一个后端并测量加载时间、内存增量、单条延迟和批量吞吐"""
+    rss_before, started = max_rss_mb(), time.perf_counter()
+    model = DisasterTweetModel(args.train, args.test, None, backend=backend, onnx_path=args.output)
+    load_seconds, rss = time.perf_counter() - started, max_rss_mb() - rss_before
+
+    model.predict_logits(texts[:8])  # 预热
+    single = []
+    for text in texts[:50]:
+        started = time.perf_counter()
+        model.predict_logits([text], 1)
+        single.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    logits = model.predict_logits(texts, args.batch_size)
+    throughput = len(texts) / (time.perf_counter() - started)
+    stats = {'load_s': load_seconds, 'rss_mb': rss, 'p50_ms': np.median(single) * 1000, 'items_s': throughput}
+    return model, logits, stats
+
+def check(args):
+    df = pd.read_csv(args.test)
+    if args.limit:
+        df = df.head(args.limit)
+    texts = df[args.text_column].astype(str).tolist()
+
+    # 先加载 ONNX：ru_maxrss 是峰值，只增不减，反过来测会把 TensorFlow 的内存算进去
+    onnx_model, onnx_logits, onnx_stats = measure('onnx', args, texts)
+    _, tf_logits, tf_stats = measure('tf', args, texts)
+
+    onnx_results = onnx_model.interpret_predictions(onnx_logits, texts)
+    tf_results = onnx_model.interpret_predictions(tf_logits, texts)
+    same_label = np.mean([a[3] == b[3] for a, b in zip(onnx_results, tf_results)])
+    same_flag = np.mean([a[1] == b[1] for a, b in zip(onnx_results, tf_results)])
+    probability_diff = max(abs(a[2] - b[2]) for a, b in zip(onnx_results, tf_results))
+
+    print(f"{len(texts)} texts from {args.test}")
+    print(f"label agreement {same_label:.4f}, is_disaster agreement {same_flag:.4f}, max probability diff {probability_diff:.4f}")
+    if args.label_column in df.columns:
+        labels = df[args.label_column]
+        known = labels.notna().to_numpy()
+        for name, results in (('tf', tf_results), ('onnx', onnx_results)):
+            correct = [result[3] == label for result, label, ok in zip(results, labels, known) if ok]
+            print(f"{name} {args.label_column} accuracy {np.mean(correct):.4f} on {len(correct)} labelled rows")
+    print("backend  load_s  rss_mb  p50_ms  items/s")
+    for name, stats in (('tf', tf_stats), ('onnx', onnx_stats)):
+        print(f"{name:7s}  {stats['load_s']:6.1f}  {stats['rss_mb']:6.0f}  {stats['p50_ms']:6.1f}  {stats['items_s']:7.1f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the DistilBERT classifier to int8 ONNX')
+    parser.add_argument('--model-path', default='model/distilbert_disaster_model')
+    parser.add_argument('--output', default=ONNX_MODEL_PATH)
+    parser.add_argument('--opset', type=int, default=13)
+    parser.add_argument('--skip-export', action='store_true', help='only run --check on an existing export')
+    parser.add_argument('--check', action='store_true', help='compare parity, latency and memory with the TensorFlow model')
+    parser.add_argument('--train', default='dataset/train.csv')
+    parser.add_argument('--test', default='dataset/test.csv')
+    parser.add_argument('--text-column', default='text')
+    parser.add_argument('--label-column', default='keyword')
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+    if not args.skip_export:
+        export(args.model_path, args.output, args.opset)
+    if args.check:
+        check(args)
@@ -1,61 +1,20 @@
 import { createStore } from 'vuex';
-import axios from 'axios';
 
 const apiBase = 'http://10.129.199.88:2222';
 
 export default createStore({
   state: {
-    isLoggedIn: false,
-    userVotesAndRatings: {
-      resultVotes: [],
-      warningVotes: [],
-      resultRatings: [],
-      warningRatings: []
-    }
+    isLoggedIn: false
   },
   mutations: {
     setLoginState(state, isLoggedIn) {
       state.isLoggedIn = isLoggedIn;
-    },
-    setUserVotesAndRatings(state, data) {
-      state.userVotesAndRatings = data;
     }
   },
   actions: {
-    async fetchUserVotesAndRatings({ commit }) {
-      try {
-        const token = localStorage.getItem('jwt');
-        if (!token) {
-          throw new Error('No JWT token found');
-        }
-        const response = await axios.get(`${apiBase}/api/user-votes-and-ratings`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        });
-        commit('setUserVotesAndRatings', response.data);
-        return response.data;  // 添加这行
-      } catch (error) {
-        // Detailed error logging
-        if (error.response) {
-          console.error('API response error:', error.response.data);
-        } else if (error.request) {
-          console.error('No response received:', error.request);
-        } else {
-          console.error('Request setup error:', error.message);
-        }
-        throw error;
-      }
-    },
     logout({ commit }) {
       localStorage.removeItem('jwt');
       commit('setLoginState', false);
-      commit('setUserVotesAndRatings', {
-        resultVotes: [],
-        warningVotes: [],
-        resultRatings: [],
-        warningRatings: []
-      });
     },
     async login({ commit, dispatch }, token) {
       try {
@@ -65,7 +24,6 @@ export default createStore({
         console.log('Saving JWT token:', token); // 打印保存的 JWT token
         localStorage.setItem('jwt', token);
         commit('setLoginState', true);
-        await dispatch('fetchUserVotesAndRatings');
         dispatch('refreshCaptcha'); // Refresh captcha image on login
       } catch (error) {
         console.error('Login error:', error);
@@ -76,7 +34,6 @@ export default createStore({
       const token = localStorage.getItem('jwt');
       if (token) {
         commit('setLoginState', true);
-        await dispatch('fetchUserVotesAndRatings');
         dispatch('refreshCaptcha'); // Refresh captcha image on status check
       } else {
         commit('setLoginState', false);
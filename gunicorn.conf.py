@@ -0,0 +1,12 @@
+# 生产环境运行 API：gunicorn -c gunicorn.conf.py backend:app
+# gevent worker 中每个 SSE 连接 (/api/stream) 是一个协程，空闲时不占用操作系统线程；
+# python backend.py 或默认的 sync/gthread worker 则每个订阅者一直占着一个线程。
+import multiprocessing
+
+bind = '0.0.0.0:2222'
+worker_class = 'gevent'
+workers = min(4, multiprocessing.cpu_count() * 2)
+# 每个 worker 同时保持的连接数，包括 SSE 长连接
+worker_connections = 1000
+# backend 在导入时启动 EventBroker 线程、打开数据库连接池，必须在 gevent 打过补丁的 worker 中导入
+preload_app = False
@@ -1,4 +0,0 @@
-import threading
-
-# 创建一个全局锁
-db_lock = threading.Lock()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import sys
+from typing import Any
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database
+
+try:
+    from langchain.llms.base import LLM
+except ImportError:
+    LLM = None
+
+if LLM is not None:
+    class ScriptedLLM(LLM):
+        """按提示词返回预先写好的回答，记录每次调用的提示词，用于离线测试 LangChainModel"""
+        respond: Any
+        prompts: list = []
+
+        @property
+        def _llm_type(self):
+            return 'scripted'
+
+        def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+            self.prompts.append(prompt)
+            return self.respond(prompt)
+
+@pytest.fixture
+def Session(tmp_path):
+    """每个测试使用一个临时的 SQLite 文件，pragma、连接池和 schema 与生产环境相同"""
+    Session = database.create_session(str(tmp_path / 'test.db'))
+    database.create_schema(Session)
+    yield Session
+    Session.remove()
+    Session.session_factory.kw['bind'].dispose()
+
+@pytest.fixture(scope='session')
+def backend_module(tmp_path_factory):
+    """
+    backend.py 在导入时读取 config.ini 并打开相对路径 data/forum.db，
+    因此在临时目录中导入，整个测试会话都留在该目录，避免碰到真实的数据库。
+    """
+    workdir = tmp_path_factory.mktemp('backend')
+    shutil.copy(os.path.join(ROOT, 'config.ini.sample'), workdir / 'config.ini')
+    (workdir / 'data').mkdir()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import backend
+        yield backend
+    finally:
+        os.chdir(cwd)
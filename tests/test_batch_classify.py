@@ -0,0 +1,96 @@
+import re
+import threading
+from datetime import datetime
+import pytest
+
+pytest.importorskip('langchain')
+from conftest import ScriptedLLM
+from class_ChatGPT import LangChainModel
+from class_DBWriter import DBWriter
+from class_LLMDispatcher import LLMDispatcher
+from class_datatypes import Topics, Result
+
+def questions(prompt):
+    """取出批量提示词中 Human: 之后的编号文本"""
+    body = prompt.rsplit('Human:', 1)[1].rsplit('AI:', 1)[0]
+    return re.findall(r'^\s*(\d+)\. (.*)$', body, re.M)
+
+def single_answer(prompt):
+    question = prompt.rsplit('Human:', 1)[1].rsplit('AI:', 1)[0]
+    return 'Yes flood Wuxi 2024-5-23' if '洪水' in question else 'No'
+
+@pytest.fixture
+def make_model(Session):
+    models = []
+    def make(batch_answer, writer=None):
+        def respond(prompt):
+            if '条编号的文本' in prompt:
+                return batch_answer(prompt)
+            return single_answer(prompt)
+        llm = ScriptedLLM(respond=respond, prompts=[])
+        model = LangChainModel(Session, 'test', writer, llm=llm, dispatcher=LLMDispatcher(rpm=100000, tpm=10 ** 9))
+        models.append(model)
+        return model, llm
+    yield make
+    for model in models:
+        model.dispatcher.executor.shutdown()
+
+FLOOD = (True, 'flood', 'Wuxi', '2024-5-23')
+NO = (False, '', '', '')
+
+def test_parse_batch_response_out_of_order(make_model):
+    model, _ = make_model(lambda prompt: '')
+    response = "3. No\n1. Yes flood Wuxi 2024-5-23\n2) No"
+    assert model.parse_batch_response(response, 3) == [FLOOD, NO, NO]
+
+def test_parse_batch_response_missing_and_extra_lines(make_model):
+    model, _ = make_model(lambda prompt: '')
+    response = "\n".join([
+        "Here are the answers:",
+        "1. Yes flood Wuxi 2024-5-23",
+        "1. No",  # 重复的编号只取第一行
+        "4. No",  # 超出条目数
+        "0. No",
+        "3. maybe",  # 不是 Yes/No
+    ])
+    assert model.parse_batch_response(response, 3) == [FLOOD, None, None]
+
+def test_classify_batch_one_call_when_every_line_parses(make_model):
+    def batch_answer(prompt):
+        return "\n".join(f"{n}. {single_answer('Human: ' + text)}" for n, text in questions(prompt))
+    model, llm = make_model(batch_answer)
+    assert model.classify_batch(['今天天气很好', '无锡洪水了\n很严重', '吃饭了吗']) == [NO, FLOOD, NO]
+    assert len(llm.prompts) == 1
+    # 帖子内的换行被压成一行，不会打乱编号
+    assert questions(llm.prompts[0])[1] == ('2', '无锡洪水了 很严重')
+
+def test_classify_batch_retries_only_unparsable_items(make_model):
+    model, llm = make_model(lambda prompt: "1. No\n3. No")
+    assert model.classify_batch(['今天天气很好', '无锡洪水了', '吃饭了吗']) == [NO, FLOOD, NO]
+    assert len(llm.prompts) == 2
+    assert '无锡洪水了' in llm.prompts[1] and '条编号的文本' not in llm.prompts[1]
+
+def test_classify_batch_falls_back_when_batch_call_fails(make_model):
+    def batch_answer(prompt):
+        raise RuntimeError('bad gateway')
+    model, llm = make_model(batch_answer)
+    assert model.classify_batch(['无锡洪水了', '吃饭了吗']) == [FLOOD, NO]
+    assert len(llm.prompts) == 3
+
+def test_duplicate_posts_share_one_answer(Session, make_model):
+    writer = DBWriter(Session, max_delay=0.01)
+    threading.Thread(target=writer.run, daemon=True).start()
+    def batch_answer(prompt):
+        return "\n".join(f"{n}. {single_answer('Human: ' + text)}" for n, text in questions(prompt))
+    model, llm = make_model(batch_answer, writer)
+    db_session = Session()
+    try:
+        db_session.add_all(Topics(content=content, date_time=datetime(2024, 5, 23), processed=False) for content in ['无锡洪水了', ' 无锡洪水了 ', '吃饭了吗'])
+        db_session.commit()
+        model.process_and_save_results(db_session, db_session.query(Topics).order_by(Topics.id).all(), Topics)
+        # 两条内容相同的帖子只请求一次，但各自保存结果
+        assert [len(questions(prompt)) for prompt in llm.prompts] == [2]
+        assert sorted(r.source_id for r in db_session.query(Result)) == [1, 2]
+        assert db_session.query(Topics).filter(Topics.processed == False).count() == 0
+    finally:
+        db_session.close()
@@ -0,0 +1,89 @@
+import threading
+from datetime import datetime
+from sqlalchemy import func, select
+from class_datatypes import Topics, UsersComments
+from class_DBWriter import DBWriter
+
+PRODUCERS = 8
+WRITES_PER_PRODUCER = 200
+API_WRITERS = 4
+API_WRITES = 50
+READERS = 4
+
+def run_threads(targets):
+    errors = []
+    def guarded(target):
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=guarded, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=120)
+    return errors
+
+def test_writer_and_api_writes_never_lock(Session):
+    """流水线通过 DBWriter 写入，同时 API 风格的线程各自提交事务、读线程不停查询，都不应出现 database is locked"""
+    writer = DBWriter(Session, max_batch=50, max_delay=0.01)
+    threading.Thread(target=writer.run, daemon=True).start()
+    done = threading.Event()
+    reads, read_errors = [], []
+
+    def producer(n):
+        def insert(db_session):
+            db_session.add(Topics(content=f'topic {n}', date_time=datetime.now(), processed=False))
+        ops = [writer.submit(insert) for _ in range(WRITES_PER_PRODUCER)]
+        for op in ops:
+            op.wait(timeout=60)
+
+    def api_writer(n):
+        for i in range(API_WRITES):
+            db_session = Session()
+            try:
+                db_session.add(UsersComments(content=f'comment {n}-{i}', date_time=datetime.now(), processed=False))
+                db_session.commit()
+            finally:
+                db_session.close()
+
+    def reader():
+        while not done.is_set():
+            db_session = Session()
+            try:
+                reads.append(db_session.scalar(select(func.count(Topics.id))))
+            except Exception as e:
+                read_errors.append(e)
+            finally:
+                db_session.close()
+
+    reader_threads = [threading.Thread(target=reader, daemon=True) for _ in range(READERS)]
+    for thread in reader_threads:
+        thread.start()
+    errors = run_threads(
+        [lambda n=n: producer(n) for n in range(PRODUCERS)] +
+        [lambda n=n: api_writer(n) for n in range(API_WRITERS)]
+    )
+    done.set()
+    for thread in reader_threads:
+        thread.join(timeout=10)
+
+    assert errors == []
+    assert read_errors == []
+    db_session = Session()
+    try:
+        assert db_session.scalar(select(func.count(Topics.id))) == PRODUCERS * WRITES_PER_PRODUCER
+        assert db_session.scalar(select(func.count(UsersComments.id))) == API_WRITERS * API_WRITES
+    finally:
+        db_session.close()
+    # 读线程在写入期间持续成功读取
+    assert reads
+    assert writer.commits < PRODUCERS * WRITES_PER_PRODUCER  # 写操作被合并成了批量事务
+
+def test_wal_mode_is_enabled(Session):
+    db_session = Session()
+    try:
+        assert db_session.connection().exec_driver_sql('PRAGMA journal_mode').scalar().lower() == 'wal'
+        assert db_session.connection().exec_driver_sql('PRAGMA busy_timeout').scalar() == 10000
+    finally:
+        db_session.close()
@@ -0,0 +1,51 @@
+from datetime import timedelta
+from sqlalchemy import create_engine, text
+import database
+from class_EventStream import EventBroker, record_event
+from class_Migrations import MigrationRunner, MIGRATIONS
+
+def add_events(Session, count):
+    db_session = Session()
+    try:
+        for i in range(count):
+            record_event(db_session, 'warning', {'id': i})
+        db_session.commit()
+    finally:
+        db_session.close()
+
+def test_event_ids_are_not_reused_after_prune(Session):
+    broker = EventBroker(Session, retention=timedelta(seconds=-1))
+    add_events(Session, 3)
+    last_id = broker.latest_event_id()
+    broker.prune()
+    assert broker.latest_event_id() == 0
+    add_events(Session, 1)
+    # 清理之后的新事件仍然排在订阅者已读过的 id 之后
+    events = broker.fetch_events(last_id)
+    assert [event[0] for event in events] == [last_id + 1]
+
+def test_migration_rebuilds_legacy_events_table(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE events (id INTEGER NOT NULL PRIMARY KEY, kind VARCHAR(50) NOT NULL, payload TEXT, date_time DATETIME)"))
+        conn.execute(text("INSERT INTO events (id, kind, payload) VALUES (1, 'warning', '{}'), (2, 'result', '{}')"))
+        conn.execute(text("PRAGMA user_version = 2"))
+    engine.dispose()
+
+    Session = database.create_session(path)
+    database.create_schema(Session)
+    db_session = Session()
+    try:
+        conn = db_session.connection()
+        ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'events'")).scalar()
+        assert 'AUTOINCREMENT' in ddl.upper()
+        assert conn.execute(text("SELECT id, kind FROM events ORDER BY id")).all() == [(1, 'warning'), (2, 'result')]
+        conn.execute(text("DELETE FROM events WHERE id = 2"))
+        conn.execute(text("INSERT INTO events (kind) VALUES ('gdacs')"))
+        assert conn.execute(text("SELECT MAX(id) FROM events")).scalar() == 3
+    finally:
+        db_session.close()
+        Session.remove()
+    # 再次运行迁移不做任何事
+    assert MigrationRunner(Session.session_factory.kw['bind']).run() == MIGRATIONS[-1][0]
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+import pytest
+from class_datatypes import GDACS
+from class_GDACSIndex import GDACSIndex
+
+MAY = datetime(2024, 5, 23)
+
+def add_gdacs(Session, *rows):
+    db_session = Session()
+    try:
+        for content, location, date_time in rows:
+            db_session.add(GDACS(content=content, location=location, date_time=date_time))
+        db_session.commit()
+    finally:
+        db_session.close()
+
+def contents(rows):
+    return [row.content for row in rows]
+
+def test_aliases_and_countries_rank_candidates(Session):
+    add_gdacs(Session,
+        ('Green earthquake alert in Japan', 'Japan', MAY),
+        ('Orange flood alert in Japan', 'Japan', MAY),
+        ('Green earthquake alert in Chile', 'Chile', MAY),
+        ('Red drought alert in Kenya', 'Kenya', MAY),
+    )
+    index = GDACSIndex(Session, top_k=5)
+    # 中文的 地震/日本 映射到 earthquake/japan，类型和国家都重合的排在最前
+    assert contents(index.candidates('日本又地震了', MAY)) == [
+        'Green earthquake alert in Japan', 'Orange flood alert in Japan', 'Green earthquake alert in Chile',
+    ]
+    assert contents(index.candidates('台风登陆', MAY)) == []
+
+def test_time_window(Session):
+    add_gdacs(Session,
+        ('Green earthquake alert in Japan', 'Japan', MAY),
+        ('Green earthquake alert in Japan', 'Japan', MAY - timedelta(days=90)),
+    )
+    index = GDACSIndex(Session, window=timedelta(days=30))
+    assert [row.date_time for row in index.candidates('日本地震', MAY + timedelta(days=3))] == [MAY]
+    assert index.candidates('日本地震', MAY + timedelta(days=200)) == []
+    # 不给时间时不按时间过滤，分数相同的按时间从新到旧
+    assert [row.date_time for row in index.candidates('日本地震')] == [MAY, MAY - timedelta(days=90)]
+
+def test_top_k_cut_off(Session):
+    add_gdacs(Session, *[(f'Green flood alert in India {i}', 'India', MAY + timedelta(days=i)) for i in range(6)])
+    index = GDACSIndex(Session, top_k=2)
+    assert contents(index.candidates('印度洪水', MAY)) == ['Green flood alert in India 5', 'Green flood alert in India 4']
+
+def test_snapshot_refreshes_after_insert(Session):
+    index = GDACSIndex(Session)
+    empty = index.snapshot()
+    add_gdacs(Session, ('Green earthquake alert in Japan', 'Japan', MAY))
+    assert index.snapshot() != empty
+    assert len(index.candidates('日本地震', MAY)) == 1
+
+@pytest.mark.parametrize('response, related', [
+    ('No', []),
+    ('no', []),
+    ('No, none of the 3 events', []),
+    ('None of them. 3', []),
+    ('Yes flood Japan 2024-1-1', []),
+    ('2024-1-1', []),
+    ('2 4', [2, 4]),
+    ('  3\n', [3]),
+    ('1 9', [1]),  # 超出候选数量的编号忽略
+])
+def test_parse_gdacs_answer(response, related):
+    ChatGPT = pytest.importorskip('class_ChatGPT')
+    assert ChatGPT.parse_gdacs_answer(response, 5) == related
+
+@pytest.mark.parametrize('answer, expected', [('No', False), ('1', True), ('Yes earthquake Japan 2024-5-23', False)])
+def test_is_related_uses_gdacs_prompt(Session, answer, expected):
+    pytest.importorskip('langchain')
+    from conftest import ScriptedLLM
+    from class_ChatGPT import LangChainModel
+    from class_LLMDispatcher import LLMDispatcher
+    add_gdacs(Session, ('Green earthquake alert in Japan', 'Japan', MAY))
+    llm = ScriptedLLM(respond=lambda prompt: answer, prompts=[])
+    model = LangChainModel(Session, 'test', llm=llm, dispatcher=LLMDispatcher(rpm=100000, tpm=10 ** 9))
+    try:
+        assert model.is_related_to_any_gdacs(None, '日本地震了', MAY) is expected
+        assert len(llm.prompts) == 1
+        assert 'GDACS 事件' in llm.prompts[0] and '灾害专家' not in llm.prompts[0]
+        # 没有候选时不调用 LLM
+        assert model.is_related_to_any_gdacs(None, '今天天气很好', MAY) is False
+        assert len(llm.prompts) == 1
+    finally:
+        model.dispatcher.executor.shutdown()
@@ -0,0 +1,159 @@
+import threading
+from datetime import datetime
+from sqlalchemy import text
+from class_datatypes import Job, Warning, Result, Event
+from class_JobQueue import JobRunner, enqueue_delete_check
+from class_Migrations import MigrationRunner, MIGRATIONS
+
+class StubIndex:
+    def __init__(self):
+        self.version = '0:0'
+
+    def snapshot(self):
+        return self.version
+
+class StubModel:
+    """替身模型，按预设回答 GDACS 判定并记录调用次数"""
+    def __init__(self, related):
+        self.related = related
+        self.calls = 0
+        self.gdacs_index = StubIndex()
+
+    def is_related_to_any_gdacs(self, db_session, message_content, message_time=None):
+        self.calls += 1
+        return self.related
+
+def add_warning(Session):
+    db_session = Session()
+    try:
+        warning = Warning(disaster_type='flood', disaster_location='Wuxi', disaster_time='2024-05-23')
+        db_session.add(warning)
+        db_session.commit()
+        return warning.id
+    finally:
+        db_session.close()
+
+def enqueue(Session, kind, target_id):
+    db_session = Session()
+    try:
+        job = enqueue_delete_check(db_session, kind, target_id)
+        db_session.commit()
+        return job.id
+    finally:
+        db_session.close()
+
+def run_job(Session, runner, job_id):
+    assert runner.claim() == job_id
+    runner.process(job_id)
+    db_session = Session()
+    try:
+        job = db_session.get(Job, job_id)
+        return job.status, job.verdict, job.related
+    finally:
+        db_session.close()
+
+def test_enqueue_returns_the_active_job(Session):
+    first = enqueue(Session, 'delete_warning', 1)
+    assert enqueue(Session, 'delete_warning', 1) == first
+    assert enqueue(Session, 'delete_result', 1) != first
+
+def test_concurrent_enqueues_create_one_job(Session):
+    ids = []
+    def vote():
+        ids.append(enqueue(Session, 'delete_warning', 7))
+    threads = [threading.Thread(target=vote) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 1
+    db_session = Session()
+    try:
+        assert db_session.query(Job).count() == 1
+    finally:
+        db_session.close()
+
+def test_related_target_is_kept(Session):
+    warning_id = add_warning(Session)
+    model = StubModel(related=True)
+    runner = JobRunner(Session, model)
+    try:
+        assert run_job(Session, runner, enqueue(Session, 'delete_warning', warning_id)) == ('done', 'vetoed', True)
+        db_session = Session()
+        try:
+            assert db_session.get(Warning, warning_id) is not None
+        finally:
+            db_session.close()
+    finally:
+        runner.executor.shutdown()
+
+def test_unrelated_target_is_deleted(Session):
+    db_session = Session()
+    try:
+        result = Result(content='涨水了', date_time=datetime(2024, 5, 23), is_disaster=True, disaster_type='flood')
+        db_session.add(result)
+        db_session.commit()
+        result_id = result.id
+    finally:
+        db_session.close()
+    model = StubModel(related=False)
+    runner = JobRunner(Session, model)
+    try:
+        job_id = enqueue(Session, 'delete_result', result_id)
+        assert run_job(Session, runner, job_id) == ('done', 'deleted', False)
+        db_session = Session()
+        try:
+            assert db_session.get(Result, result_id) is None
+            assert [event.kind for event in db_session.query(Event)] == ['result_deleted']
+        finally:
+            db_session.close()
+        # 目标已经删除，再次排入的任务不再调用模型
+        assert run_job(Session, runner, enqueue(Session, 'delete_result', result_id))[1] == 'gone'
+        assert model.calls == 1
+    finally:
+        runner.executor.shutdown()
+
+def test_verdict_is_reused_until_gdacs_changes(Session):
+    warning_id = add_warning(Session)
+    model = StubModel(related=True)
+    runner = JobRunner(Session, model)
+    try:
+        run_job(Session, runner, enqueue(Session, 'delete_warning', warning_id))
+        run_job(Session, runner, enqueue(Session, 'delete_warning', warning_id))
+        assert model.calls == 1
+        model.gdacs_index.version = '1:1'
+        run_job(Session, runner, enqueue(Session, 'delete_warning', warning_id))
+        assert model.calls == 2
+    finally:
+        runner.executor.shutdown()
+
+def test_migration_retires_duplicate_active_jobs(Session):
+    engine = Session.session_factory.kw['bind']
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ux_jobs_active_kind_target"))
+        for status in ('pending', 'running', 'pending', 'done'):
+            conn.execute(text(f"INSERT INTO jobs (kind, target_id, status) VALUES ('delete_warning', 3, '{status}')"))
+        conn.execute(text("PRAGMA user_version = 4"))
+    assert MigrationRunner(engine).run() == MIGRATIONS[-1][0]
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, status FROM jobs ORDER BY id")).fetchall()
+    assert [status for _, status in rows] == ['pending', 'failed', 'failed', 'done']
+    assert enqueue(Session, 'delete_warning', 3) == rows[0][0]
+
+def test_job_status_endpoint(backend_module):
+    Session = backend_module.backend.session
+    job_id = enqueue(Session, 'delete_warning', 12345)
+    client = backend_module.app.test_client()
+    response = client.get(f'/api/jobs/{job_id}')
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'id': job_id, 'kind': 'delete_warning', 'target_id': 12345, 'status': 'pending', 'verdict': None, 'message': None,
+    }
+    db_session = Session()
+    try:
+        db_session.query(Job).filter(Job.id == job_id).update({'status': 'done', 'verdict': 'vetoed', 'message': 'Related'})
+        db_session.commit()
+    finally:
+        db_session.close()
+    assert client.get(f'/api/jobs/{job_id}').get_json()['verdict'] == 'vetoed'
+    assert client.get('/api/jobs/999999').status_code == 404
@@ -0,0 +1,85 @@
+import threading
+import time
+import random
+import pytest
+from class_LLMDispatcher import LLMDispatcher, TokenBucket, is_rate_limited
+
+class RateLimitError(Exception):
+    """与 openai.RateLimitError 同名的异常"""
+
+class HTTPError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = LLMDispatcher(concurrency=4, rpm=100000, tpm=10 ** 9, base_backoff=0.01, max_backoff=0.05)
+    yield dispatcher
+    dispatcher.executor.shutdown()
+
+def test_is_rate_limited():
+    assert is_rate_limited(RateLimitError('slow down'))
+    assert is_rate_limited(HTTPError('Too Many Requests', 429))
+    assert not is_rate_limited(HTTPError('Bad Gateway', 502))
+    # 消息里碰巧出现 429 不算限流
+    assert not is_rate_limited(ValueError('request req_429abc used 4290 tokens'))
+
+def test_map_returns_results_in_input_order(dispatcher):
+    def slow_square(n):
+        time.sleep(random.uniform(0, 0.02))
+        return n * n
+    assert list(dispatcher.map(slow_square, range(20))) == [n * n for n in range(20)]
+
+def test_map_runs_calls_concurrently(dispatcher):
+    running, peak, lock = [0], [0], threading.Lock()
+    def call(n):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+    list(dispatcher.map(call, range(8)))
+    assert peak[0] == 4
+
+def test_token_bucket_paces_after_burst():
+    bucket = TokenBucket(600)  # 每秒补充 10 个
+    started = time.monotonic()
+    bucket.acquire(600)
+    assert time.monotonic() - started < 0.1
+    bucket.acquire(5)
+    assert 0.4 <= time.monotonic() - started < 1.0
+
+def test_rate_limited_calls_back_off_and_retry(dispatcher):
+    backoffs = []
+    def call():
+        backoffs.append(dispatcher.backoff)
+        if len(backoffs) < 3:
+            raise RateLimitError('slow down')
+        return 'ok'
+    assert dispatcher.call(call, 1) == 'ok'
+    # 连续的 429 使退避时间翻倍，成功后复原
+    assert backoffs == [0.0, 0.01, 0.02]
+    assert dispatcher.backoff == 0.0
+    assert dispatcher.rate_limited == 2
+
+def test_other_errors_are_not_retried(dispatcher):
+    calls = []
+    def call():
+        calls.append(1)
+        raise ValueError('request req_429abc failed')
+    with pytest.raises(ValueError):
+        dispatcher.call(call, 1)
+    assert calls == [1]
+
+def test_gives_up_after_max_retries():
+    dispatcher = LLMDispatcher(rpm=100000, tpm=10 ** 9, max_retries=2, base_backoff=0.001)
+    calls = []
+    def call():
+        calls.append(1)
+        raise RateLimitError('slow down')
+    with pytest.raises(RateLimitError):
+        dispatcher.call(call, 1)
+    assert len(calls) == 3
+    dispatcher.executor.shutdown()
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, select, update
+from class_ClassificationCache import ClassificationCache
+from class_TranslationMemory import TranslationMemory
+from class_datatypes import ClassificationCache as CacheEntry
+
+PARSED = (True, 'flood', 'Wuxi', '2024-5-23')
+
+def apply(Session, write):
+    db_session = Session()
+    try:
+        write(db_session)
+        db_session.commit()
+    finally:
+        db_session.close()
+
+def count_entries(Session):
+    db_session = Session()
+    try:
+        return db_session.scalar(select(func.count(CacheEntry.id)))
+    finally:
+        db_session.close()
+
+def test_cache_round_trip(Session):
+    cache = ClassificationCache(Session, 'v1')
+    apply(Session, cache.store({'a': PARSED, 'b': (False, '', '', '')}))
+    assert cache.lookup(['a', 'b', 'c']) == {'a': PARSED, 'b': (False, '', '', '')}
+    # 其它提示词版本的条目不命中
+    assert ClassificationCache(Session, 'v2').lookup(['a']) == {}
+    apply(Session, cache.touch(['a']))
+    db_session = Session()
+    try:
+        assert db_session.scalar(select(CacheEntry.hits).where(CacheEntry.content_hash == 'a')) == 1
+    finally:
+        db_session.close()
+
+def test_translation_memory_round_trip(Session):
+    memory = TranslationMemory(Session, 'nllb')
+    apply(Session, memory.store({'你好。': 'Hello.'}, 'eng_Latn'))
+    # 新的实例没有进程内缓存，从表中读取
+    found, db_hits = TranslationMemory(Session, 'nllb').lookup(['你好。', '再见。'], 'eng_Latn')
+    assert found == {'你好。': 'Hello.'} and len(db_hits) == 1
+    assert TranslationMemory(Session, 'other-model').lookup(['你好。'], 'eng_Latn')[0] == {}
+
+def test_evicts_least_recently_used_to_low_water(Session):
+    cache = ClassificationCache(Session, 'v1', max_entries=10)
+    apply(Session, cache.store({f'old{i}': PARSED for i in range(10)}))
+    db_session = Session()
+    try:
+        # 除了 old0 之外都设成更早使用过
+        db_session.execute(update(CacheEntry).where(CacheEntry.content_hash != 'old0').values(last_used=datetime.now() - timedelta(days=1)))
+        db_session.commit()
+    finally:
+        db_session.close()
+    apply(Session, cache.store({'new': PARSED}))
+    assert count_entries(Session) == 9
+    assert set(cache.lookup(['old0', 'new'])) == {'old0', 'new'}
+
+def test_store_does_not_count_rows_every_time(Session):
+    cache = ClassificationCache(Session, 'v1', max_entries=100)
+    statements = []
+    engine = Session.session_factory.kw['bind']
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for i in range(150):
+            apply(Session, cache.store({f'h{i}': PARSED}))
+            # 已有的条目不计入估计值
+            apply(Session, cache.store({f'h{i}': PARSED}))
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    counts = [s for s in statements if 'count(' in s.lower()]
+    # 第一次写入计数一次，之后每次超出容量计数一次
+    assert 1 < len(counts) <= 1 + 150 // 10
+    assert count_entries(Session) <= 100
@@ -0,0 +1,90 @@
+import sys
+import types
+import numpy as np
+import pytest
+
+pytest.importorskip('pandas')
+pytest.importorskip('joblib')
+pytest.importorskip('sklearn')
+pytest.importorskip('transformers')
+import class_model
+
+CLASSES = ['Not a Disaster', 'earthquake', 'flood']
+
+class WordTokenizer:
+    """按空格切分的替身分词器，token id 就是单词的长度"""
+    def __call__(self, texts, add_special_tokens, max_length, truncation):
+        ids = [[len(word) for word in text.split()][:max_length] for text in texts]
+        return {'input_ids': ids, 'attention_mask': [[1] * len(row) for row in ids]}
+
+    def pad(self, features, padding, return_tensors):
+        width = max(len(row) for row in features['input_ids'])
+        return {key: np.array([row + [0] * (width - len(row)) for row in rows]) for key, rows in features.items()}
+
+def make_model(forward, batch_size=2):
+    """跳过 __init__，只设置推理用到的属性，不加载权重和数据集"""
+    model = class_model.DisasterTweetModel.__new__(class_model.DisasterTweetModel)
+    model.Session = None
+    model.sequence_length = 128
+    model.batch_size = batch_size
+    model.tokenizer = WordTokenizer()
+    model.label_encoder = types.SimpleNamespace(classes_=CLASSES)
+    model.forward = forward
+    return model
+
+def test_logits_come_back_in_input_order_across_buckets():
+    widths = []
+    def forward(batch):
+        ids = batch['input_ids']
+        widths.append(ids.shape[1])
+        # 第一列是单词数，第二列是各单词长度之和，可以据此认出是哪条文本
+        return np.stack([batch['attention_mask'].sum(axis=1), ids.sum(axis=1), np.zeros(len(ids))], axis=1).astype(np.float32)
+
+    texts = ['a b c d e', 'aa', 'a b c', 'aaa bbb', 'x', 'a b c d e f g']
+    model = make_model(forward, batch_size=2)
+    logits = model.predict_logits(texts)
+    assert logits.shape == (len(texts), len(CLASSES))
+    assert logits[:, 0].tolist() == [len(text.split()) for text in texts]
+    assert logits[:, 1].tolist() == [sum(len(word) for word in text.split()) for text in texts]
+    # 按长度排序后分桶，每桶只补齐到桶内最长的文本
+    assert widths == [1, 3, 7]
+
+def test_empty_input_returns_empty_logits():
+    model = make_model(lambda batch: pytest.fail('forward should not run'))
+    logits = model.predict_logits([])
+    assert logits.shape == (0, len(CLASSES))
+    assert model.interpret_predictions(logits, []) == []
+
+def test_onnx_inputs_drop_tensor_suffix(monkeypatch):
+    feeds = []
+
+    class InferenceSession:
+        def __init__(self, path, options, providers):
+            self.path = path
+
+        def get_inputs(self):
+            return [types.SimpleNamespace(name='input_ids:0'), types.SimpleNamespace(name='attention_mask')]
+
+        def run(self, outputs, feed):
+            feeds.append(feed)
+            return [np.zeros((len(feed['input_ids:0']), len(CLASSES)), dtype=np.float32)]
+
+    runtime = types.SimpleNamespace(
+        SessionOptions=lambda: types.SimpleNamespace(),
+        GraphOptimizationLevel=types.SimpleNamespace(ORT_ENABLE_ALL=99),
+        InferenceSession=InferenceSession,
+    )
+    monkeypatch.setitem(sys.modules, 'onnxruntime', runtime)
+
+    model = make_model(None)
+    del model.forward
+    model.backend = 'onnx'
+    model.model = model.load_model('model.int8.onnx')
+    assert model.onnx_inputs == {'input_ids:0': 'input_ids', 'attention_mask': 'attention_mask'}
+
+    assert model.predict_logits(['a bb', 'ccc']).shape == (2, len(CLASSES))
+    feed = feeds[0]
+    assert set(feed) == {'input_ids:0', 'attention_mask'}
+    assert feed['input_ids:0'].dtype == np.int64
+    assert feed['input_ids:0'].tolist() == [[3, 0], [1, 2]]
+    assert feed['attention_mask'].tolist() == [[1, 0], [1, 1]]
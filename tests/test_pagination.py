@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import delete
+from class_datatypes import Warning, GDACS
+from class_ResponseCache import response_cache
+
+def populate(Session, count):
+    db_session = Session()
+    try:
+        db_session.execute(delete(Warning))
+        db_session.execute(delete(GDACS))
+        for i in range(count):
+            # 排序列有重复值，翻页要靠 id 区分
+            db_session.add(Warning(disaster_type='flood', disaster_location=f'city {i}', disaster_time=f'2024-05-{i % 3 + 1:02d}'))
+            db_session.add(GDACS(content=f'event {i}', date_time=datetime(2024, 5, 1) + timedelta(days=i % 4), location=f'place {i}'))
+        db_session.commit()
+    finally:
+        db_session.close()
+
+def get(backend_module, url):
+    response_cache.bump()
+    return backend_module.app.test_client().get(url)
+
+@pytest.mark.parametrize('url', [
+    '/api/warnings?disasterType=all&orderBy=results',
+    '/api/warnings?disasterType=all&orderBy=__class__',
+    '/api/warnings?disasterType=all&orderBy=metadata',
+    '/api/gdacsMessages?orderBy=content',
+    '/api/gdacsMessages?orderBy=processed',
+])
+def test_unsortable_columns_are_rejected(backend_module, url):
+    response = get(backend_module, url)
+    assert response.status_code == 400
+    assert 'Cannot sort by' in response.get_json()['message']
+
+@pytest.mark.parametrize('endpoint, order_by', [
+    ('/api/warnings?disasterType=all', 'disaster_time'),
+    ('/api/warnings?disasterType=all', 'accuracy_rating'),
+    ('/api/gdacsMessages?sourceType=GDACS', 'date_time'),
+    ('/api/gdacsMessages?sourceType=GDACS', 'location'),
+])
+def test_pages_cover_every_row_once(backend_module, endpoint, order_by):
+    populate(backend_module.backend.session, 11)
+    seen, after = [], ''
+    while True:
+        response = get(backend_module, f'{endpoint}&orderBy={order_by}&limit=4&after={after}')
+        assert response.status_code == 200
+        page = response.get_json()
+        seen.extend(item['id'] for item in page['items'])
+        if not page['next_cursor']:
+            break
+        after = page['next_cursor']
+    assert len(seen) == len(set(seen)) == 11
@@ -0,0 +1,40 @@
+import pytest
+from class_PreFilter import KeywordPreFilter
+
+@pytest.fixture
+def prefilter():
+    return KeywordPreFilter(threshold=0.5)
+
+@pytest.mark.parametrize('content', [
+    '无锡今天地震了',
+    'Flooding in Wuxi after the storm',
+    'Two earthquakes hit Japan',
+    'Evacuation ordered, casualties reported',
+    '突发：地震earthquake',
+    'ＦＩＲＥ at the station',  # 全角
+    'severe thunderstorm tonight',
+])
+def test_accepts_disaster_posts(prefilter, content):
+    assert prefilter.accepts(content)
+
+def test_english_keywords_match_whole_words(prefilter):
+    assert prefilter.find('Trip to Thailand next week') == set()
+    assert prefilter.find('The deadline is tomorrow') == set()
+    # crashing 是 crash 加词尾，firefox 里的 fire 不算
+    assert prefilter.find('Firefox keeps crashing') == {'crash'}
+    assert prefilter.find('floods, flooded, flooding') == {'flood'}
+
+def test_rejects_unrelated_posts(prefilter):
+    for content in ['十问猜一本小说～（只能是非问和选择问）', 'Trip to Thailand next week', 'The deadline is tomorrow', '今天食堂的饭不错']:
+        assert not prefilter.accepts(content), content
+
+def test_score_adds_keyword_weights(prefilter):
+    assert prefilter.score('洪水') == 1.0
+    assert prefilter.score('地震') == 1.5  # 地震 和 震 都命中
+    assert prefilter.score('rescue teams, 3 injured') == 1.0
+    assert prefilter.score('earthquake earthquake') == 1.0  # 同一个关键词只计一次
+
+def test_stats(prefilter):
+    for content in ['无锡地震了', '吃饭了吗', 'flood warning', 'deadline']:
+        prefilter.accepts(content)
+    assert prefilter.stats() == {'checked': 4, 'sent_to_llm': 2, 'filtered': 2, 'llm_traffic_removed': 0.5}
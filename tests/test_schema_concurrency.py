@@ -0,0 +1,46 @@
+import multiprocessing
+import pytest
+from sqlalchemy import create_engine, text
+import database
+from class_Migrations import MIGRATIONS
+
+PROCESSES = 4
+
+def create_schema_when_released(path, start):
+    start.wait(30)
+    Session = database.create_session(path)
+    database.create_schema(Session)
+    Session.remove()
+
+def create_legacy_database(path):
+    """迁移 2 之后、events 表还不是 AUTOINCREMENT 的数据库"""
+    Session = database.create_session(path)
+    database.create_schema(Session)
+    Session.remove()
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE events"))
+        conn.execute(text("CREATE TABLE events (id INTEGER NOT NULL PRIMARY KEY, kind VARCHAR(50) NOT NULL, payload TEXT, date_time DATETIME)"))
+        conn.execute(text("PRAGMA user_version = 2"))
+    engine.dispose()
+
+@pytest.mark.parametrize('legacy', [False, True])
+def test_processes_create_schema_concurrently(tmp_path, legacy):
+    path = str(tmp_path / 'forum.db')
+    if legacy:
+        create_legacy_database(path)
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    processes = [context.Process(target=create_schema_when_released, args=(path, start)) for _ in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    start.set()
+    for process in processes:
+        process.join(60)
+    assert [process.exitcode for process in processes] == [0] * PROCESSES
+
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA user_version")).scalar() == MIGRATIONS[-1][0]
+        assert 'AUTOINCREMENT' in conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'events'")).scalar().upper()
+    engine.dispose()
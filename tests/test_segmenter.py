@@ -0,0 +1,53 @@
+import pytest
+from class_Segmenter import SentenceSegmenter
+
+def rebuild(pieces):
+    return ''.join(chunk + separator for chunk, separator in pieces)
+
+def test_splits_at_terminal_punctuation():
+    segmenter = SentenceSegmenter(len)
+    assert [chunk for chunk, _ in segmenter.split('地震了！大家快跑。“注意安全。”好的')] == ['地震了！', '大家快跑。', '“注意安全。”', '好的']
+    assert [chunk for chunk, _ in segmenter.split('Magnitude 3.5 quake, e.g. near Tokyo. Stay safe! OK?')] == [
+        'Magnitude 3.5 quake, e.g.', 'near Tokyo.', 'Stay safe!', 'OK?',
+    ]
+    assert segmenter.split('') == [] and segmenter.split(None) == [] and segmenter.split(' \n ') == []
+
+def test_separators_round_trip_line_breaks():
+    segmenter = SentenceSegmenter(len)
+    pieces = segmenter.split('第一句。第二句\n第三句！\n\n最后')
+    assert pieces == [('第一句。', ' '), ('第二句', '\n'), ('第三句！', '\n'), ('最后', '')]
+    # 译文原样拼接时保留原文的换行，句子之间用空格
+    assert rebuild(pieces) == '第一句。 第二句\n第三句！\n最后'
+    assert rebuild((chunk.upper(), separator) for chunk, separator in SentenceSegmenter(len).split('a.\nb. c')) == 'A.\nB. C'
+
+def test_wraps_long_sentences_at_commas():
+    segmenter = SentenceSegmenter(len, max_tokens=10)
+    pieces = segmenter.split('今天下午，市区发生内涝，请大家注意出行安全。')
+    assert [chunk for chunk, _ in pieces] == ['今天下午，', '市区发生内涝，', '请大家注意出行安全。']
+    assert [separator for _, separator in pieces] == [' ', ' ', '']
+    # 能放进预算的相邻短句合并成一块
+    assert [chunk for chunk, _ in SentenceSegmenter(len, max_tokens=12).split('下午，市区内涝，请注意安全。')] == ['下午，市区内涝，', '请注意安全。']
+
+@pytest.mark.parametrize('sentence', [
+    '这是一个没有任何逗号但是非常非常长的句子需要按字符硬切开才行。',
+    'the flood water kept rising along the river banks all night long.',
+    'abcdefghijklmnopqrstuvwxyzabcdefghijklmnopqrstuvwxyz',
+])
+def test_over_budget_pieces_never_exceed_max_tokens(sentence):
+    segmenter = SentenceSegmenter(len, max_tokens=12)
+    chunks = [chunk for chunk, _ in segmenter.split(sentence)]
+    assert len(chunks) > 1
+    assert all(0 < len(chunk) <= 12 for chunk in chunks)
+    # 只丢弃断开处的空格，内容和顺序不变
+    assert ''.join(chunks).replace(' ', '') == sentence.replace(' ', '')
+    if ' ' in sentence:
+        # 英文在空格处断开，不切开单词
+        assert all(word in sentence.split() for chunk in chunks for word in chunk.split())
+
+def test_token_counter_sets_the_budget():
+    words = lambda text: len(text.split())
+    segmenter = SentenceSegmenter(words, max_tokens=3)
+    sentence = 'one two three four five six seven.'
+    chunks = [chunk for chunk, _ in segmenter.split(sentence)]
+    assert all(words(chunk) <= 3 for chunk in chunks)
+    assert ' '.join(chunks) == sentence
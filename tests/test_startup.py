@@ -0,0 +1,41 @@
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from conftest import ROOT
+from class_LazySubsystem import LazySubsystem
+
+HEAVY_MODULES = ['langchain', 'langchain_openai', 'transformers', 'torch', 'tensorflow', 'selenium', 'nltk']
+
+def test_backend_does_not_import_heavy_modules(tmp_path):
+    """API 进程启动并响应第一个请求时不应导入 LLM、翻译模型或爬虫的依赖"""
+    shutil.copy(os.path.join(ROOT, 'config.ini.sample'), tmp_path / 'config.ini')
+    (tmp_path / 'data').mkdir()
+    code = (
+        "import sys, backend\n"
+        "assert backend.app.test_client().get('/api/warnings?disasterType=all').status_code == 200\n"
+        f"print(sorted(name for name in {HEAVY_MODULES!r} if name in sys.modules))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=dict(os.environ, PYTHONPATH=ROOT), capture_output=True, text=True, timeout=120)
+    assert output.returncode == 0, output.stderr
+    assert output.stdout.strip().splitlines()[-1] == '[]'
+
+def test_lazy_subsystem_builds_once_on_first_use():
+    calls = []
+    def factory():
+        calls.append(1)
+        return threading.Event()
+    subsystem = LazySubsystem('Test', factory)
+    assert not subsystem.loaded and calls == []
+
+    threads = [threading.Thread(target=subsystem.get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert subsystem.loaded
+    # 属性访问转发给构建好的实例
+    subsystem.set()
+    assert subsystem.get().is_set()
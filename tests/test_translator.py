@@ -0,0 +1,96 @@
+import threading
+from datetime import datetime
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('transformers')
+import class_translator
+from class_DBWriter import DBWriter
+from class_datatypes import Topics, TranslatedTopics
+
+class CharTokenizer:
+    """逐字符编码的替身分词器，译文是原文转成大写。语言代码是普通的 token，和 NllbTokenizerFast 一样没有 lang_code_to_id"""
+    special_tokens = {'eng_Latn': 2}
+
+    def convert_tokens_to_ids(self, token):
+        return self.special_tokens[token]
+
+    def __call__(self, text, add_special_tokens=True):
+        if isinstance(text, str):
+            return {'input_ids': [ord(ch) for ch in text]}
+        ids = [[ord(ch) for ch in sentence] for sentence in text]
+        return {'input_ids': ids, 'attention_mask': [[1] * len(row) for row in ids]}
+
+    def pad(self, features, padding, return_tensors):
+        width = max(len(row) for row in features['input_ids'])
+        return {key: torch.tensor([row + [0] * (width - len(row)) for row in rows]) for key, rows in features.items()}
+
+    def batch_decode(self, tokens, skip_special_tokens):
+        return [''.join(chr(t) for t in row if t).upper() for row in tokens.tolist()]
+
+class EchoModel:
+    def __init__(self, log):
+        self.log = log
+
+    def generate(self, input_ids, attention_mask, forced_bos_token_id, max_new_tokens):
+        assert forced_bos_token_id == CharTokenizer.special_tokens['eng_Latn']
+        self.log.append(('generate', len(input_ids)))
+        return input_ids
+
+class RecordingWriter(DBWriter):
+    def __init__(self, Session, log):
+        super().__init__(Session, max_delay=0.01)
+        self.log = log
+
+    def submit(self, fn, invalidates_cache=False):
+        self.log.append(('submit', None))
+        return super().submit(fn, invalidates_cache)
+
+@pytest.fixture
+def translator(Session, monkeypatch):
+    log = []
+    monkeypatch.setattr(class_translator.AutoTokenizer, 'from_pretrained', lambda name: CharTokenizer())
+    monkeypatch.setattr(class_translator.AutoModelForSeq2SeqLM, 'from_pretrained', lambda name: EchoModel(log))
+    writer = RecordingWriter(Session, log)
+    threading.Thread(target=writer.run, daemon=True).start()
+    translator = class_translator.Translator('stub', Session, writer, batch_size=2)
+    translator.log = log
+    return translator
+
+def add_topics(Session, contents):
+    db_session = Session()
+    try:
+        db_session.add_all(Topics(content=content, date_time=datetime(2024, 5, 23), processed=False) for content in contents)
+        db_session.commit()
+    finally:
+        db_session.close()
+
+def test_stub_matches_installed_tokenizer_api():
+    from transformers import NllbTokenizerFast
+    # 新版 transformers 删除了 lang_code_to_id，替身只提供两者都有的接口
+    assert hasattr(NllbTokenizerFast, 'convert_tokens_to_ids')
+    assert not hasattr(CharTokenizer, 'lang_code_to_id')
+
+def test_translate_posts_reassembles_in_order(translator):
+    texts = ['ab. cd!\nef', '', 'xy? ab.']
+    assert translator.translate_posts(texts) == ['AB. CD!\nEF', '', 'XY? AB.']
+
+def test_posts_are_written_as_their_chunks_finish(Session, translator):
+    short = ['a.', 'b.', 'c.', 'd.']
+    contents = short + ['long sentence number one. another long sentence.']
+    add_topics(Session, contents)
+    translator.translate_database_contents()
+
+    generates = [i for i, (kind, _) in enumerate(translator.log) if kind == 'generate']
+    first_post = next(i for i, (kind, _) in enumerate(translator.log) if kind == 'submit' and i > generates[0])
+    # 短帖子在第一个批次之后就交给 DBWriter，不等最后一个批次
+    assert first_post < generates[-1]
+
+    db_session = Session()
+    try:
+        assert [t.content for t in db_session.query(TranslatedTopics).order_by(TranslatedTopics.id)] == [c.upper() for c in contents]
+        assert db_session.query(Topics).filter(Topics.translated == False).count() == 0
+        # processed 属于分类器，翻译后仍留给它处理
+        assert db_session.query(Topics).filter(Topics.processed == False).count() == len(contents)
+    finally:
+        db_session.close()
@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from class_datatypes import Warning, Result, WarningRating, Rating, WarningVote, Vote
+
+USERS = 200
+
+def create_targets(Session):
+    db_session = Session()
+    try:
+        warning = Warning(disaster_type='flood', disaster_location='load test', disaster_time='2024-06-01')
+        result = Result(content='load test', date_time=datetime.now(), is_disaster=True, disaster_type='flood', warning=warning)
+        db_session.add(warning)
+        db_session.commit()
+        return warning.id, result.id
+    finally:
+        db_session.close()
+
+def test_concurrent_votes_keep_exact_counters(backend_module):
+    """几百个用户并发评分和投删除票，重复提交被唯一索引拦截，计数器与明细表一致"""
+    Session = backend_module.backend.session
+    warning_id, result_id = create_targets(Session)
+
+    def vote(user_id):
+        outcomes = []
+        # 每个用户提交两次，第二次应被识别为重复
+        for _ in range(2):
+            db_session = Session()
+            try:
+                row, error = backend_module.apply_rating(db_session, Warning, WarningRating, 'warning_id', warning_id, user_id, 'authenticity', user_id % 5 + 1)
+                if error is None:
+                    db_session.commit()
+                outcomes.append(('rate_warning', error))
+                row, error = backend_module.apply_rating(db_session, Result, Rating, 'message_id', result_id, user_id, 'accuracy', 3)
+                if error is None:
+                    db_session.commit()
+                outcomes.append(('rate_result', error))
+                _, error = backend_module.apply_delete_vote(db_session, Warning, WarningVote, 'warning_id', warning_id, user_id)
+                outcomes.append(('delete_warning', error))
+                _, error = backend_module.apply_delete_vote(db_session, Result, Vote, 'message_id', result_id, user_id)
+                outcomes.append(('delete_result', error))
+            finally:
+                db_session.close()
+        return outcomes
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        outcomes = [outcome for user in executor.map(vote, range(1, USERS + 1)) for outcome in user]
+
+    for action in ('rate_warning', 'rate_result', 'delete_warning', 'delete_result'):
+        errors = [error for name, error in outcomes if name == action]
+        assert errors.count(None) == USERS, action
+        assert errors.count('duplicate') == USERS, action
+
+    db_session = Session()
+    try:
+        warning = db_session.get(Warning, warning_id)
+        result = db_session.get(Result, result_id)
+        assert warning.authenticity_raters == USERS
+        assert warning.authenticity_rating == sum(user % 5 + 1 for user in range(1, USERS + 1))
+        assert warning.delete_votes == USERS
+        assert result.accuracy_raters == USERS
+        assert result.accuracy_rating == 3 * USERS
+        assert result.delete_votes == USERS
+        assert db_session.query(WarningRating).filter_by(warning_id=warning_id).count() == USERS
+        assert db_session.query(Vote).filter_by(message_id=result_id).count() == USERS
+    finally:
+        db_session.close()
+
+def test_vote_on_missing_item(backend_module):
+    db_session = backend_module.backend.session()
+    try:
+        assert backend_module.apply_rating(db_session, Warning, WarningRating, 'warning_id', 10 ** 9, 1, 'accuracy', 4) == (None, 'not_found')
+        assert backend_module.apply_delete_vote(db_session, Result, Vote, 'message_id', 10 ** 9, 1) == (None, 'not_found')
+        assert backend_module.apply_rating(db_session, Warning, WarningRating, 'warning_id', 1, 1, 'speed', 4) == (None, 'invalid_type')
+    finally:
+        db_session.close()
@@ -0,0 +1,107 @@
+import gc
+import threading
+import weakref
+import database
+from class_datatypes import Warning
+from class_WarningIndex import WarningIndex, canonical_type, canonical_location, canonical_time
+
+def create_warning(Session, index, disaster_type, disaster_location, disaster_time):
+    """模拟 create_warning_if_needed：在事务中插入并登记，提交后进入本进程的索引"""
+    db_session = Session()
+    try:
+        warning = Warning(disaster_type=disaster_type, disaster_location=disaster_location, disaster_time=disaster_time)
+        db_session.add(warning)
+        db_session.flush()
+        if index is not None:
+            index.add_pending(db_session, warning.id, disaster_type, disaster_location, disaster_time)
+        db_session.commit()
+        return warning.id
+    finally:
+        db_session.close()
+
+def find(Session, index, *warning):
+    db_session = Session()
+    try:
+        return index.find(db_session, *warning)
+    finally:
+        db_session.close()
+
+def test_canonical_keys():
+    assert canonical_type('Earthquakes') == canonical_type('earthquake') == 'earthquake'
+    assert canonical_type('Typhoon') == canonical_type('hurricane')
+    assert canonical_type('Floods') == 'flood'
+    # 不在别名表中的词原样保留，不按词尾截断
+    assert canonical_type('gas') == 'gas'
+    assert canonical_type('gas leaks') == 'gas leaks'
+    assert canonical_type('flooding') == 'flooding'
+    assert canonical_location(' Wuxi ') == canonical_location('wuxi')
+    assert canonical_time('2024年5月23日') == canonical_time('2024/05/23')
+    assert canonical_time('') is None
+
+def test_variants_and_date_window(Session):
+    index = WarningIndex(Session)
+    warning_id = create_warning(Session, index, 'Earthquake', 'Wuxi', '2024-05-23')
+    assert find(Session, index, 'earthquakes', 'wuxi', '2024/5/25') == warning_id
+    assert find(Session, index, 'earthquake', 'wuxi', '2024-06-25') is None
+
+def test_rolled_back_warning_is_not_indexed(Session):
+    index = WarningIndex(Session)
+    db_session = Session()
+    warning = Warning(disaster_type='flood', disaster_location='x', disaster_time='')
+    db_session.add(warning)
+    db_session.flush()
+    index.add_pending(db_session, warning.id, 'flood', 'x', '')
+    assert index.find(db_session, 'floods', 'X', '') == warning.id
+    db_session.rollback()
+    db_session.close()
+    assert find(Session, index, 'flood', 'x', '') is None
+
+def test_sees_lower_ids_committed_by_other_process(Session, tmp_path):
+    """另一个进程先提交了 id 更小的 Warning，本进程之后提交的 Warning 不能让它被跳过"""
+    other = database.create_session(str(tmp_path / 'test.db'))
+    try:
+        index = WarningIndex(Session, miss_refresh_interval=0)
+        index.refresh()
+        other_id = create_warning(other, None, 'fire', 'Kunming', '2024-03-01')
+        local_id = create_warning(Session, index, 'flood', 'Wuxi', '2024-05-23')
+        assert other_id < local_id
+        assert find(Session, index, 'fire', 'kunming', '2024-03-02') == other_id
+        # 本进程提交的 Warning 不会因为 refresh 重复登记
+        assert index.entries[(canonical_type('flood'), canonical_location('Wuxi'))] == [(canonical_time('2024-05-23'), local_id)]
+    finally:
+        other.remove()
+
+def test_misses_refresh_at_most_once_per_interval(Session):
+    index = WarningIndex(Session, miss_refresh_interval=60)
+    refreshes = []
+    refresh = index.refresh
+    index.refresh = lambda: refreshes.append(1) or refresh()
+    for i in range(5):
+        assert find(Session, index, 'flood', f'nowhere {i}', '2024-05-23') is None
+    # 首次查找时预热一次，之后的未命中不再读取数据库
+    assert len(refreshes) == 1
+
+def test_index_is_not_kept_alive_by_session_listeners(Session):
+    index = WarningIndex(Session)
+    create_warning(Session, index, 'flood', 'Wuxi', '2024-05-23')
+    ref = weakref.ref(index)
+    del index
+    gc.collect()
+    assert ref() is None
+
+def test_concurrent_commits_and_refreshes(Session):
+    index = WarningIndex(Session, miss_refresh_interval=0)
+    ids = []
+    def create(worker):
+        for i in range(10):
+            ids.append(create_warning(Session, index, 'flood', f'city {worker} {i}', '2024-05-23'))
+            index.refresh()
+    threads = [threading.Thread(target=create, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    index.refresh()
+    indexed = sorted(warning_id for entries in index.entries.values() for _, warning_id in entries)
+    assert indexed == sorted(ids)
+    assert index.local_ids == set()
@@ -0,0 +1,79 @@
+import threading
+from datetime import datetime
+import pytest
+from sqlalchemy import event, delete
+from class_datatypes import Warning, Result
+from class_ResponseCache import response_cache
+
+class StatementCounter:
+    """
+    统计本线程在 engine 上执行的 SQL 语句数。engine 与 EventBroker 的轮询线程共用，
+    它每秒查询一次 events，不能计入请求的语句数；test_client 在当前线程中处理请求。
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.thread = threading.get_ident()
+        self.statements = []
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self.thread:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+
+def populate(Session, warnings, results_per_warning=3):
+    db_session = Session()
+    try:
+        db_session.execute(delete(Result))
+        db_session.execute(delete(Warning))
+        for i in range(warnings):
+            warning = Warning(disaster_type='earthquake', disaster_location=f'city {i}', disaster_time=f'2024-05-{i % 28 + 1:02d}')
+            warning.results = [
+                Result(content=f'post {i}-{j}', date_time=datetime(2024, 5, 1), is_disaster=True, disaster_type='earthquake')
+                for j in range(results_per_warning)
+            ]
+            db_session.add(warning)
+        db_session.commit()
+    finally:
+        db_session.close()
+
+def count_statements(backend_module):
+    response_cache.bump()
+    engine = backend_module.backend.session.session_factory.kw['bind']
+    with StatementCounter(engine) as counter:
+        response = backend_module.app.test_client().get('/api/warnings?disasterType=all&limit=500')
+    assert response.status_code == 200
+    return len(response.get_json()['items']), counter.statements
+
+@pytest.mark.parametrize('warnings', [5, 50, 200])
+def test_warnings_query_count_is_constant(backend_module, warnings):
+    populate(backend_module.backend.session, warnings)
+    items, statements = count_statements(backend_module)
+    assert items == warnings
+    # 一条查询 Warning，一条 selectinload 查询 Result，与 Warning 的数量无关
+    assert len(statements) <= 2, statements
+
+def test_warnings_results_are_included(backend_module):
+    populate(backend_module.backend.session, 3, results_per_warning=2)
+    response_cache.bump()
+    items = backend_module.app.test_client().get('/api/warnings?disasterType=all').get_json()['items']
+    assert [len(item['related_tweets']) for item in items] == [2, 2, 2]
+
+def test_counter_ignores_other_threads(backend_module):
+    """EventBroker 等后台线程的查询不计入"""
+    engine = backend_module.backend.session.session_factory.kw['bind']
+    def poll():
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+    with StatementCounter(engine) as counter:
+        thread = threading.Thread(target=poll)
+        thread.start()
+        thread.join()
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 2")
+    assert counter.statements == ["SELECT 2"]
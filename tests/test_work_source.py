@@ -0,0 +1,86 @@
+from datetime import datetime
+from sqlalchemy import create_engine, text
+import database
+from class_datatypes import Topics
+from class_WorkSource import WorkSource, Lease
+
+def add_topics(Session, count):
+    db_session = Session()
+    try:
+        db_session.add_all(Topics(content=f'post {i}', date_time=datetime(2024, 5, 23)) for i in range(count))
+        db_session.commit()
+    finally:
+        db_session.close()
+
+def drain(Session, source):
+    db_session = Session()
+    try:
+        return [item.id for batch in source.batches(db_session) for item in batch]
+    finally:
+        db_session.close()
+
+def test_translator_and_classifier_flags_are_independent(Session):
+    add_topics(Session, 3)
+    db_session = Session()
+    try:
+        db_session.query(Topics).filter(Topics.id == 1).update({'translated': True})
+        db_session.query(Topics).filter(Topics.id == 2).update({'processed': True})
+        db_session.commit()
+    finally:
+        db_session.close()
+    assert drain(Session, WorkSource(Topics)) == [1, 3]
+    assert drain(Session, WorkSource(Topics, flag='translated')) == [2, 3]
+
+def test_leases_do_not_commit_the_callers_session(Session):
+    add_topics(Session, 5)
+    source = WorkSource(Topics, batch_size=2, lease=Lease(owner='a'), Session=Session)
+    db_session = Session()
+    try:
+        with db_session.no_autoflush:
+            # 调用方尚未提交的写入，领取租约时不能被一起提交
+            db_session.add(Topics(content='uncommitted', date_time=datetime(2024, 5, 23)))
+            batches = list(source.batches(db_session))
+            assert [[item.id for item in batch] for batch in batches] == [[1, 2], [3, 4], [5]]
+            batches[0][0].processed = True
+        db_session.rollback()
+        assert db_session.query(Topics).count() == 5
+        assert db_session.query(Topics).filter(Topics.processed == True).count() == 0
+    finally:
+        db_session.close()
+    # 租约未过期，其它 worker 领取不到
+    assert drain(Session, WorkSource(Topics, lease=Lease(owner='b'), Session=Session)) == []
+
+def test_claimed_rows_are_updated_in_the_callers_transaction(Session):
+    add_topics(Session, 3)
+    source = WorkSource(Topics, lease=Lease(owner='a'), Session=Session)
+    db_session = Session()
+    try:
+        with db_session.no_autoflush:
+            for batch in source.batches(db_session):
+                for item in batch:
+                    assert item in db_session
+                    item.processed = item.id != 2
+        db_session.commit()
+    finally:
+        db_session.close()
+    assert drain(Session, WorkSource(Topics)) == [2]
+
+def test_migration_marks_already_translated_rows(tmp_path):
+    """旧数据库中的原文没有 translated 列，已有译文的记录迁移后不再重复翻译"""
+    path = str(tmp_path / 'legacy.db')
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE topics (id INTEGER PRIMARY KEY, content TEXT, date_time DATETIME, processed BOOLEAN, claimed_by VARCHAR(100), lease_until DATETIME)"))
+        conn.execute(text("CREATE TABLE translated_topics (id INTEGER PRIMARY KEY, content TEXT, date_time DATETIME, processed BOOLEAN, claimed_by VARCHAR(100), lease_until DATETIME)"))
+        conn.execute(text("INSERT INTO topics (id, content, processed) VALUES (1, 'a', 1), (2, 'b', 0)"))
+        conn.execute(text("INSERT INTO translated_topics (id, content, processed) VALUES (1, 'A', 0)"))
+        conn.execute(text("PRAGMA user_version = 3"))
+    engine.dispose()
+
+    Session = database.create_session(path)
+    try:
+        database.create_schema(Session)
+        assert drain(Session, WorkSource(Topics, flag='translated')) == [2]
+    finally:
+        Session.remove()
+        Session.session_factory.kw['bind'].dispose()
@@ -0,0 +1,183 @@
+import threading
+import configparser
+import argparse
+import multiprocessing
+import os
+from datetime import timedelta
+import class_SubscriptionSystem
+import class_DBWriter
+import database
+from class_LazySubsystem import LazySubsystem, subsystem_enabled
+from class_WorkSource import Lease
+
+# --classifier-only 进程只运行这些子系统
+CLASSIFIER_SUBSYSTEMS = ('classifier', 'prefilter')
+
+class Worker:
+    """
+    后台流水线进程：爬虫、GDACS、LLM 分类、删除投票的 GDACS 检查和邮件订阅都在这里运行。
+    与 API 进程 (backend.py) 之间只通过数据库交互，新数据经 events 表推送给 API 进程。
+    整个部署只应运行一个 Worker，API 进程可以按核数任意扩展；
+    分类通过租约领取待处理的帖子，可以另外启动多个 classifier_only 的进程提高吞吐。
+    """
+    def __init__(self, db_path, classifier_only=False, migrate=True):
+        print("[Debug] Creating Worker" + (" (classifier only)" if classifier_only else ""))
+        self.classifier_only = classifier_only
+        self.session = database.create_session(db_path)
+        # 由 __main__ 启动的进程已经在父进程中建好了 schema
+        if migrate:
+            database.create_schema(self.session)
+        self.config = configparser.ConfigParser()
+        self.config.read('config.ini')
+        self.writer = class_DBWriter.DBWriter(self.session)
+        self.translator, self.model, self.subscriptionsystem, self.jobrunner = self.init_subsystems()
+        self.spider_event = threading.Event()
+        self.gdacs_event = threading.Event()
+        self.options = None
+
+    def enabled(self, name, default=True):
+        if self.classifier_only and name not in CLASSIFIER_SUBSYSTEMS:
+            return False
+        return subsystem_enabled(self.config, name, default)
+
+    def chrome_options(self):
+        """爬虫用到时才导入 selenium"""
+        if self.options is not None:
+            return self.options
+        from selenium.webdriver.chrome.options import Options
+        self.options = Options()
+        # options.add_argument("--headless")  # 设置为无头模式
+        self.options.add_argument('--disable-gpu')
+        self.options.add_argument("--no-sandbox")
+        self.options.add_argument('--disable-dev-shm-usage')
+        self.options.add_argument(r"user-data-dir=/home/nakanomiku/.config/google-chrome")
+        self.options.add_experimental_option("prefs", {
+            "download.default_directory": '/home/nakanomiku/Downloads/',
+            "download.prompt_for_download": False,
+            "download.directory_upgrade": True,
+            "safebrowsing.enabled": True
+        })
+        return self.options
+
+    def init_subsystems(self):
+        """初始化 config.ini 中 [Subsystems] 启用的子系统，重量级的依赖只在启用时导入"""
+        print("Initializing subsystems")
+        translator = model = subscriptionsystem = jobrunner = None
+        # 初始化 Translator (NLLB 600M)，默认关闭
+        if self.enabled('translator', default=False):
+            import class_translator
+            translator = class_translator.Translator("nllb-200-distilled-600M", self.session, self.writer)
+
+        # 初始化 DisasterTweetModel
+        # train_path = 'dataset/train.csv'
+        # test_path = 'dataset/test.csv'
+        # model = class_model.DisasterTweetModel(train_path, test_path, self.session)
+        if self.enabled('classifier'):
+            model = self.build_model()
+
+        # 初始化SubscriptionSystem
+        if self.enabled('subscription'):
+            subscriptionsystem = class_SubscriptionSystem.SubscriptionSystem('220.197.30.134', 25, self.config['User']['email'], self.config['User']['password'], self.session)
+
+        # 删除投票的 GDACS 检查。分类器关闭时，LLM 在第一个任务到来时才加载
+        if self.enabled('jobs'):
+            import class_JobQueue
+            checker = model or LazySubsystem('LangChainModel', self.build_model)
+            jobrunner = class_JobQueue.JobRunner(self.session, checker, workers=self.config.getint('Jobs', 'workers', fallback=2))
+
+        return translator, model, subscriptionsystem, jobrunner
+
+    def build_model(self):
+        import class_ChatGPT
+        import class_LLMDispatcher
+        gpt = self.config['GPT']
+        dispatcher = class_LLMDispatcher.LLMDispatcher(
+            concurrency=gpt.getint('concurrency', fallback=4),
+            rpm=gpt.getint('rpm', fallback=60),
+            tpm=gpt.getint('tpm', fallback=60000),
+        )
+        prefilter = None
+        if self.enabled('prefilter'):
+            import class_PreFilter
+            prefilter = class_PreFilter.KeywordPreFilter(threshold=self.config.getfloat('PreFilter', 'threshold', fallback=0.5))
+        lease = Lease(duration=timedelta(seconds=self.config.getint('Workers', 'lease_seconds', fallback=600)))
+        return class_ChatGPT.LangChainModel(self.session, gpt['apikey'], self.writer, batch_size=gpt.getint('batch_size', fallback=10), dispatcher=dispatcher, cache_size=gpt.getint('cache_size', fallback=100000), prefilter=prefilter, lease=lease)
+
+    def spider_task(self):
+        import class_spider
+        while True:
+            self.spider_event.wait()
+            try:
+                spider = class_spider.Spider(self.config, self.session, self.chrome_options(), self.writer)
+                print("Spider is running...")
+                spider.run()
+                print("Spider is stopping...")
+                spider.stop()
+            except Exception as e:
+                print(f"Spider task failed: {e}")
+            finally:
+                self.spider_event.clear()
+                (self.gdacs_event if self.enabled('gdacs') else self.spider_event).set()
+
+    def gdacs_task(self):
+        import class_GDACSspider
+        while True:
+            self.gdacs_event.wait()
+            try:
+                print("GDACS is running...")
+                gdacsspider = class_GDACSspider.GDACSSpider("/home/nakanomiku/Downloads/", "./data", self.session, self.chrome_options(), self.writer)
+                gdacsspider.run()
+                print("GDACS is stopping...")
+                gdacsspider.stop()
+            except Exception as e:
+                print(f"GDACS task failed: {e}")
+            finally:
+                self.gdacs_event.clear()
+                (self.spider_event if self.enabled('spider') else self.gdacs_event).set()
+
+    def run(self):
+        """启动子系统线程并阻塞，直到进程被终止"""
+        print("[Debug] Waking up subsystems")
+        threading.Thread(target=self.writer.run, daemon=True).start()
+        for subsystem in (self.translator, self.model, self.subscriptionsystem, self.jobrunner):
+            if subsystem is not None:
+                threading.Thread(target=subsystem.run, daemon=True).start()
+        # 爬虫和 GDACS 轮流运行，共用同一个 Chrome 用户目录
+        tasks = []
+        if self.enabled('spider'):
+            tasks.append(threading.Thread(target=self.spider_task))
+        if self.enabled('gdacs'):
+            tasks.append(threading.Thread(target=self.gdacs_task))
+        for task in tasks:
+            task.start()
+        (self.spider_event if self.enabled('spider') else self.gdacs_event).set()
+        for task in tasks:
+            task.join()
+        if not tasks:
+            threading.Event().wait()
+
+def run_classifier(db_path):
+    Worker(db_path, classifier_only=True, migrate=False).run()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SocialSiren pipeline worker')
+    parser.add_argument('--db', default='data/forum.db')
+    parser.add_argument('--classifier-only', action='store_true', help='only run the LLM classifier')
+    args = parser.parse_args()
+    os.environ['CUDA_VISIBLE_DEVICES'] = '-1'  # 正确禁用 GPU
+
+    # 在创建任何子进程之前建表和迁移，子进程不再重复执行
+    session = database.create_session(args.db)
+    database.create_schema(session)
+    session.remove()
+    session.session_factory.kw['bind'].dispose()
+
+    if not args.classifier_only:
+        config = configparser.ConfigParser()
+        config.read('config.ini')
+        # 额外的分类进程，在启动任何线程之前用 spawn 创建
+        extra = config.getint('Workers', 'classifier_processes', fallback=1) - 1
+        context = multiprocessing.get_context('spawn')
+        for _ in range(max(0, extra)):
+            context.Process(target=run_classifier, args=(args.db,), daemon=True).start()
+    Worker(args.db, classifier_only=args.classifier_only, migrate=False).run()